@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import time
+import typing as tp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from classes.base_letters import String
+from classes.font import Font
+from classes.glyph_cache import GLYPH_CACHE
+from libs.joint_validation import is_valid, summarize, validate_joint_trajectory
+from libs.trajectory_io import write_joint_trajectory
+from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, build_joint_trajectory, to_degrees, with_start_move
+from const import *
+
+# A job is a dict with the keys:
+#   text: the text to write, "\n" starts a new line
+#   output: path of the joint trajectory file, the format follows the extension (see libs/trajectory_io.py)
+#   optional: letter_width, line_height (layout), offsets (pose offset of every drawn letter, overrides the layout),
+#   workspace_offset (where the text is placed in the robot's workspace), generator, frequency
+Job = tp.Dict[str, tp.Any]
+JOB_KEYS = {"text", "output", "letter_width", "line_height", "offsets", "workspace_offset", "generator", "frequency"}
+
+
+def load_manifest(path: str) -> tp.List[Job]:
+    """
+    Load the jobs of a manifest: a .json file with a list of jobs, or a .jsonl file with one job per line.
+    Relative output paths are relative to the directory of the manifest.
+    """
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            jobs = [json.loads(line) for line in f if line.strip()]
+        else:
+            jobs = json.load(f)
+    for idx, job in enumerate(jobs):
+        missing = {"text", "output"} - set(job)
+        if missing:
+            raise ValueError(f"Job {idx} is missing {sorted(missing)}")
+        unknown = set(job) - JOB_KEYS
+        if unknown:
+            raise ValueError(f"Job {idx} has unknown keys {sorted(unknown)}")
+        job["output"] = os.path.join(os.path.dirname(os.path.abspath(path)), job["output"])
+    return jobs
+
+
+def build_job_string(font: Font, job: Job) -> String:
+    string = font.build_string(
+        job["text"],
+        generator=job.get("generator"),
+        frequency=job.get("frequency"),
+        letter_width=job.get("letter_width", MAX_WIDTH_HEIGHT),
+        line_height=job.get("line_height", 1.2 * MAX_WIDTH_HEIGHT),
+    )
+    if "offsets" in job:
+        string = String(string.letters, letter_width=string.letter_width, offsets=job["offsets"])
+    return string
+
+
+def _init_worker(cache_dir: tp.Optional[str]):
+    GLYPH_CACHE.cache_dir = cache_dir
+
+
+def run_jobs(
+    jobs: tp.List[Job],
+    workers: tp.Optional[int] = None,
+    cache_dir: tp.Optional[str] = None,
+    font: tp.Optional[Font] = None,
+    verbose: bool = True,
+    validate: bool = True,
+) -> tp.List[tp.Dict[str, tp.Any]]:
+    """
+    Render the jobs one after another and write one joint trajectory file (in degrees, with the start move like main.py) per job.
+    The font, the glyph caches and the process pool are shared by all the jobs, so repeated letters are only solved once.
+    workers: number of worker processes (None for one per core), 0 or 1 solves everything in this process
+    cache_dir: also keep the glyph cache on disk, see GlyphCache
+    validate: check the joint trajectory of every job (see libs/joint_validation.py), an invalid job is not written
+    Returns the statistics of every job.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    font = Font() if font is None else font
+    GLYPH_CACHE.cache_dir = cache_dir
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cache_dir,)) if workers > 1 else None
+
+    all_stats = []
+    start = time.perf_counter()
+    try:
+        for idx, job in enumerate(jobs):
+            job_start = time.perf_counter()
+            string = build_job_string(font, job)
+            workspace_offset = np.asarray(job.get("workspace_offset", WORKSPACE_OFFSET), dtype=float)
+            solved = build_joint_trajectory(
+                string,
+                ORIENTATION,
+                ROTATION_MATRIX,
+                workspace_offset,
+                seed_thetas=np.zeros(6),
+                workers=0,
+                executor=executor,
+                return_poses=validate,
+            )
+            time_steps, thetas = solved[:2]
+            if validate:
+                report = validate_joint_trajectory(time_steps, thetas, solved[2], ORIENTATION)
+                issues = summarize(report, time_steps)
+                if not is_valid(report):
+                    if verbose:
+                        print(f"job {idx} is not valid, skipped:\n  " + "\n  ".join(issues))
+                    all_stats.append({
+                        "job": idx, "output": job["output"], "letters": len(string.letters), "samples": len(time_steps),
+                        "valid": False, "issues": issues,
+                    })
+                    continue
+            chunks = list(to_degrees(with_start_move([(time_steps, thetas)])))
+            os.makedirs(os.path.dirname(os.path.abspath(job["output"])), exist_ok=True)
+            write_joint_trajectory(
+                job["output"],
+                np.concatenate([chunk_time_steps for chunk_time_steps, _ in chunks]),
+                np.concatenate([chunk_thetas for _, chunk_thetas in chunks]),
+            )
+            job_time = time.perf_counter() - job_start
+
+            stats = {
+                "job": idx,
+                "output": job["output"],
+                "letters": len(string.letters),
+                "samples": len(time_steps),
+                "duration": string.duration,
+                "time": job_time,
+                "samples_per_second": len(time_steps) / job_time,
+                "valid": True if validate else None,
+            }
+            all_stats.append(stats)
+            if verbose:
+                print(f"job {idx}: {stats['letters']} letters, {stats['samples']} samples in {job_time:.2f} s "
+                      f"({stats['samples_per_second']:.0f} samples/s) -> {job['output']}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    total_time = time.perf_counter() - start
+    if verbose and all_stats:
+        # the throughput of the written jobs, the invalid ones are only counted as skipped
+        written = [stats for stats in all_stats if stats["valid"] is not False]
+        total_samples = sum(stats["samples"] for stats in written)
+        print(f"{len(written)} jobs, {total_samples} samples in {total_time:.2f} s: "
+              f"{len(written) / total_time:.2f} jobs/s, {total_samples / total_time:.0f} samples/s"
+              + (f", {len(all_stats) - len(written)} invalid jobs skipped" if len(written) != len(all_stats) else ""))
+    if verbose and executor is None:  # the workers have their own caches
+        print(f"glyph cache: {GLYPH_CACHE.hits} hits, {GLYPH_CACHE.disk_hits} disk hits, {GLYPH_CACHE.misses} misses")
+    return all_stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the text jobs of a manifest to joint trajectory files.")
+    parser.add_argument("manifest", help="a .json list of jobs or a .jsonl file with one job per line, see batch.py for the keys")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes, default one per core, 0 or 1 solves everything in this process")
+    parser.add_argument("--cache-dir", default=None, help="keep the glyph cache in this directory between runs")
+    parser.add_argument("--no-validate", action="store_true", help="write the jobs without checking their joint trajectories")
+    args = parser.parse_args()
+
+    run_jobs(load_manifest(args.manifest), workers=args.workers, cache_dir=args.cache_dir, validate=not args.no_validate)
@@ -2,50 +2,202 @@ import numpy as np
 import typing as tp
 import matplotlib.pyplot as plt
 
-from libs.trajectory_generation_parabolic import generate_trajectory_3d as generate_trajectory_3d_parabolic
-from libs.trajectory_generation_cubic import generate_trajectory_3d as generate_trajectory_3d_cubic
+from libs.trajectory_generation import get_generator
+from libs.time_scaling import time_scale
+from classes.glyph_cache import GLYPH_CACHE, GlyphCache, Trajectory, glyph_key
 from const import *
 
 # Note: By default, x is the horizontal axis, y is the vertical axis, and z is the height
 
 
+def allocate_trajectory(num_steps: int) -> Trajectory:
+    """
+    Allocate the buffers that the write_trajectory methods fill in.
+    """
+    return np.empty(num_steps), np.empty((num_steps, 3)), np.empty((num_steps, 3)), np.empty((num_steps, 3))
+
+
+def write_samples(
+    out: Trajectory,
+    start: int,
+    trajectory: Trajectory,
+    time_offset: float = 0,
+    pose_offset: tp.Optional[np.ndarray] = None,
+    skip_first: bool = False,
+) -> int:
+    """
+    Write a trajectory into the buffers from allocate_trajectory, starting at index start,
+    with the time steps and poses shifted by time_offset and pose_offset.
+    skip_first drops the first sample, which is the same as the last sample of the previous move.
+    Returns the index after the last written sample.
+    """
+    time_steps, poses, velocities, accelerations = trajectory
+    first = 1 if skip_first else 0
+    end = start + len(time_steps) - first
+    np.add(time_steps[first:], time_offset, out=out[0][start:end])
+    np.add(poses[first:], 0 if pose_offset is None else pose_offset, out=out[1][start:end])
+    out[2][start:end] = velocities[first:]
+    out[3][start:end] = accelerations[first:]
+    return end
+
+
+def shift_samples(
+    trajectory: Trajectory,
+    time_offset: float = 0,
+    pose_offset: tp.Optional[np.ndarray] = None,
+    skip_first: bool = False,
+) -> Trajectory:
+    """
+    Same as write_samples, but returns the shifted trajectory as new arrays.
+    """
+    time_steps, poses, velocities, accelerations = trajectory
+    first = 1 if skip_first else 0
+    return (
+        time_steps[first:] + time_offset,
+        poses[first:] + (0 if pose_offset is None else pose_offset),
+        velocities[first:],
+        accelerations[first:],
+    )
+
+
 class Stroke:
     def __init__(
         self,
         poses: tp.List[np.ndarray],
         time_list: tp.List[float],
+        generator: str = DEFAULT_GENERATOR,
+        frequency: float = DEFAULT_FREQUENCY,
     ):
         '''
         This class implements a stroke, which is a series of poses that the end effector can draw in one pass without the need to lift the pen.
+        generator: name of the trajectory generator, see libs/trajectory_generation.py
+        frequency: sampling frequency of the trajectory in Hz
         '''
         poses = np.array(poses)  
-        self.poses = poses # List of poses (x, y, z)
+        self.key_poses = poses # List of key poses (x, y, z), the sampled poses are in self.poses
         # validate the poses, should not exceeds the bounding box
-        assert all(isinstance(pose, np.ndarray) and pose.shape == (3,) for pose in poses), "All poses must be 3D numpy arrays"
+        assert poses.ndim == 2 and poses.shape[1] == 3, "All poses must be 3D numpy arrays"
         self.time_list = time_list  # List of time points for each pose
         assert len(poses) == len(time_list), "Length of poses and time_list must be the same"
         self.duration = time_list[-1] - time_list[0]  # the total time to write the stroke
 
-        # solve the trajectory using cubic spline
-        self.time_steps, self.poses, self.velocities, self.accelerations = generate_trajectory_3d_cubic(
-            self.poses,
+        self.generator = None
+        self.frequency = None
+        self.set_generator(generator, frequency)
+
+    def set_generator(self, generator: tp.Optional[str] = None, frequency: tp.Optional[float] = None):
+        """
+        Change the trajectory generator and / or the sampling frequency, None keeps the current value.
+        The cached trajectory is dropped if anything changed.
+        """
+        generator = self.generator if generator is None else generator
+        frequency = self.frequency if frequency is None else frequency
+        assert frequency > 0, "Frequency must be positive"
+        if generator == self.generator and frequency == self.frequency:
+            return
+        self.generator = generator
+        self.frequency = frequency
+        self._trajectory = None  # solved lazily in get_trajectory
+
+    def reversed(self) -> "Stroke":
+        """
+        The same stroke drawn from the other end, with the time list mirrored so that each segment keeps its duration.
+        """
+        time_list = [self.time_list[-1] + self.time_list[0] - t for t in self.time_list[::-1]]
+        return Stroke(self.key_poses[::-1].copy(), time_list, generator=self.generator, frequency=self.frequency)
+
+    def retime(
+        self,
+        max_velocity: float = MAX_VELOCITY,
+        max_acceleration: float = MAX_ACCELERATION,
+        min_segment_time: float = MIN_SEGMENT_TIME,
+        **kwargs,
+    ):
+        """
+        Replace the time list by the shortest one within the velocity and acceleration limits, see libs/time_scaling.py.
+        kwargs: joint limits, see limit_ratios (to_joints maps the poses of this stroke)
+        """
+        self.time_list = time_scale(
+            self.key_poses, self.generator, max_velocity, max_acceleration, min_segment_time, start_time=self.time_list[0], **kwargs
+        )
+        self.duration = self.time_list[-1] - self.time_list[0]
+        self._trajectory = None
+
+    def solve_trajectory(self) -> Trajectory:
+        """
+        Solve the trajectory with the selected generator (cubic spline by default), without caching it.
+        """
+        return get_generator(self.generator)(
+            self.key_poses,
             self.time_list,
-            frequency=50,
+            frequency=self.frequency,
         )
-        
-        # # solve the trajectory using parabolic spline, although this does not make much sense for our task
-        # self.time_steps, self.poses, self.velocities, self.accelerations = generate_trajectory_3d_parabolic(
-        #     self.poses,
-        #     self.time_list,
-        #     frequency=50,
-        #     t_b=0.2
-        # )
-    
-    def get_trajectory(self) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+
+    def get_trajectory(self) -> Trajectory:
         """
         Get the trajectory of the stroke.
+        The trajectory is solved on first access and cached.
         """
-        return self.time_steps, self.poses, self.velocities, self.accelerations
+        if self._trajectory is None:
+            self._trajectory = self.solve_trajectory()
+        return self._trajectory
+
+    @property
+    def time_steps(self) -> np.ndarray:
+        return self.get_trajectory()[0]
+
+    @property
+    def poses(self) -> np.ndarray:
+        return self.get_trajectory()[1]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self.get_trajectory()[2]
+
+    @property
+    def accelerations(self) -> np.ndarray:
+        return self.get_trajectory()[3]
+
+    @property
+    def num_steps(self) -> int:
+        """
+        The number of samples of the trajectory, known without solving it.
+        """
+        if self._trajectory is not None:
+            return len(self._trajectory[0])
+        return max(int(self.duration * self.frequency) + 1, 2)  # same as the generators in libs
+
+    def write_trajectory(
+        self,
+        out: Trajectory,
+        start: int,
+        time_offset: float = 0,
+        pose_offset: tp.Optional[np.ndarray] = None,
+        skip_first: bool = False,
+    ) -> int:
+        """
+        Write the trajectory into the buffers from allocate_trajectory, see write_samples.
+        """
+        return write_samples(out, start, self.get_trajectory(), time_offset, pose_offset, skip_first)
+
+    def __getstate__(self):
+        # the cached trajectory is not pickled, it is solved again when needed
+        state = self.__dict__.copy()
+        state["_trajectory"] = None
+        return state
+
+    def iter_samples(
+        self,
+        time_offset: float = 0,
+        pose_offset: tp.Optional[np.ndarray] = None,
+        skip_first: bool = False,
+    ) -> tp.Iterator[Trajectory]:
+        """
+        Yield the trajectory as one chunk, shifted by time_offset and pose_offset, see write_samples.
+        A trajectory that is not cached yet is solved for this call only, so streaming keeps the memory bounded.
+        """
+        trajectory = self._trajectory if self._trajectory is not None else self.solve_trajectory()
+        yield shift_samples(trajectory, time_offset, pose_offset, skip_first)
 
 
 class Lift(Stroke):
@@ -56,6 +208,8 @@ class Lift(Stroke):
         move_duration: float,
         lift_height: float = MAX_LIFT_HEIGHT,
         lift_duration: float = LIFT_DURATION,
+        generator: str = DEFAULT_GENERATOR,
+        frequency: float = DEFAULT_FREQUENCY,
     ):
         """
         This is the motion of lifting the pen to move to a new position.
@@ -65,7 +219,7 @@ class Lift(Stroke):
         end_intermediate = end_pose + np.array([0, 0, lift_height])
         poses = [start_pose, start_intermediate, end_intermediate, end_pose]
         time_list = [0, lift_duration, lift_duration + move_duration, lift_duration + move_duration + lift_duration]
-        super().__init__(poses, time_list)
+        super().__init__(poses, time_list, generator=generator, frequency=frequency)
 
 
 class Letter:
@@ -73,24 +227,35 @@ class Letter:
         self, 
         letter: str,
         strokes: tp.List[Stroke],
+        generator: tp.Optional[str] = None,
+        frequency: tp.Optional[float] = None,
+        cache: tp.Optional[GlyphCache] = GLYPH_CACHE,
     ):
         """
         The class of a letter, consists of a list of strokes.
         Here in the initialization, we automatically add the lift aftion between strokes if they are not connected.
+        generator, frequency: if given, override the trajectory generator and sampling frequency of all the strokes
+        cache: the trajectory of the letter is shared through this cache by all the letters with the same strokes and settings,
+            None solves it for every letter
         """
         assert len(letter) == 1, "Letter must be a single character"
         self.letter = letter
+        self.cache = cache
+        for stroke in strokes:
+            stroke.set_generator(generator, frequency)
 
         # add lift between strokes
         moves = []
         for i in range(len(strokes) - 1):
             moves.append(strokes[i])
-            if not np.linalg.norm(strokes[i].poses[-1] == strokes[i + 1].poses[0]) < 1e-6:
+            if not np.linalg.norm(strokes[i].key_poses[-1] - strokes[i + 1].key_poses[0]) < 1e-6:
                 # if the two strokes are not connected, add a lift stroke
                 lift = Lift(
-                    strokes[i].poses[-1],
-                    strokes[i + 1].poses[0],
+                    strokes[i].key_poses[-1],
+                    strokes[i + 1].key_poses[0],
                     move_duration=3,  # TODO: make this a more reasonable value, maybe change with the move distance
+                    generator=strokes[i].generator,
+                    frequency=strokes[i].frequency,
                 )
                 moves.append(lift)
         moves.append(strokes[-1])
@@ -98,112 +263,267 @@ class Letter:
         # validate the moves: they must be connected
         for i, move in enumerate(moves):
             if i != 0:
-                assert np.linalg.norm(move.poses[0] - moves[i - 1].poses[-1]) < 1e-6, f"Stroke {i} must start where stroke {i-1} ends"
+                assert np.linalg.norm(move.key_poses[0] - moves[i - 1].key_poses[-1]) < 1e-6, f"Stroke {i} must start where stroke {i-1} ends"
             if i != len(moves) - 1:
-                assert np.linalg.norm(move.poses[-1] - moves[i + 1].poses[0]) < 1e-6, f"Stroke {i} must end where stroke {i+1} starts"
+                assert np.linalg.norm(move.key_poses[-1] - moves[i + 1].key_poses[0]) < 1e-6, f"Stroke {i} must end where stroke {i+1} starts"
         
         self.moves = moves
 
         self.duration = sum(move.duration for move in moves)  # the total time to write the letter
+
+    def set_generator(self, generator: tp.Optional[str] = None, frequency: tp.Optional[float] = None):
+        """
+        Change the trajectory generator and / or the sampling frequency of all the moves, None keeps the current value.
+        """
+        for move in self.moves:
+            move.set_generator(generator, frequency)
+
+    def retime(self, **kwargs):
+        """
+        Retime all the strokes and lifts within the limits, see Stroke.retime.
+        """
+        for move in self.moves:
+            move.retime(**kwargs)
+        self.duration = sum(move.duration for move in self.moves)
     
-    def get_trajectory(self) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    @property
+    def num_steps(self) -> int:
         """
-        Get the trajectory of the letter by concatenating the trajectories of all strokes.
+        The number of samples of the trajectory, consecutive moves share one sample.
         """
-        all_time_steps = []
-        all_poses = []
-        all_velocities = []
-        all_accelerations = []
+        return sum(move.num_steps for move in self.moves) - (len(self.moves) - 1)
 
+    def cache_key(self) -> str:
+        return glyph_key(self.moves)
+
+    def build_trajectory(self) -> Trajectory:
+        """
+        Solve the trajectory of the letter by writing the trajectories of all moves one after another into one buffer.
+        """
+        out = allocate_trajectory(self.num_steps)
+        start = 0
         global_time = 0
-        for move in self.moves:
-            # shift the time steps to start from the end of the previous move
-            time_steps = move.time_steps + global_time
-            if len(all_time_steps) == 0:
-                all_time_steps.append(time_steps)
-                all_poses.append(move.poses)
-                all_velocities.append(move.velocities)
-                all_accelerations.append(move.accelerations)
-            else:
-                assert np.linalg.norm(all_poses[-1][-1] - move.poses[0]) < 1e-6, f"Move {move} must start where move {self.moves[-1]} ends"
-                assert time_steps[0] == all_time_steps[-1][-1], f"Move {move} must start where move {self.moves[-1]} ends"
-                all_time_steps.append(time_steps[1:])  # remove the first time step, since it is the same as the last time step of the previous move
-                all_poses.append(move.poses[1:])
-                all_velocities.append(move.velocities[1:])
-                all_accelerations.append(move.accelerations[1:])
+        for i, move in enumerate(self.moves):
+            if i != 0:
+                # the first sample of the move is dropped, since it is the same as the last sample of the previous move
+                assert np.linalg.norm(out[1][start - 1] - move.poses[0]) < 1e-6, f"Move {move} must start where move {self.moves[i - 1]} ends"
+                assert out[0][start - 1] == move.time_steps[0] + global_time, f"Move {move} must start where move {self.moves[i - 1]} ends"
+            start = move.write_trajectory(out, start, global_time, skip_first=i != 0)
+            global_time += move.duration
+        assert start == self.num_steps, f"Expected {self.num_steps} samples, got {start}"
+        return out
+
+    def get_trajectory(self) -> Trajectory:
+        """
+        Get the trajectory of the letter, from the glyph cache if possible.
+        """
+        if self.cache is None:
+            return self.build_trajectory()
+        return self.cache.get(self.cache_key(), self.build_trajectory)
+
+    def write_trajectory(
+        self,
+        out: Trajectory,
+        start: int,
+        time_offset: float = 0,
+        pose_offset: tp.Optional[np.ndarray] = None,
+        skip_first: bool = False,
+    ) -> int:
+        """
+        Write the trajectory into the buffers, see write_samples.
+        """
+        return write_samples(out, start, self.get_trajectory(), time_offset, pose_offset, skip_first)
 
+    def iter_samples(
+        self,
+        time_offset: float = 0,
+        pose_offset: tp.Optional[np.ndarray] = None,
+        skip_first: bool = False,
+    ) -> tp.Iterator[Trajectory]:
+        """
+        Yield the trajectory, see Stroke.iter_samples.
+        With the glyph cache, the whole letter is yielded as one chunk, otherwise it is yielded move by move.
+        """
+        if self.cache is not None:
+            yield shift_samples(self.get_trajectory(), time_offset, pose_offset, skip_first)
+            return
+        global_time = time_offset
+        for i, move in enumerate(self.moves):
+            yield from move.iter_samples(global_time, pose_offset, skip_first=skip_first or i != 0)
             global_time += move.duration
-        
-        # concatenate all the trajectories
-        all_time_steps = np.concatenate(all_time_steps)
-        all_poses = np.concatenate(all_poses)
-        all_velocities = np.concatenate(all_velocities)
-        all_accelerations = np.concatenate(all_accelerations)
-        return all_time_steps, all_poses, all_velocities, all_accelerations
-            
+
 
 class String:
     def __init__(
         self,
         letters: tp.List[Letter],
         letter_width: float = MAX_WIDTH_HEIGHT,
+        generator: tp.Optional[str] = None,
+        frequency: tp.Optional[float] = None,
+        cache: tp.Optional[GlyphCache] = GLYPH_CACHE,
+        offsets: tp.Optional[tp.List[np.ndarray]] = None,
     ):
         """
         String is a collection of letters
+        generator, frequency: if given, override the trajectory generator and sampling frequency of all the letters
+        cache: the lifts between letters are shared through this cache, like the letters (see Letter)
+        offsets: the pose offset (x, y, z) of each letter, by default the letters are placed in one row, letter_width apart
         """
-        self.letters = letters
+        self.letters = list(letters)
         self.letter_width = letter_width  # the width of the letter
+        self.cache = cache
+        if offsets is None:
+            offsets = [np.array([idx * letter_width, 0, 0]) for idx in range(len(letters))]
+        assert len(offsets) == len(letters), "Expected one offset per letter"
+        self.offsets = [np.asarray(offset, dtype=float) for offset in offsets]
+        if generator is not None or frequency is not None:
+            for letter in letters:
+                letter.set_generator(generator, frequency)
+
+        # lift strokes between letters, in the frame of the letter before the lift
+        self.lifts = [self._make_lift(idx) for idx in range(len(letters) - 1)]
+
+        self.duration = sum(letter.duration for letter in letters) + sum(lift.duration for lift in self.lifts)  # the total time to write the string
+
+    def _make_lift(self, idx: int) -> Lift:
+        return Lift(
+            start_pose=self.letters[idx].moves[-1].key_poses[-1],
+            end_pose=self.letters[idx + 1].moves[0].key_poses[0] + self.offsets[idx + 1] - self.offsets[idx],
+            move_duration=6,  # TODO: make this a more reasonable value, maybe change with the move distance
+            generator=self.letters[idx].moves[-1].generator,
+            frequency=self.letters[idx].moves[-1].frequency,
+        )
+
+    def _update_lifts(self, idx: int):
+        # the lifts before and after letter idx depend on it
+        for lift_idx in [idx - 1, idx]:
+            if 0 <= lift_idx < len(self.lifts):
+                self.lifts[lift_idx] = self._make_lift(lift_idx)
+        self.duration = sum(letter.duration for letter in self.letters) + sum(lift.duration for lift in self.lifts)
+
+    def replace_letter(self, idx: int, letter: Letter):
+        """
+        Replace letter idx, only the lifts next to it are made again.
+        """
+        self.letters[idx] = letter
+        self._update_lifts(idx)
+
+    def set_offset(self, idx: int, offset: np.ndarray):
+        """
+        Move letter idx to a new pose offset, only the lifts next to it are made again.
+        """
+        self.offsets[idx] = np.asarray(offset, dtype=float)
+        self._update_lifts(idx)
+
+    def set_generator(self, generator: tp.Optional[str] = None, frequency: tp.Optional[float] = None):
+        """
+        Change the trajectory generator and / or the sampling frequency of all the letters and lifts, None keeps the current value.
+        """
+        for letter in self.letters:
+            letter.set_generator(generator, frequency)
+        for lift in self.lifts:
+            lift.set_generator(generator, frequency)
+
+    def retime(self, to_joints: tp.Optional[tp.Callable[[np.ndarray], np.ndarray]] = None, **kwargs):
+        """
+        Retime all the letters and lifts within the limits, see Stroke.retime.
+        to_joints: maps (N, 3) poses in the frame of the string to (N, 6) joint angles, needed for the joint limits.
+            A letter that is used several times is retimed once, within the limits at all of its places.
+        """
+        def at_offsets(offsets):
+            if to_joints is None:
+                return None
+            return lambda poses: np.concatenate([to_joints(poses + offset) for offset in offsets], axis=1)
+
+        letter_offsets = {}  # id -> (letter, unique offsets)
+        for letter, offset in zip(self.letters, self.offsets):
+            offsets = letter_offsets.setdefault(id(letter), (letter, {}))[1]
+            offsets.setdefault(tuple(offset), offset)
+        for letter, offsets in letter_offsets.values():
+            letter.retime(to_joints=at_offsets(list(offsets.values())), **kwargs)
+        for idx, lift in enumerate(self.lifts):
+            lift.retime(to_joints=at_offsets([self.offsets[idx]]), **kwargs)
+        self.duration = sum(letter.duration for letter in self.letters) + sum(lift.duration for lift in self.lifts)
         
-    def get_trajectory(self) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    @property
+    def num_steps(self) -> int:
+        """
+        The number of samples of the trajectory, consecutive letters and lifts share one sample.
+        """
+        moves = self.letters + self.lifts
+        return sum(move.num_steps for move in moves) - (len(moves) - 1)
+
+    def get_lift_trajectory(self, idx: int) -> Trajectory:
         """
-        Get the global trajectory of the string by concatenating the trajectories of all letters.
+        Get the trajectory of the lift after letter idx, from the cache if possible.
+        The lift only depends on the two letters, so it is shared by every occurrence of the same pair.
         """
-        all_time_steps = []
-        all_poses = []
-        all_velocities = []
-        all_accelerations = []
+        lift = self.lifts[idx]
+        if self.cache is None:
+            return lift.get_trajectory()
+        return self.cache.get_lift(glyph_key([lift]), lift.solve_trajectory)
+
+    def get_trajectory(self) -> Trajectory:
+        """
+        Get the global trajectory of the string by writing the trajectories of all letters and lifts into one buffer.
+        """
+        out = allocate_trajectory(self.num_steps)
 
         global_time = 0
+        end = 0
         for idx, letter in enumerate(self.letters):
-            pose_offset = np.array([idx * self.letter_width, 0, 0])
-            time_steps, poses, velocities, accelerations = letter.get_trajectory()
-
-            if len(all_time_steps) == 0:
-                all_time_steps.append(time_steps + global_time)  # shift the time steps to start from the end of the previous letter
-                all_poses.append(poses + pose_offset)  # shift the poses to the right for each letter
-                all_velocities.append(velocities)
-                all_accelerations.append(accelerations)
-            else:
-                assert np.linalg.norm(all_poses[-1][-1] - (poses[0] + pose_offset)) < 1e-6, f"Letter {letter} must start where letter {self.letters[-1]} ends"
-                assert all_time_steps[-1][-1] == time_steps[0] + global_time, f"Letter {letter} must start where letter {self.letters[-1]} ends"
-                all_time_steps.append(time_steps[1:] + global_time)  # remove the first time step, since it is the same as the last time step of the previous letter
-                all_poses.append(poses[1:] + pose_offset)  # remove the first pose, since it is the same as the last pose of the previous letter
-                all_velocities.append(velocities[1:])
-                all_accelerations.append(accelerations[1:])
-
+            pose_offset = self.offsets[idx]  # shift the poses to the position of each letter
+            # the first sample of every letter but the first is dropped, since it is the same as the last sample of the previous lift
+            end = letter.write_trajectory(out, end, global_time, pose_offset, skip_first=idx != 0)
             global_time += letter.duration
 
             # add a lift stroke between letters
             if idx != len(self.letters) - 1:
-                lift = Lift(
-                    start_pose=poses[-1],
-                    end_pose=self.letters[idx + 1].moves[0].poses[0] + np.array([self.letter_width, 0, 0]),
-                    move_duration=6,  # TODO: make this a more reasonable value, maybe change with the move distance
-                )
-                all_time_steps.append(lift.time_steps[1:] + global_time)
-                all_poses.append(lift.poses[1:] + pose_offset)
-                all_velocities.append(lift.velocities[1:])
-                all_accelerations.append(lift.accelerations[1:])
+                end = write_samples(out, end, self.get_lift_trajectory(idx), global_time, pose_offset, skip_first=True)
+                global_time += self.lifts[idx].duration
+
+        assert end == self.num_steps, f"Expected {self.num_steps} samples, got {end}"
+        return out
+
+    def iter_moves(self) -> tp.Iterator[tp.Tuple[tp.Union[Letter, Lift], float, np.ndarray, bool]]:
+        """
+        Yield the letters and the lifts between them in order, as (move, time_offset, pose_offset, skip_first),
+        the arguments of their iter_samples.
+        """
+        global_time = 0
+        for idx, letter in enumerate(self.letters):
+            pose_offset = self.offsets[idx]
+            yield letter, global_time, pose_offset, idx != 0
+            global_time += letter.duration
+
+            if idx != len(self.letters) - 1:
+                yield self.lifts[idx], global_time, pose_offset, True
+                global_time += self.lifts[idx].duration
+
+    def iter_samples(self) -> tp.Iterator[Trajectory]:
+        """
+        Yield the global trajectory of the string move by move, as chunks of (time_steps, poses, velocities, accelerations).
+        Concatenating the chunks gives the same result as get_trajectory, but only one move is held in memory at a time.
+        """
+        for move, time_offset, pose_offset, skip_first in self.iter_moves():
+            yield from iter_move_samples(move, time_offset, pose_offset, skip_first, self.cache)
+
+
+def iter_move_samples(
+    move: tp.Union[Letter, Lift],
+    time_offset: float,
+    pose_offset: np.ndarray,
+    skip_first: bool,
+    cache: tp.Optional[GlyphCache],
+) -> tp.Iterator[Trajectory]:
+    """
+    Yield the chunks of one move of String.iter_moves, the lifts between letters are shared through the cache like in String.
+    """
+    if isinstance(move, Lift) and cache is not None:
+        yield shift_samples(cache.get_lift(glyph_key([move]), move.solve_trajectory), time_offset, pose_offset, skip_first)
+    else:
+        yield from move.iter_samples(time_offset, pose_offset, skip_first)
 
-                global_time += lift.duration
-        
-        # concatenate all the trajectories
-        all_time_steps = np.concatenate(all_time_steps)
-        all_poses = np.concatenate(all_poses)
-        all_velocities = np.concatenate(all_velocities)
-        all_accelerations = np.concatenate(all_accelerations)
-        return all_time_steps, all_poses, all_velocities, all_accelerations
-    
         
 def get_2d_visualization(obj, save_filename: str):
     """
@@ -0,0 +1,127 @@
+import os
+import typing as tp
+
+import numpy as np
+
+from .base_letters import Stroke, Letter, String
+from const import *
+
+DEFAULT_FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts", "simple_stroke.font")
+
+
+class Font:
+    def __init__(
+        self,
+        path: str = DEFAULT_FONT_PATH,
+        writing_speed: float = WRITING_SPEED,
+        min_segment_time: float = MIN_SEGMENT_TIME,
+    ):
+        """
+        A font loaded from a glyph definition file, see fonts/simple_stroke.font for the format.
+        The glyph lines are indexed by character when the file is loaded, but only parsed when the glyph is first used.
+        writing_speed, min_segment_time: used to time the strokes that have no explicit timings
+        """
+        self.writing_speed = writing_speed
+        self.min_segment_time = min_segment_time
+        self._lines: tp.Dict[str, str] = {}  # character -> unparsed strokes
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                code, _, strokes = line.partition(" ")
+                self._lines[chr(int(code, 16))] = strokes
+        self._glyphs: tp.Dict[str, tp.List[tp.Tuple[np.ndarray, tp.List[float]]]] = {}
+
+    def __contains__(self, char: str) -> bool:
+        return char in self._lines
+
+    @property
+    def characters(self) -> tp.List[str]:
+        return list(self._lines)
+
+    def get_glyph(self, char: str) -> tp.List[tp.Tuple[np.ndarray, tp.List[float]]]:
+        """
+        Get the strokes of a character as (poses (N, 3), time_list) pairs, an empty list for blank characters.
+        """
+        if char not in self._glyphs:
+            if char not in self._lines:
+                raise KeyError(f"Character {char!r} is not in the font")
+            self._glyphs[char] = [self._parse_stroke(stroke) for stroke in self._lines[char].split("|") if stroke.strip()]
+        return self._glyphs[char]
+
+    def _parse_stroke(self, text: str) -> tp.Tuple[np.ndarray, tp.List[float]]:
+        points, _, timings = text.partition("@")
+        poses = np.array([[float(v) for v in point.split(",")] + [0] for point in points.split()])
+        if timings.strip():
+            time_list = [float(t) for t in timings.split(",")]
+        else:
+            # constant writing speed, but never faster than min_segment_time between two key points
+            segment_times = np.maximum(np.linalg.norm(np.diff(poses, axis=0), axis=1) / self.writing_speed, self.min_segment_time)
+            time_list = np.concatenate([[0], np.cumsum(segment_times)]).tolist()
+        return poses, time_list
+
+    def get_letter(self, char: str, generator: tp.Optional[str] = None, frequency: tp.Optional[float] = None) -> Letter:
+        """
+        Get a new letter of a character. Strings may retime or change the generator of their letters in place, so every call
+        gets its own strokes; the solved trajectories are still shared through the glyph cache.
+        """
+        strokes = [Stroke(poses.copy(), list(time_list)) for poses, time_list in self.get_glyph(char)]
+        if len(strokes) == 0:
+            raise ValueError(f"Character {char!r} has no strokes")
+        return Letter(char, strokes, generator=generator, frequency=frequency)
+
+    def build_string(
+        self,
+        text: str,
+        generator: tp.Optional[str] = None,
+        frequency: tp.Optional[float] = None,
+        letter_width: float = MAX_WIDTH_HEIGHT,
+        line_height: float = 1.2 * MAX_WIDTH_HEIGHT,
+    ) -> String:
+        """
+        Build a string from text. Blank characters only advance the position, and a new line starts
+        line_height below the previous one.
+        """
+        letters = []
+        offsets = []
+        string_letters: tp.Dict[str, Letter] = {}  # the occurrences of a character in this string share one letter
+        x, y = 0, 0
+        for char in text:
+            if char == "\n":
+                x, y = 0, y - line_height
+                continue
+            if len(self.get_glyph(char)) != 0:
+                if char not in string_letters:
+                    string_letters[char] = self.get_letter(char, generator, frequency)
+                letters.append(string_letters[char])
+                offsets.append(np.array([x, y, 0]))
+            x += letter_width
+        if len(letters) == 0:
+            raise ValueError("Text has no characters to draw")
+        return String(letters, letter_width=letter_width, offsets=offsets)
+
+
+if __name__ == "__main__":
+    # Benchmark: load the ASCII font and build a 1,000 character string
+    import time
+
+    start = time.perf_counter()
+    font = Font()
+    load_time = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    characters = [c for c in font.characters if c != " "]
+    text = "".join(rng.choice(characters + [" "], size=1000))
+
+    start = time.perf_counter()
+    string = font.build_string(text)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    time_steps, poses, velocities, accelerations = string.get_trajectory()
+    trajectory_time = time.perf_counter() - start
+
+    print(f"Loaded {len(font.characters)} glyphs in {load_time * 1e3:.2f} ms")
+    print(f"Built a {len(text)} character string ({len(string.letters)} letters) in {build_time * 1e3:.2f} ms, duration {string.duration:.0f} s")
+    print(f"Sampled {len(time_steps)} poses in {trajectory_time * 1e3:.2f} ms")
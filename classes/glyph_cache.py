@@ -0,0 +1,120 @@
+import hashlib
+import os
+import typing as tp
+from collections import OrderedDict
+
+import numpy as np
+
+from libs.trajectory_generation import generator_signature
+
+Trajectory = tp.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]  # time_steps (T,), poses, velocities, accelerations (T, 3)
+
+CACHE_VERSION = 2  # bump when the trajectory generators change, so that stale entries on disk are not reused
+
+
+def glyph_key(moves, extra: str = "") -> str:
+    """
+    Hash of everything that determines the trajectory of a letter: the waypoints and time lists of all moves
+    (lifts included, so the lift height and durations are covered), the generator (with its bound parameters and
+    registration version, see generator_signature) and the frequency.
+    """
+    h = hashlib.sha1(f"v{CACHE_VERSION};{extra}".encode())
+    for move in moves:
+        h.update(np.ascontiguousarray(move.key_poses, dtype=np.float64).tobytes())
+        h.update(np.ascontiguousarray(move.time_list, dtype=np.float64).tobytes())
+        h.update(f";{generator_signature(move.generator)};{float(move.frequency)!r};".encode())
+    return h.hexdigest()
+
+
+class GlyphCache:
+    def __init__(self, max_entries: int = 128, cache_dir: tp.Optional[str] = None, max_lift_entries: int = 1024):
+        """
+        Cache of letter trajectories in the letter frame (starting at time 0, without the offset in the string).
+        The entries are kept in memory with an LRU bound, and optionally stored as .npz files in cache_dir,
+        which survive between runs.
+        The lifts between letters have their own LRU of max_lift_entries, since a long text has far more letter pairs
+        than letters, and they must not evict the letters.
+        """
+        self.max_entries = max_entries
+        self.max_lift_entries = max_lift_entries
+        self.cache_dir = cache_dir
+        self.entries: "OrderedDict[str, Trajectory]" = OrderedDict()
+        self.lift_entries: "OrderedDict[str, Trajectory]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str, build: tp.Callable[[], Trajectory]) -> Trajectory:
+        """
+        Get the trajectory of the key, build is only called if it is neither in memory nor on disk.
+        The returned arrays are read only, since they are shared by all the letters with the same key.
+        """
+        return self._get(self.entries, self.max_entries, key, build)
+
+    def get_lift(self, key: str, build: tp.Callable[[], Trajectory]) -> Trajectory:
+        """
+        Same as get, for the trajectory of a lift between two letters.
+        """
+        return self._get(self.lift_entries, self.max_lift_entries, key, build)
+
+    def _get(self, entries: "OrderedDict[str, Trajectory]", max_entries: int, key: str, build) -> Trajectory:
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+
+        trajectory = self._load(key)
+        if trajectory is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            trajectory = tuple(np.array(x) for x in build())
+            self._store(key, trajectory)
+        for x in trajectory:
+            x.flags.writeable = False
+
+        entries[key] = trajectory
+        if len(entries) > max_entries:
+            entries.popitem(last=False)
+        return trajectory
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries or key in self.lift_entries
+
+    def clear(self):
+        # empties the memory (not cache_dir) and starts the statistics again
+        self.entries.clear()
+        self.lift_entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def __reduce__(self):
+        # the entries are not pickled (e.g. when letters are sent to worker processes): the shared cache stands for the
+        # shared cache of the receiving process, any other cache arrives empty with the same settings
+        if self is GLYPH_CACHE:
+            return _get_shared_cache, ()
+        return GlyphCache, (self.max_entries, self.cache_dir, self.max_lift_entries)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _load(self, key: str) -> tp.Optional[Trajectory]:
+        if self.cache_dir is None or not os.path.exists(self._path(key)):
+            return None
+        with np.load(self._path(key)) as data:
+            return data["time_steps"], data["poses"], data["velocities"], data["accelerations"]
+
+    def _store(self, key: str, trajectory: Trajectory):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        time_steps, poses, velocities, accelerations = trajectory
+        tmp_path = self._path(key) + f".{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, time_steps=time_steps, poses=poses, velocities=velocities, accelerations=accelerations)
+        os.replace(tmp_path, self._path(key))  # atomic, so other processes never read a partial file
+
+
+GLYPH_CACHE = GlyphCache()  # shared by all letters by default
+
+
+def _get_shared_cache() -> GlyphCache:
+    return GLYPH_CACHE
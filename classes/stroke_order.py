@@ -0,0 +1,181 @@
+import copy
+import typing as tp
+
+import numpy as np
+
+from .base_letters import Letter, Lift, String
+from const import *
+
+
+def lift_costs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pen-up travel from points a to points b (..., 3): no lift if they are connected,
+    otherwise up by MAX_LIFT_HEIGHT, across and down again.
+    """
+    distance = np.linalg.norm(np.asarray(a) - np.asarray(b), axis=-1)
+    return np.where(distance < 1e-6, 0.0, distance + 2 * MAX_LIFT_HEIGHT)
+
+
+def _tour_cost(tour, starts, ends, start_point) -> float:
+    entries = np.array([ends[idx] if rev else starts[idx] for idx, rev in tour])
+    exits = np.array([starts[idx] if rev else ends[idx] for idx, rev in tour])
+    cost = lift_costs(exits[:-1], entries[1:]).sum()
+    if start_point is not None:
+        cost += lift_costs(start_point, entries[0])
+    return float(cost)
+
+
+def _greedy_tour(first, starts, ends) -> tp.List[tp.Tuple[int, bool]]:
+    # nearest neighbour: always continue with the path (in either direction) whose entry is closest to the current exit
+    tour = [first]
+    remaining = np.ones(len(starts), dtype=bool)
+    remaining[first[0]] = False
+    for _ in range(len(starts) - 1):
+        idx, rev = tour[-1]
+        current = starts[idx] if rev else ends[idx]
+        costs = np.stack([lift_costs(current, starts), lift_costs(current, ends)])  # (2, N), forward / reversed
+        costs[:, ~remaining] = np.inf
+        rev, idx = np.unravel_index(np.argmin(costs), costs.shape)
+        tour.append((int(idx), bool(rev)))
+        remaining[idx] = False
+    return tour
+
+
+def _two_opt(tour, starts, ends, start_point, max_passes=100) -> tp.List[tp.Tuple[int, bool]]:
+    # reversing the part i..j of the tour (and the direction of every path in it) only changes the edges at its two ends
+    n = len(tour)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n):
+            entries = np.array([ends[idx] if rev else starts[idx] for idx, rev in tour])
+            exits = np.array([starts[idx] if rev else ends[idx] for idx, rev in tour])
+            previous = exits[i - 1] if i > 0 else start_point
+            j = np.arange(i, n)
+            delta = np.zeros(len(j))
+            if previous is not None:
+                delta += lift_costs(previous, exits[j]) - lift_costs(previous, entries[i])
+            inner = j < n - 1
+            delta[inner] += lift_costs(entries[i], entries[j[inner] + 1]) - lift_costs(exits[j[inner]], entries[j[inner] + 1])
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                j = i + best
+                tour[i:j + 1] = [(idx, not rev) for idx, rev in reversed(tour[i:j + 1])]
+                improved = True
+        if not improved:
+            break
+    return tour
+
+
+def order_paths(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    start_point: tp.Optional[np.ndarray] = None,
+    max_greedy_starts: int = 16,
+) -> tp.List[tp.Tuple[int, bool]]:
+    """
+    Order and direction of paths (strokes or letters) that minimize the pen-up travel between them:
+    a greedy nearest neighbour tour, improved by 2-opt moves.
+    starts, ends: (N, 3) first and last point of each path
+    start_point: where the pen is before the first path, None if it can start anywhere
+    max_greedy_starts: with up to this many paths, the greedy tour is tried from every path in both directions
+    returns: list of (index, reversed) in drawing order
+    """
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    if start_point is not None:
+        costs = np.stack([lift_costs(start_point, starts), lift_costs(start_point, ends)])
+        rev, idx = np.unravel_index(np.argmin(costs), costs.shape)
+        firsts = [(int(idx), bool(rev))]
+    elif len(starts) <= max_greedy_starts:
+        firsts = [(idx, rev) for idx in range(len(starts)) for rev in (False, True)]
+    else:
+        firsts = [(0, False)]
+    tours = [_two_opt(_greedy_tour(first, starts, ends), starts, ends, start_point) for first in firsts]
+    return min(tours, key=lambda tour: _tour_cost(tour, starts, ends, start_point))
+
+
+def optimize_letter(letter: Letter) -> Letter:
+    """
+    The letter with its strokes reordered and reversed to minimize the pen-up travel, the drawn strokes are the same.
+    """
+    strokes = [move for move in letter.moves if not isinstance(move, Lift)]
+    order = order_paths([stroke.key_poses[0] for stroke in strokes], [stroke.key_poses[-1] for stroke in strokes])
+    strokes = [strokes[idx].reversed() if rev else copy.copy(strokes[idx]) for idx, rev in order]
+    return Letter(letter.letter, strokes, cache=letter.cache)
+
+
+def reverse_letter(letter: Letter) -> Letter:
+    """
+    The letter drawn backwards: the strokes in the opposite order, each one reversed.
+    """
+    strokes = [move for move in letter.moves if not isinstance(move, Lift)]
+    return Letter(letter.letter, [stroke.reversed() for stroke in reversed(strokes)], cache=letter.cache)
+
+
+def optimize_string(string: String, reorder_letters: bool = True) -> String:
+    """
+    The string with the strokes of every letter optimized (see optimize_letter), and if reorder_letters,
+    the letters reordered and drawn forwards or backwards to minimize the pen-up travel between them.
+    A letter used several times is optimized once, so the letters stay shared.
+    """
+    optimized = {}  # id of the letter -> (optimized letter, reversed optimized letter or None)
+    for letter in string.letters:
+        if id(letter) not in optimized:
+            optimized[id(letter)] = [optimize_letter(letter), None]
+    letters = [optimized[id(letter)][0] for letter in string.letters]
+
+    if not reorder_letters:
+        return String(letters, string.letter_width, cache=string.cache, offsets=string.offsets)
+
+    starts = [letter.moves[0].key_poses[0] + offset for letter, offset in zip(letters, string.offsets)]
+    ends = [letter.moves[-1].key_poses[-1] + offset for letter, offset in zip(letters, string.offsets)]
+    order = order_paths(starts, ends)
+    new_letters = []
+    for idx, rev in order:
+        entry = optimized[id(string.letters[idx])]
+        if rev and entry[1] is None:
+            entry[1] = reverse_letter(entry[0])
+        new_letters.append(entry[1] if rev else entry[0])
+    offsets = [string.offsets[idx] for idx, _ in order]
+    return String(new_letters, string.letter_width, cache=string.cache, offsets=offsets)
+
+
+def pen_up_travel(string: String) -> float:
+    """
+    Total pen-up travel of the string (see lift_costs), within and between the letters.
+    """
+    lifts = [lift for letter in string.letters for lift in letter.moves if isinstance(lift, Lift)] + string.lifts
+    return float(sum(lift_costs(lift.key_poses[0], lift.key_poses[-1]) for lift in lifts))
+
+
+if __name__ == "__main__":
+    # Report: duration and pen-up travel before and after the optimization, with the fixed and the automatic lift durations
+    from .letters import get_C, get_U, get_H, get_K
+    from .font import Font
+
+    def drawn_strokes(string):
+        # the key poses of every drawn stroke in the frame of the string, independent of order and direction
+        strokes = []
+        for letter, offset in zip(string.letters, string.offsets):
+            for stroke in letter.moves:
+                if not isinstance(stroke, Lift):
+                    poses = stroke.key_poses + offset
+                    strokes.append(min(poses.round(6).tolist(), poses[::-1].round(6).tolist()))
+        return sorted(strokes)
+
+    font = Font()
+    jobs = [
+        ("CUHK", lambda: String([get_C(), get_U(), get_H(), get_K()])),
+        ("font text", lambda: font.build_string("HELLO WORLD\nMAEG 3060\nkinematics")),
+    ]
+    for name, build in jobs:
+        for retimed in [False, True]:
+            string = build()
+            optimized_string = optimize_string(string)
+            assert drawn_strokes(optimized_string) == drawn_strokes(string), "The drawn strokes changed"
+            if retimed:
+                string.retime()
+                optimized_string.retime()
+            label = "automatic" if retimed else "fixed"
+            print(f"{name}, {label} durations: {string.duration:.1f} s -> {optimized_string.duration:.1f} s, "
+                  f"pen-up travel {pen_up_travel(string):.0f} mm -> {pen_up_travel(optimized_string):.0f} mm")
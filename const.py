@@ -1,4 +1,19 @@
 MAX_WIDTH_HEIGHT = 100  # the max x and y value of the poses of the letters
 
 MAX_LIFT_HEIGHT = 20  # the max z value of the poses when lifting the pen
-LIFT_DURATION = 4  # the time to lift the pen
\ No newline at end of file
+LIFT_DURATION = 4  # the time to lift the pen
+DEFAULT_GENERATOR = "cubic"  # the trajectory generator used by the strokes, see libs/trajectory_generation.py
+DEFAULT_FREQUENCY = 50  # the sampling frequency of the trajectories in Hz
+USE_JIT = True  # use the numba kernels of libs/jit.py for ik and the splines when numba is installed
+
+WRITING_SPEED = 18  # the pen speed used to time font strokes without explicit timings, same as the hand-tuned letters
+MIN_SEGMENT_TIME = 0.5  # the minimum time between two key points of a font stroke
+
+MAX_VELOCITY = 100  # the max pen speed in mm/s, used by the automatic time scaling (see libs/time_scaling.py)
+MAX_ACCELERATION = 200  # the max pen acceleration in mm/s^2, used by the automatic time scaling
+
+# joint space checks before sending a trajectory (see libs/joint_validation.py), in degrees, set them to the limits of the arm
+JOINT_LIMITS = [(-180, 180)] * 6  # (lower, upper) of each joint
+MAX_JOINT_VELOCITY = 90  # deg/s, for each joint
+MAX_JOINT_ACCELERATION = 2000  # deg/s^2, for each joint
+MAX_JOINT_STEP = 5  # deg, a larger change of a joint between two samples is a discontinuity
@@ -0,0 +1,146 @@
+import typing as tp
+
+import numpy as np
+
+from classes.base_letters import Letter, Lift, Stroke, String, iter_move_samples
+from libs.inverse_kinematics import ik_batch
+from pipeline import to_workspace
+
+
+class JointPlan:
+    def __init__(
+        self,
+        string: String,
+        orientation: np.ndarray,
+        rotation_matrix: np.ndarray,
+        offset: np.ndarray,
+        seed_thetas: tp.Optional[np.ndarray] = None,
+    ):
+        '''
+        The joint trajectory of a string, kept with its workspace poses and the sample range of every move (see String.iter_moves),
+        for interactive editing: after a letter, a stroke or a letter position is changed, only the moves that depend on it
+        (the letter and the lifts next to it) are sampled again, and ik is only solved again from the first changed pose,
+        seeded by the joint angles before it, until the solution joins the previous one. The new samples are spliced into
+        the buffers, and the time steps after them are shifted if the duration changed.
+        '''
+        self.string = string
+        self.orientation = orientation
+        self.rotation_matrix = rotation_matrix
+        self.offset = offset
+        self.seed_thetas = seed_thetas
+
+        samples = [self._sample(*move) for move in string.iter_moves()]
+        self.bounds = np.cumsum([0] + [len(time_steps) for time_steps, _ in samples])  # move i is bounds[i]:bounds[i + 1]
+        self.time_steps = np.concatenate([time_steps for time_steps, _ in samples])
+        self.poses = np.concatenate([poses for _, poses in samples])
+        self.thetas = np.empty((len(self.time_steps), 6))
+        for i in range(len(samples)):
+            self._solve(self.bounds[i], self.bounds[i + 1])
+        # work done by the last update
+        self.num_sampled = len(samples)
+        self.num_solved = len(self.time_steps)
+
+    def _sample(self, move, time_offset, pose_offset, skip_first) -> tp.Tuple[np.ndarray, np.ndarray]:
+        chunks = list(to_workspace(
+            iter_move_samples(move, time_offset, pose_offset, skip_first, self.string.cache), self.rotation_matrix, self.offset
+        ))
+        return np.concatenate([time_steps for time_steps, _ in chunks]), np.concatenate([poses for _, poses in chunks])
+
+    def _solve(self, start: int, end: int):
+        seed_thetas = self.thetas[start - 1] if start > 0 else self.seed_thetas
+        self.thetas[start:end] = ik_batch(self.orientation, self.poses[start:end], seed_thetas=seed_thetas)
+
+    def replace_letter(self, idx: int, letter: Letter):
+        self.string.replace_letter(idx, letter)
+        self._update(idx)
+
+    def replace_stroke(self, letter_idx: int, stroke_idx: int, stroke: Stroke):
+        '''
+        Replace one stroke of letter letter_idx. The letter may be shared with other places, so only this place gets a new
+        letter, which keeps the other strokes (and their sampled trajectories).
+        '''
+        letter = self.string.letters[letter_idx]
+        strokes = [move for move in letter.moves if not isinstance(move, Lift)]
+        strokes[stroke_idx] = stroke
+        self.replace_letter(letter_idx, Letter(letter.letter, strokes, cache=letter.cache))
+
+    def set_offset(self, idx: int, offset: np.ndarray):
+        self.string.set_offset(idx, offset)
+        self._update(idx)
+
+    def _update(self, idx: int):
+        moves = list(self.string.iter_moves())
+        first_move, last_move = max(2 * idx - 1, 0), min(2 * idx + 1, len(moves) - 1)  # the lift before, the letter, the lift after
+        start, end = self.bounds[first_move], self.bounds[last_move + 1]
+        samples = [self._sample(*moves[i]) for i in range(first_move, last_move + 1)]
+        time_steps = np.concatenate([chunk_time_steps for chunk_time_steps, _ in samples])
+        poses = np.concatenate([chunk_poses for _, chunk_poses in samples])
+
+        # the poses before the first changed one keep their joint angles
+        num_common = min(len(poses), end - start)
+        changed = np.flatnonzero(np.any(poses[:num_common] != self.poses[start:start + num_common], axis=1))
+        num_unchanged = changed[0] if len(changed) != 0 else num_common
+        thetas = np.empty((len(poses), 6))
+        thetas[:num_unchanged] = self.thetas[start:start + num_unchanged]
+        previous_last = self.thetas[end - 1].copy()
+
+        # splice the new samples in
+        time_shift = time_steps[-1] - self.time_steps[end - 1]
+        self.time_steps = np.concatenate([self.time_steps[:start], time_steps, self.time_steps[end:] + time_shift])
+        self.poses = np.concatenate([self.poses[:start], poses, self.poses[end:]])
+        self.thetas = np.concatenate([self.thetas[:start], thetas, self.thetas[end:]])
+        self.bounds = np.concatenate([
+            self.bounds[:first_move + 1],
+            start + np.cumsum([len(chunk_time_steps) for chunk_time_steps, _ in samples]),
+            self.bounds[last_move + 2:] + len(poses) - (end - start),
+        ])
+        self.num_sampled = len(samples)
+        self.num_solved = 0
+
+        end = start + len(poses)
+        if num_unchanged == len(poses) == num_common:
+            return  # nothing changed
+        self._solve(start + num_unchanged, end)
+        self.num_solved = end - start - num_unchanged
+        # the moves after keep their joint angles once their seed is the same as before
+        move = last_move + 1
+        while move < len(moves) and not np.array_equal(self.thetas[self.bounds[move] - 1], previous_last):
+            previous_last = self.thetas[self.bounds[move + 1] - 1].copy()
+            self._solve(self.bounds[move], self.bounds[move + 1])
+            self.num_solved += self.bounds[move + 1] - self.bounds[move]
+            move += 1
+
+
+if __name__ == "__main__":
+    # Benchmark: edit one stroke in the middle of a long document, incremental update vs planning everything again
+    import time
+
+    from classes.font import Font
+    from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET
+
+    font = Font()
+    text = "".join(char for char in "The quick brown fox jumps over the lazy dog" if char != " ")
+    letters = [font.get_letter(text[idx % len(text)]) for idx in range(400)]
+    # in rows of 4 letters at the same place as CUHK, which is within reach
+    offsets = [np.array([idx % 4 * 100, 0, 0]) for idx in range(len(letters))]
+
+    start = time.perf_counter()
+    plan = JointPlan(String(letters, offsets=offsets), ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6))
+    full_time = time.perf_counter() - start
+    print(f"full plan: {len(plan.thetas)} samples in {full_time:.2f} s")
+
+    letter_idx = 201
+    stroke = plan.string.letters[letter_idx].moves[0]
+    poses = stroke.key_poses.copy()
+    poses[-1, :2] += [3, -2]  # move the last waypoint of the first stroke
+    edits = [
+        ("move one waypoint", lambda: plan.replace_stroke(letter_idx, 0, Stroke(poses, stroke.time_list))),
+        ("move one letter", lambda: plan.set_offset(letter_idx + 10, plan.string.offsets[letter_idx + 10] + [0, 5, 0])),
+        ("replace one letter", lambda: plan.replace_letter(letter_idx + 20, font.get_letter("W"))),
+    ]
+    for name, edit in edits:
+        start = time.perf_counter()
+        edit()
+        update_time = time.perf_counter() - start
+        print(f"{name}: {update_time * 1e3:.1f} ms ({full_time / update_time:.0f}x faster), "
+              f"{plan.num_sampled} moves sampled, ik solved for {plan.num_solved} of {len(plan.thetas)} samples")
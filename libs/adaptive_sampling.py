@@ -0,0 +1,109 @@
+import typing as tp
+
+import numpy as np
+
+
+def adaptive_indices(time_steps: np.ndarray, poses: np.ndarray, tolerance: float) -> np.ndarray:
+    '''
+    Indices of the samples to keep, such that interpolating linearly in time between the kept samples
+    deviates from every dropped sample by at most tolerance (Douglas-Peucker on the time synchronous error).
+    Straight segments at constant speed collapse to their ends, while curves and speed changes keep more samples.
+    The first and the last sample are always kept.
+    '''
+    n = len(time_steps)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        k = np.arange(i + 1, j)
+        weights = (time_steps[k] - time_steps[i]) / (time_steps[j] - time_steps[i])
+        errors = np.linalg.norm(poses[k] - (poses[i] + weights[:, None] * (poses[j] - poses[i])), axis=1)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            keep[k[worst]] = True
+            stack.extend([(i, k[worst]), (k[worst], j)])
+    return np.flatnonzero(keep)
+
+
+def adaptive_samples(samples_iter, tolerance: float):
+    '''
+    Keep only the samples of the streamed (time_steps, poses, velocities, accelerations) chunks that are needed
+    within tolerance (see adaptive_indices), which gives a non-uniform time grid.
+    '''
+    for time_steps, poses, velocities, accelerations in samples_iter:
+        if len(time_steps) == 0:
+            continue
+        indices = adaptive_indices(time_steps, poses, tolerance)
+        yield time_steps[indices], poses[indices], velocities[indices], accelerations[indices]
+
+
+def resample(
+    chunks_iter: tp.Iterable[tp.Tuple[np.ndarray, np.ndarray]],
+    frequency: float,
+    angles: bool = True,
+) -> tp.Iterator[tp.Tuple[np.ndarray, np.ndarray]]:
+    '''
+    Interpolate streamed (time_steps, values) chunks on a non-uniform time grid back to a uniform grid at frequency,
+    starting at the first time step, e.g. on the receiving side or in front of a sender.
+    angles: the values are joint angles in radians, which are interpolated without the jumps of the wrapping at +-pi
+    '''
+    previous_time = previous_values = None
+    next_time = None
+    for time_steps, values in chunks_iter:
+        if len(time_steps) == 0:
+            continue
+        values = np.asarray(values, dtype=float)
+        if previous_time is not None:
+            # interpolate across the boundary from the last sample of the previous chunk
+            time_steps = np.concatenate([[previous_time], time_steps])
+            values = np.vstack([previous_values, values])
+        else:
+            next_time = time_steps[0]
+        if angles:
+            values = np.unwrap(values, axis=0)
+        num_steps = int(np.floor((time_steps[-1] - next_time) * frequency + 1e-9)) + 1
+        grid = next_time + np.arange(max(num_steps, 0)) / frequency
+        resampled = np.stack([np.interp(grid, time_steps, column) for column in values.T], axis=-1).reshape(len(grid), -1)
+        if angles:
+            resampled = np.mod(resampled + np.pi, 2 * np.pi) - np.pi
+        next_time = next_time + num_steps / frequency
+        previous_time, previous_values = time_steps[-1], values[-1]
+        if len(grid) != 0:
+            yield grid, resampled
+
+
+if __name__ == "__main__":
+    # Report: sample count and max Cartesian error of adaptive sampling for the letters
+    from classes.letters import get_C, get_U, get_H, get_K
+    from classes.base_letters import String
+    from libs.forward_kinematics import FK_batch
+    from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, solve_ik, to_workspace
+
+    objects = [(letter.letter, letter) for letter in [get_C(), get_U(), get_H(), get_K()]]
+    objects.append(("CUHK", String([get_C(), get_U(), get_H(), get_K()])))
+    tolerances = [0.01, 0.05, 0.1, 0.5]
+    print(f"{'':>6}{'uniform':>9}" + "".join(f"{f'tol {tolerance} mm':>22}" for tolerance in tolerances))
+    for name, obj in objects:
+        dense_time_steps, dense_poses = obj.get_trajectory()[:2]
+        row = f"{name:>6}{len(dense_time_steps):>9}"
+        for tolerance in tolerances:
+            time_steps, poses = next(adaptive_samples([obj.get_trajectory()], tolerance))[:2]
+            reconstructed = np.stack([np.interp(dense_time_steps, time_steps, column) for column in poses.T], axis=-1)
+            error = np.linalg.norm(reconstructed - dense_poses, axis=1).max()
+            row += f"{len(time_steps):>8} ({len(time_steps) / len(dense_time_steps):4.0%}) {error:.3f} mm"
+        print(row)
+
+    # end to end: ik on the adaptive samples, joint angles resampled to 50 Hz, and compared through the forward kinematics
+    cuhk = String([get_C(), get_U(), get_H(), get_K()])
+    dense_poses = np.dot(cuhk.get_trajectory()[1], ROTATION_MATRIX.T) + WORKSPACE_OFFSET
+    for tolerance in tolerances:
+        chunks = solve_ik(to_workspace(adaptive_samples(cuhk.iter_samples(), tolerance), ROTATION_MATRIX, WORKSPACE_OFFSET), ORIENTATION, np.zeros(6))
+        chunks = list(chunks)
+        num_solved = sum(len(time_steps) for time_steps, _ in chunks)
+        thetas = np.concatenate([thetas for _, thetas in resample(chunks, frequency=50)])
+        error = np.linalg.norm(FK_batch(thetas)[0] - dense_poses, axis=1).max()
+        print(f"CUHK, tol {tolerance} mm: ik for {num_solved} of {len(dense_poses)} poses, "
+              f"max error after joint resampling {error:.3f} mm")
@@ -0,0 +1,233 @@
+import asyncio
+import typing as tp
+
+import numpy as np
+
+from libs.udp_sender import UDPSender
+
+Endpoint = tp.Tuple[str, int]  # (ip, port)
+Chunks = tp.Iterable[tp.Tuple[np.ndarray, np.ndarray]]  # (time_steps (n,), angles (n, 6)) chunks, as in UDPSender.stream
+
+
+class _SenderProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.transport = None
+        self.num_errors = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def error_received(self, exc):
+        # e.g. nobody is listening on the endpoint
+        self.num_errors += 1
+
+
+class _Route:
+    # the state shared by the endpoints of one trajectory: the event set when one of them gets room in its queue,
+    # and the loop time of the first command, so that they all send on the same clock
+    def __init__(self):
+        self.room = asyncio.Event()
+        self.start = None
+
+
+class AsyncUDPEndpoint:
+    def __init__(
+        self,
+        server_ip: str,
+        server_port: int,
+        queue_size: int = 256,
+        max_lag: float = 0.1,
+        late_threshold: float = 0.005,
+    ):
+        '''
+        One robot or simulator that receives commands, with its own bounded queue and pacing.
+        The producer never waits for one endpoint: it only waits while the queues of all the endpoints of its trajectory
+        are full (backpressure from the fastest one), and a full queue drops its oldest command for the new one.
+        Commands that are more than max_lag seconds behind their deadline are dropped instead of sent, so that a lagging
+        endpoint catches up with the trajectory. All the endpoints of a trajectory share the time of its first command.
+        late_threshold: a command sent later than this (in seconds) after its deadline is counted as late
+        '''
+        self.address = (server_ip, server_port)
+        self.queue_size = queue_size
+        self.max_lag = max_lag
+        self.late_threshold = late_threshold
+        self.queue = None
+        self.protocol = None
+        self.route = None
+        self.num_sent = 0
+        self.num_dropped = 0
+        self.num_late = 0
+        self.max_queue_depth = 0
+        self._lateness_sum = 0.0
+        self._lateness_sq_sum = 0.0
+        self._lateness_max = 0.0
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.route = _Route()
+        _, self.protocol = await loop.create_datagram_endpoint(_SenderProtocol, remote_addr=self.address)
+
+    def close(self):
+        if self.protocol is not None and self.protocol.transport is not None:
+            self.protocol.transport.close()
+
+    def has_room(self) -> bool:
+        return not self.queue.full()
+
+    def put_nowait(self, time_step: float, message: bytes):
+        # a full queue belongs to a lagging endpoint, whose oldest command is the first one that would be too late
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.num_dropped += 1
+        self.queue.put_nowait((time_step, message))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    async def finish(self):
+        await self.queue.put(None)
+
+    async def run(self):
+        '''
+        Send the queued commands, the first one immediately and every other one at its time step offset from the first.
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            self.route.room.set()
+            if item is None:
+                break
+            time_step, message = item
+            if self.route.start is None:
+                self.route.start = loop.time() - time_step
+            deadline = self.route.start + time_step
+            if deadline > loop.time():
+                await asyncio.sleep(deadline - loop.time())
+            lateness = loop.time() - deadline
+            if lateness > self.max_lag:
+                self.num_dropped += 1
+                continue
+            self.protocol.transport.sendto(message)
+            self.num_sent += 1
+            self.num_late += lateness > self.late_threshold
+            self._lateness_sum += lateness
+            self._lateness_sq_sum += lateness ** 2
+            self._lateness_max = max(self._lateness_max, lateness)
+
+    def get_stats(self) -> tp.Dict[str, float]:
+        '''
+        Timing statistics of the sent commands, same as UDPSender.get_stats plus the dropped commands and the queue depth.
+        '''
+        n = max(self.num_sent, 1)
+        mean = self._lateness_sum / n
+        return {
+            "endpoint": f"{self.address[0]}:{self.address[1]}",
+            "sent": self.num_sent,
+            "dropped": self.num_dropped,
+            "late": self.num_late,
+            "errors": self.protocol.num_errors if self.protocol is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "mean_lateness": mean,
+            "max_lateness": self._lateness_max,
+            "jitter": float(np.sqrt(max(self._lateness_sq_sum / n - mean ** 2, 0.0))),
+        }
+
+
+async def _produce(chunks_iter: Chunks, endpoints: tp.List[AsyncUDPEndpoint]):
+    # the chunks may be generated lazily (e.g. by ik_stream), so the next chunk is computed in a worker thread
+    # to keep the event loop free for pacing the sends
+    loop = asyncio.get_running_loop()
+    route = _Route()
+    for endpoint in endpoints:
+        endpoint.route = route
+    chunks_iter = iter(chunks_iter)
+    done = object()
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks_iter, done)
+        if chunk is done:
+            break
+        time_steps, angles = chunk
+        messages = [UDPSender.encode(angle_list) for angle_list in np.asarray(angles).tolist()]
+        for time_step, message in zip(np.asarray(time_steps).tolist(), messages):
+            # a slow endpoint only falls behind (and drops its oldest commands), it does not hold up the others
+            while not any(endpoint.has_room() for endpoint in endpoints):
+                route.room.clear()
+                await route.room.wait()
+            for endpoint in endpoints:
+                endpoint.put_nowait(time_step, message)
+    await asyncio.gather(*[endpoint.finish() for endpoint in endpoints])
+
+
+async def stream_async(
+    routes: tp.List[tp.Tuple[Chunks, tp.List[Endpoint]]],
+    queue_size: int = 256,
+    max_lag: float = 0.1,
+    late_threshold: float = 0.005,
+) -> tp.List[tp.Dict[str, float]]:
+    '''
+    Stream joint trajectories to several endpoints concurrently.
+    routes: list of (chunks, endpoints), each trajectory is fanned out to all of its endpoints
+    Returns the statistics of every endpoint, in the order of the routes.
+    '''
+    all_endpoints = []
+    tasks = []
+    try:
+        for chunks_iter, addresses in routes:
+            endpoints = [AsyncUDPEndpoint(ip, port, queue_size, max_lag, late_threshold) for ip, port in addresses]
+            for endpoint in endpoints:
+                await endpoint.open()
+                all_endpoints.append(endpoint)
+                tasks.append(endpoint.run())
+            tasks.append(_produce(chunks_iter, endpoints))
+        await asyncio.gather(*tasks)
+    finally:
+        for endpoint in all_endpoints:
+            endpoint.close()
+    return [endpoint.get_stats() for endpoint in all_endpoints]
+
+
+def stream_to_endpoints(routes: tp.List[tp.Tuple[Chunks, tp.List[Endpoint]]], **kwargs) -> tp.List[tp.Dict[str, float]]:
+    '''
+    Blocking wrapper of stream_async.
+    '''
+    return asyncio.run(stream_async(routes, **kwargs))
+
+
+if __name__ == "__main__":
+    # Fan two trajectories out to three local asyncio UDP servers standing in for the robots
+    import time
+
+    class _Server(asyncio.DatagramProtocol):
+        def __init__(self):
+            self.received = []
+
+        def datagram_received(self, data, addr):
+            self.received.append((time.monotonic(), data))
+
+    async def demo():
+        loop = asyncio.get_running_loop()
+        servers = []
+        for _ in range(3):
+            transport, server = await loop.create_datagram_endpoint(_Server, local_addr=("127.0.0.1", 0))
+            servers.append((transport, server))
+        addresses = [transport.get_extra_info("sockname") for transport, _ in servers]
+
+        time_steps = np.linspace(0, 2, 101)
+        trajectory_a = np.rad2deg(np.sin(time_steps[:, None] + np.arange(6)))
+        trajectory_b = np.rad2deg(np.cos(time_steps[:, None] + np.arange(6)))
+        routes = [
+            ([(time_steps[:50], trajectory_a[:50]), (time_steps[50:], trajectory_a[50:])], addresses[:2]),
+            ([(time_steps[::2], trajectory_b[::2])], addresses[2:]),
+        ]
+        stats = await stream_async(routes, queue_size=16)
+        await asyncio.sleep(0.1)
+        for transport, server in servers:
+            transport.close()
+
+        for endpoint_stats, (_, server) in zip(stats, servers):
+            arrival = np.array([t for t, _ in server.received])
+            print(endpoint_stats)
+            print(f"  received {len(server.received)} commands, mean interval {np.diff(arrival).mean() * 1e3:.3f} ms")
+        assert servers[0][1].received[0][1] == UDPSender.encode(trajectory_a[0].tolist())
+        assert len(servers[2][1].received) == 51
+
+    asyncio.run(demo())
@@ -0,0 +1,194 @@
+import typing as tp
+
+import numpy as np
+
+from libs.forward_kinematics import FK_batch, jacobian_batch
+from libs.inverse_kinematics import ik_batch
+
+
+def orientation_errors(targets: np.ndarray, orientations: np.ndarray) -> np.ndarray:
+    '''
+    The small rotations (N, 3) in the base frame that take each of the (N, 3, 3) orientations to the targets, (3, 3) or (N, 3, 3).
+    '''
+    E = targets @ np.swapaxes(orientations, 1, 2)
+    return 0.5 * np.stack([E[:, 2, 1] - E[:, 1, 2], E[:, 0, 2] - E[:, 2, 0], E[:, 1, 0] - E[:, 0, 1]], axis=-1)
+
+
+def rotation_vectors(rotations: np.ndarray) -> np.ndarray:
+    # axis * angle (N, 3) of (N, 3, 3) rotations by less than pi
+    angles = np.arccos(np.clip((np.trace(rotations, axis1=1, axis2=2) - 1) / 2, -1, 1))
+    scale = np.where(angles < 1e-9, 0.5, angles / (2 * np.sin(np.maximum(angles, 1e-9))))
+    return scale[:, None] * np.stack([
+        rotations[:, 2, 1] - rotations[:, 1, 2], rotations[:, 0, 2] - rotations[:, 2, 0], rotations[:, 1, 0] - rotations[:, 0, 1]
+    ], axis=-1)
+
+
+def rotation_matrices(vectors: np.ndarray) -> np.ndarray:
+    # (N, 3, 3) rotations from axis * angle (N, 3), Rodrigues' formula
+    angles = np.linalg.norm(vectors, axis=1)
+    axes = vectors / np.maximum(angles, 1e-12)[:, None]
+    K = np.zeros((len(vectors), 3, 3))
+    K[:, 0, 1], K[:, 0, 2], K[:, 1, 2] = -axes[:, 2], axes[:, 1], -axes[:, 0]
+    K -= np.swapaxes(K, 1, 2)
+    return np.eye(3) + np.sin(angles)[:, None, None] * K + (1 - np.cos(angles))[:, None, None] * (K @ K)
+
+
+def ik_track(
+    R_6_0: np.ndarray,
+    time_steps: np.ndarray,
+    poses: np.ndarray,
+    velocities: np.ndarray,
+    seed_thetas: tp.Optional[np.ndarray] = None,
+    refresh_every: int = 10,
+    tolerance: float = 0.05,
+    angle_tolerance: float = 1e-3,
+    damping: float = 1e-3,
+    stats: tp.Optional[tp.Dict[str, tp.Any]] = None,
+) -> np.ndarray:
+    '''
+    Differential (resolved-rate) ik for a dense trajectory: the joint angles of each sample are advanced from the previous
+    ones by the damped least squares solution of J(theta) dtheta = [v dt + position error, orientation error], with the
+    Cartesian velocities of the trajectory generator as the feed forward and the remaining position error fed back.
+    Full ik is solved every refresh_every samples and at the last one (the anchors, together in one ik_batch). The orientation
+    that ik reaches is not exactly R_6_0 everywhere (the roll about the pen changes with the pose), so between two anchors
+    the tracked orientation is interpolated from the ik solutions at both ends, which makes the tracking join the next anchor.
+    The segments between the anchors are advanced in lockstep, so each step is one batched jacobian for all of them.
+    A segment whose position error exceeds tolerance (mm) or orientation error angle_tolerance (rad) anywhere is solved
+    again with ik_batch, seeded by the sample before it, and so is the segment after it if its anchor is on another branch.
+    Since ik and ik_batch are vectorized (and optionally compiled, see libs/jit.py), this is not faster than ik_batch:
+    about the same speed on long jobs and slower on short ones in python -m libs.differential_ik, with orientation errors
+    of ~1e-5 rad instead of ~1e-8. Use ik_batch unless the smooth velocity feed forward of the tracking is wanted.
+    R_6_0: (3, 3) orientation of the end effector, shared by all poses
+    time_steps: (N,), poses, velocities: (N, 3) as returned by the trajectory generators, in the robot's workspace
+    seed_thetas: (6,) joint angles before the first pose, as in ik_batch
+    stats: if given, filled with the number of anchors and of the segments / samples solved again, and the max errors
+    returns: (N, 6) joint angles, wrapped to [-pi, pi] like ik
+    '''
+    N = len(poses)
+    thetas = np.empty((N, 6))
+    if N == 0:
+        return thetas
+    anchors = np.arange(0, N, refresh_every)
+    ends = np.minimum(anchors + refresh_every, N - 1)  # the anchor after each segment, or its last sample
+    keys = np.unique(np.append(anchors, N - 1))
+    key_thetas = ik_batch(R_6_0, poses[keys], seed_thetas=seed_thetas)
+    thetas[anchors] = key_thetas[:len(anchors)]
+    key_orientations = FK_batch(key_thetas)[1]
+    start_orientations = key_orientations[:len(anchors)]
+    # the rotation from the orientation at the anchor to the one at the end of its segment
+    turns = rotation_vectors(key_orientations[np.searchsorted(keys, ends)] @ np.swapaxes(start_orientations, 1, 2))
+
+    def targets(idx, segments):
+        fractions = (idx - anchors[segments]) / np.maximum(ends[segments] - anchors[segments], 1)
+        return rotation_matrices(turns[segments] * fractions[:, None]) @ start_orientations[segments]
+
+    position_errors = np.zeros(N)
+    angle_errors = np.zeros(N)
+    segments = np.arange(len(anchors))
+    current = thetas[anchors]  # continuous from the anchors, wrapped at the end
+    for step in range(refresh_every):
+        idx = anchors[segments] + step
+        positions, orientations, jacobians = jacobian_batch(current)
+        position_error = poses[idx] - positions
+        position_errors[idx] = np.linalg.norm(position_error, axis=1)
+        angle_errors[idx] = np.linalg.norm(orientation_errors(targets(idx, segments), orientations), axis=1)
+        if step != 0:
+            thetas[idx] = np.mod(current + np.pi, 2 * np.pi) - np.pi
+        has_next = (idx + 1 < N) & (step + 1 < refresh_every)  # only the last segment can be shorter
+        if not has_next.any():
+            break
+        idx, segments, current = idx[has_next], segments[has_next], current[has_next]
+        dt = time_steps[idx + 1] - time_steps[idx]
+        twist = np.concatenate([
+            velocities[idx] * dt[:, None] + position_error[has_next],
+            orientation_errors(targets(idx + 1, segments), orientations[has_next]),
+        ], axis=1)
+        jacobians = jacobians[has_next]
+        # damped least squares: J^T (J J^T + damping^2 I)^-1 twist, which stays bounded near the singularities
+        JJt = jacobians @ np.swapaxes(jacobians, 1, 2) + damping**2 * np.eye(6)
+        current = current + np.einsum("nji,nj->ni", jacobians, np.linalg.solve(JJt, twist[:, :, None])[:, :, 0])
+
+    # fall back to full ik for the segments that drifted too far, in order, so that each one is seeded by the one before
+    segment_of = np.arange(N) // refresh_every
+    pending = list(np.unique(segment_of[(position_errors > tolerance) | (angle_errors > angle_tolerance)])[::-1])
+    bad_segments = []
+    while pending:
+        bad_segment = pending.pop()
+        bad_segments.append(bad_segment)
+        start, end = anchors[bad_segment], min(anchors[bad_segment] + refresh_every, N)
+        thetas[start:end] = ik_batch(R_6_0, poses[start:end], seed_thetas=thetas[start - 1] if start > 0 else seed_thetas)
+        position_errors[start:end] = angle_errors[start:end] = 0
+        if end < N and not (pending and pending[-1] == bad_segment + 1):
+            # the next anchor was chained from the anchors, not from this segment: if the ik seeded by the end of the segment
+            # is on another branch there, the next segment is solved again from it too, until they join
+            rejoined = ik_batch(R_6_0, poses[end:end + 1], seed_thetas=thetas[end - 1])[0]
+            if np.abs(np.mod(rejoined - thetas[end] + np.pi, 2 * np.pi) - np.pi).max() > 1e-9:
+                pending.append(bad_segment + 1)
+    if stats is not None:
+        stats["anchors"] = len(anchors)
+        stats["fallback_segments"] = len(bad_segments)
+        stats["fallback_samples"] = int(np.isin(segment_of, bad_segments).sum())
+        stats["max_position_error"] = float(position_errors.max())
+        stats["max_angle_error"] = float(angle_errors.max())
+    return thetas
+
+
+if __name__ == "__main__":
+    # Benchmark: per-sample ik, ik_batch and the differential tracking on the CUHK job and a long document
+    import time
+
+    from classes.letters import get_C, get_U, get_H, get_K
+    from classes.base_letters import String
+    from classes.font import Font
+    from libs.inverse_kinematics import ik
+    from libs.joint_validation import is_valid, validate_joint_trajectory
+    from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET
+
+    def errors(thetas, poses):
+        # max position error and angle of the pen axis to the one of ORIENTATION
+        positions, orientations = FK_batch(thetas)
+        return (np.linalg.norm(positions - poses, axis=1).max(),
+                np.arccos(np.clip(orientations[:, :, 2] @ ORIENTATION[:, 2], -1, 1)).max())
+
+    font = Font()
+    text = "".join(char for char in "The quick brown fox jumps over the lazy dog" if char != " ")
+    letters = [font.get_letter(text[idx % len(text)]) for idx in range(400)]
+    jobs = [
+        ("CUHK", String([get_C(), get_U(), get_H(), get_K()])),
+        ("400 letters", String(letters, offsets=[np.array([idx % 4 * 100, 0, 0]) for idx in range(len(letters))])),
+    ]
+    for name, string in jobs:
+        time_steps, poses, velocities, _ = string.get_trajectory()
+        poses = poses @ ROTATION_MATRIX.T + WORKSPACE_OFFSET
+        velocities = velocities @ ROTATION_MATRIX.T
+        print(f"{name}: {len(poses)} samples")
+
+        num_single = min(len(poses), 5000)
+        start = time.perf_counter()
+        thetas = [np.zeros(6)]
+        for pose in poses[:num_single]:
+            thetas.append(ik(ORIENTATION, pose, curr_thetas=thetas[-1]))
+        elapsed = time.perf_counter() - start
+        position_error, angle_error = errors(np.array(thetas[1:]), poses[:num_single])
+        print(f"  per-sample ik: {num_single / elapsed:9.0f} samples/s, max error {position_error:.1e} mm, {angle_error:.1e} rad"
+              + ("" if num_single == len(poses) else f" (first {num_single} samples)"))
+
+        start = time.perf_counter()
+        reference = ik_batch(ORIENTATION, poses, seed_thetas=np.zeros(6))
+        elapsed = time.perf_counter() - start
+        position_error, angle_error = errors(reference, poses)
+        print(f"  ik_batch:      {len(poses) / elapsed:9.0f} samples/s, max error {position_error:.1e} mm, {angle_error:.1e} rad")
+
+        for refresh_every, tolerance in [(10, 0.05), (25, 0.05), (100, 0.05), (25, 0.01)]:
+            stats = {}
+            start = time.perf_counter()
+            thetas = ik_track(
+                ORIENTATION, time_steps, poses, velocities, np.zeros(6), refresh_every=refresh_every, tolerance=tolerance, stats=stats
+            )
+            elapsed = time.perf_counter() - start
+            position_error, angle_error = errors(thetas, poses)
+            joint_difference = np.abs(np.mod(thetas - reference + np.pi, 2 * np.pi) - np.pi).max()
+            valid = is_valid(validate_joint_trajectory(time_steps, thetas))
+            print(f"  ik_track every {refresh_every:3}, tolerance {tolerance} mm: {len(poses) / elapsed:9.0f} samples/s, max error {position_error:.1e} mm, "
+                  f"{angle_error:.1e} rad, {stats['fallback_segments']} of {stats['anchors']} segments solved again, "
+                  f"max difference to ik_batch {joint_difference:.1e} rad, valid: {valid}")
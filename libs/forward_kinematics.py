@@ -1,5 +1,7 @@
 import numpy as np
 
+from libs.robot_model import ROBOT
+
 
 def get_T_one_frame(from_dim: int, to_dim: int, dh_table: np.ndarray) -> np.ndarray:
     # Get the transformation matrix from one frame to another
@@ -32,23 +34,28 @@ def get_T(from_dim: int, to_dim: int, dh_table: np.ndarray) -> np.ndarray:
 
 
 def FK_single(thetas: np.ndarray):
+    return ROBOT.fk(thetas)
+
+
+def FK_batch(thetas: np.ndarray):
+    '''
+    Batched version of FK_single.
+    thetas: (N, 6) joint angles
+    returns: positions (N, 3), orientations (N, 3, 3)
+    '''
+    return ROBOT.fk_batch(thetas)
+
+
+def jacobian_batch(thetas: np.ndarray):
+    # analytic jacobian of the gripper tip, see RobotModel.jacobian_batch
+    return ROBOT.jacobian_batch(thetas)
+
+
+def jacobian_single(thetas: np.ndarray) -> np.ndarray:
+    # the (6, 6) jacobian at one set of joint angles, see jacobian_batch
     assert len(thetas) == 6, "Expected 6 joint angles"
-    arm_ang = np.arctan2(30, 264)
-    dh_table = np.array([
-        [0, 0, 159, thetas[0]],
-        [-np.pi / 2, 0, 0, thetas[1] - np.pi / 2 + arm_ang],
-        [0, 265.69, 0, thetas[2] - np.pi / 4 - arm_ang],
-        [-np.pi / 2, 30, 258, thetas[3]],
-        [np.pi / 2, 0, 0, thetas[4]],
-        [-np.pi / 2, 0, 0, thetas[5]],
-    ])
-    
-    R_6_0 = get_T(6, 0, dh_table)
-    pose_gripper = (R_6_0 @ np.array([0, 0, 123, 1]))[:3]
-    orientation = R_6_0[:3, :3]
-    return pose_gripper, orientation
-    
-    
+    return jacobian_batch(np.asarray(thetas, dtype=float)[None, :])[2][0]
+
 
 if __name__ == "__main__":
     # Test the FK function with some joint angles
@@ -56,3 +63,17 @@ if __name__ == "__main__":
     pose_gripper, orientation = FK_single(thetas)
     print("Pose of gripper:", pose_gripper)
     print("Orientation of gripper:", orientation)
+
+    # The analytic jacobian should match central differences of FK_single
+    delta = 1e-6
+    positions, orientations, jacobian = jacobian_batch(thetas[None, :])
+    numeric = np.zeros((6, 6))
+    for joint in range(6):
+        shift = np.zeros(6)
+        shift[joint] = delta
+        position_plus, orientation_plus = FK_single(thetas + shift)
+        position_minus, orientation_minus = FK_single(thetas - shift)
+        numeric[:3, joint] = (position_plus - position_minus) / (2 * delta)
+        rotation = orientation_plus @ orientation_minus.T  # ~ I + [w] 2 delta
+        numeric[3:, joint] = np.array([rotation[2, 1], rotation[0, 2], rotation[1, 0]]) / (2 * delta)
+    print("Jacobian error:", np.abs(jacobian[0] - numeric).max(), "FK error:", np.abs(positions[0] - pose_gripper).max())
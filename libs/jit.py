@@ -0,0 +1,286 @@
+import math
+
+import numpy as np
+
+from const import USE_JIT
+
+try:
+    import numba
+except ImportError:  # numba is optional, every kernel here has a NumPy implementation at its call site
+    numba = None
+
+# The kernels below are compiled with numba when it is installed, they replace the loops of the scalar ik (wrist branch
+# selection, angle_dist), the sequential wrist chaining of ik_batch and the per-sample evaluation of the splines.
+# Without numba (or with set_backend("numpy")) the NumPy code at the call sites is used, with the same results.
+BACKENDS = ["numpy"] + (["numba"] if numba is not None else [])
+_backend = "numba" if numba is not None and USE_JIT else "numpy"
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def set_backend(name: str):
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable backend: {name}, available: {BACKENDS}")
+    _backend = name
+
+
+def use_jit() -> bool:
+    return _backend == "numba"
+
+
+def _njit(function):
+    return numba.njit(cache=True)(function) if numba is not None else function
+
+
+@_njit
+def angle_dist_kernel(angles_a, angles_b):
+    # angle_dist of two 1d float arrays
+    dist = 0.0
+    for i in range(len(angles_a)):
+        dist += math.cos(angles_a[i]) * math.cos(angles_b[i]) + math.sin(angles_a[i]) * math.sin(angles_b[i])
+    return -dist
+
+
+@_njit
+def chain_wrist_kernel(transitions, first):
+    # chain_wrist, transitions: (N, 8) int8
+    chosen = np.empty(len(transitions), dtype=np.int64)
+    chosen[0] = first
+    for i in range(1, len(transitions)):
+        chosen[i] = transitions[i, chosen[i - 1]]
+    return chosen
+
+
+@_njit
+def _wrap(theta):
+    if abs(theta) > math.pi - 0.01:
+        return theta - 2 * math.pi if theta > 0 else theta + 2 * math.pi
+    return theta
+
+
+@_njit
+def ik_kernel(R_6_0, t, curr_thetas, has_curr, l1, l2, l3, phi_1, elbow_zero, theta_offsets, cos_alphas, sin_alphas, tool_length):
+    '''
+    RobotModel.ik in one compiled function, with the constants of the model as arguments.
+    R_6_0: (3, 3), t: (3,), curr_thetas: (6,) only used if has_curr
+    theta_offsets, cos_alphas, sin_alphas: (3,) of the first three joints, see RobotModel
+    '''
+    # the ee pose of the first section, see base_robot_ik_sec1
+    xp = t[0] - R_6_0[0, 2] * tool_length
+    yp = t[1] - R_6_0[1, 2] * tool_length
+    zp = t[2] - R_6_0[2, 2] * tool_length
+    theta1 = math.atan2(yp, xp)
+    A = xp * math.cos(theta1) + yp * math.sin(theta1)
+    B = zp - l1
+    alpha_3 = math.acos(min(max((A**2 + B**2 - l2**2 - l3**2) / (2 * l2 * l3), -1.0), 1.0))
+    if has_curr:
+        curr_alpha3 = elbow_zero - curr_thetas[2]
+        diff = abs(math.sin(alpha_3) - math.sin(curr_alpha3)) + abs(math.cos(alpha_3) - math.cos(curr_alpha3))
+        diff_neg = abs(math.sin(-alpha_3) - math.sin(curr_alpha3)) + abs(math.cos(-alpha_3) - math.cos(curr_alpha3))
+        if diff_neg < diff:
+            alpha_3 = -alpha_3
+    alpha_2 = math.atan2(
+        B * (l2 + l3 * math.cos(alpha_3)) - A * l3 * math.sin(alpha_3),
+        A * (l2 + l3 * math.cos(alpha_3)) + B * l3 * math.sin(alpha_3)
+    )
+    arm = np.array([theta1, math.pi / 2 - phi_1 - alpha_2, elbow_zero - alpha_3])
+
+    # R_6_3 = R_3_0^T R_6_0, with R_3_0 the product of the rotations of the first three DH frames
+    R_3_0 = np.eye(3)
+    for joint in range(3):
+        ct, st = math.cos(arm[joint] + theta_offsets[joint]), math.sin(arm[joint] + theta_offsets[joint])
+        ca, sa = cos_alphas[joint], sin_alphas[joint]
+        frame = np.array([[ct, -st, 0.0], [st * ca, ct * ca, -sa], [st * sa, ct * sa, ca]])
+        R_3_0 = R_3_0 @ frame
+    R_6_3 = R_3_0.T @ R_6_0
+
+    theta4 = -math.atan2(R_6_3[2, 2], R_6_3[0, 2])
+    theta5 = math.acos(min(max(R_6_3[1, 2], -1.0), 1.0))
+    theta6 = -math.atan2(R_6_3[1, 1], R_6_3[1, 0])
+
+    # the 8 wrist candidates in the order of the loops in RobotModel.ik, the closest valid one to curr_thetas, or the first
+    best = np.empty(3)
+    found = False
+    min_dist = np.inf
+    candidate = np.empty(3)
+    for t4 in (theta4, theta4 + math.pi):
+        for t5 in (theta5, -theta5):
+            for t6 in (theta6, theta6 + math.pi):
+                if abs(math.sin(t5) * math.cos(t6) - R_6_3[1, 0]) > 1e-10:
+                    continue
+                if abs(math.sin(t5) * math.sin(t6) + R_6_3[1, 1]) > 1e-10:
+                    continue
+                if abs(math.cos(t4) * math.sin(t5) + R_6_3[0, 2]) > 1e-10:
+                    continue
+                if abs(math.sin(t4) * math.sin(t5) - R_6_3[2, 2]) > 1e-10:
+                    continue
+                candidate[0], candidate[1], candidate[2] = t4, t5, t6
+                if not has_curr:
+                    if not found:
+                        best[:] = candidate
+                        found = True
+                    continue
+                dist = angle_dist_kernel(candidate, curr_thetas[3:])
+                if dist < min_dist:
+                    min_dist = dist
+                    best[:] = candidate
+                    found = True
+    if not found:
+        raise ValueError("No wrist solution found")
+
+    thetas = np.empty(6)
+    thetas[:3] = arm
+    thetas[3:] = best
+    for i in range(6):
+        thetas[i] = _wrap(thetas[i])
+    return thetas
+
+
+@_njit
+def _segments(time_array, time_steps):
+    # the segment of each sorted time step, same as clip(searchsorted(time_array, time_steps, "left") - 1, 0, N - 1)
+    num_segments = len(time_array) - 1
+    seg = np.empty(len(time_steps), dtype=np.int64)
+    count = 0  # number of waypoint times < t
+    for k in range(len(time_steps)):
+        while count < len(time_array) and time_array[count] < time_steps[k]:
+            count += 1
+        seg[k] = min(max(count - 1, 0), num_segments - 1)
+    return seg
+
+
+@_njit
+def cubic_eval_kernel(time_array, a, b, c, d, time_steps):
+    # poses, velocities, accelerations (T, D) of the cubic segments a + b s + c s^2 + d s^3, see trajectory_generation_cubic
+    seg = _segments(time_array, time_steps)
+    num_dims = a.shape[1]
+    poses = np.empty((len(time_steps), num_dims))
+    velocities = np.empty((len(time_steps), num_dims))
+    accelerations = np.empty((len(time_steps), num_dims))
+    for k in range(len(time_steps)):
+        i = seg[k]
+        s = time_steps[k] - time_array[i]
+        for dim in range(num_dims):
+            poses[k, dim] = a[i, dim] + b[i, dim] * s + c[i, dim] * s**2 + d[i, dim] * s**3
+            velocities[k, dim] = b[i, dim] + 2 * c[i, dim] * s + 3 * d[i, dim] * s**2
+            accelerations[k, dim] = 2 * c[i, dim] + 6 * d[i, dim] * s
+    return poses, velocities, accelerations
+
+
+@_njit
+def parabolic_eval_kernel(time_array, pos_array, segment_acc, segment_vel, t_b, time_steps):
+    # poses, velocities, accelerations (T, D) of the linear segments with parabolic blends, see trajectory_generation_parabolic
+    seg = _segments(time_array, time_steps)
+    num_dims = pos_array.shape[1]
+    poses = np.zeros((len(time_steps), num_dims))
+    velocities = np.zeros((len(time_steps), num_dims))
+    accelerations = np.zeros((len(time_steps), num_dims))
+    for k in range(len(time_steps)):
+        i = seg[k]
+        t_rel = time_steps[k] - time_array[i]
+        t_final = time_array[i + 1] - time_array[i]
+        for dim in range(num_dims):
+            acc = segment_acc[i, dim]
+            if t_rel < t_b:  # first blend
+                poses[k, dim] = (acc / 2) * t_rel**2 + pos_array[i, dim]
+                velocities[k, dim] = acc * t_rel
+                accelerations[k, dim] = acc
+            elif t_rel < t_final - t_b:  # linear
+                poses[k, dim] = acc * t_b * (t_rel - t_b) + ((acc / 2) * t_b**2 + pos_array[i, dim])
+                velocities[k, dim] = segment_vel[i, dim]
+            else:  # second blend
+                t_from_end = t_rel - t_final
+                poses[k, dim] = -(acc / 2) * t_from_end**2 + pos_array[i + 1, dim]
+                velocities[k, dim] = -acc * t_from_end
+                accelerations[k, dim] = -acc
+    return poses, velocities, accelerations
+
+
+if __name__ == "__main__":
+    # Benchmark: the backends on the CUHK job and a 10,000 character job, the splines of every move (without the glyph
+    # cache), ik_batch on the whole job chunk by chunk and per-sample ik
+    import time
+
+    from classes.base_letters import Lift, String
+    from classes.font import Font
+    from classes.letters import get_C, get_U, get_H, get_K
+    from libs import jit  # the module the call sites use, not this __main__ copy of it
+    from libs.inverse_kinematics import ik, ik_batch
+    from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, to_workspace
+
+    if numba is None:
+        print("numba is not installed, only the NumPy backend is available")
+
+    def timed(backend, function, *args):
+        jit.set_backend(backend)
+        start = time.perf_counter()
+        result = function(*args)
+        return result, time.perf_counter() - start
+
+    def solve_splines(string):
+        # every generator call of the job, uncached
+        results = []
+        for move, _, _, _ in string.iter_moves():
+            for stroke in [move] if isinstance(move, Lift) else move.moves:
+                results.append(stroke.solve_trajectory())
+        return results
+
+    def solve_per_sample(poses):
+        thetas = [np.zeros(6)]
+        for pose in poses:
+            thetas.append(ik(ORIENTATION, pose, curr_thetas=thetas[-1]))
+        return np.array(thetas[1:])
+
+    font = Font()
+    text = "".join(char for char in "The quick brown fox jumps over the lazy dog" if char != " ")
+    letters = [font.get_letter(text[idx % len(text)]) for idx in range(10000)]
+    jobs = [
+        ("CUHK", String([get_C(), get_U(), get_H(), get_K()])),
+        ("10000 characters", String(letters, offsets=[np.array([idx % 4 * 100, 0, 0]) for idx in range(len(letters))])),
+    ]
+    for backend in BACKENDS:  # compile the kernels before timing them
+        timed(backend, lambda: (solve_splines(jobs[0][1]), ik_batch(ORIENTATION, WORKSPACE_OFFSET[None, :]), ik(ORIENTATION, WORKSPACE_OFFSET)))
+
+    for name, string in jobs:
+        print(f"{name}: {string.num_steps} samples")
+        times = {backend: {"splines": 0.0, "ik_batch": 0.0, "ik": 0.0} for backend in BACKENDS}
+        errors = {"splines": 0.0, "ik_batch": 0.0, "ik": 0.0}
+        results, times[BACKENDS[0]]["splines"] = timed(BACKENDS[0], solve_splines, string)
+        for backend in BACKENDS[1:]:
+            other, times[backend]["splines"] = timed(backend, solve_splines, string)
+            errors["splines"] = max(np.abs(a - b).max() for result, result_other in zip(results, other) for a, b in zip(result, result_other))
+        del results
+
+        # ik_batch in lockstep over the chunks, each backend seeded by its own previous chunk
+        seeds = {backend: np.zeros(6) for backend in BACKENDS}
+        num_single = 20000
+        single_poses = []
+        for _, poses in to_workspace(string.iter_samples(), ROTATION_MATRIX, WORKSPACE_OFFSET):
+            if len(poses) == 0:
+                continue
+            if sum(len(chunk) for chunk in single_poses) < num_single:
+                single_poses.append(poses)
+            chunk_thetas = {}
+            for backend in BACKENDS:
+                chunk_thetas[backend], elapsed = timed(backend, ik_batch, ORIENTATION, poses, seeds[backend])
+                times[backend]["ik_batch"] += elapsed
+                seeds[backend] = chunk_thetas[backend][-1]
+            errors["ik_batch"] = max(errors["ik_batch"], *(np.abs(thetas - chunk_thetas[BACKENDS[0]]).max() for thetas in chunk_thetas.values()))
+
+        single_poses = np.concatenate(single_poses)[:num_single]
+        single_thetas = {}
+        for backend in BACKENDS:
+            single_thetas[backend], times[backend]["ik"] = timed(backend, solve_per_sample, single_poses)
+            errors["ik"] = max(errors["ik"], np.abs(single_thetas[backend] - single_thetas[BACKENDS[0]]).max())
+
+        for backend in BACKENDS:
+            print(f"  {backend:5}: splines {times[backend]['splines']:6.2f} s, ik_batch {times[backend]['ik_batch']:6.2f} s "
+                  f"({string.num_steps / times[backend]['ik_batch']:7.0f} samples/s), per-sample ik "
+                  f"{len(single_poses) / times[backend]['ik']:7.0f} samples/s")
+        if len(BACKENDS) > 1:
+            speedups = {key: times["numpy"][key] / times["numba"][key] for key in errors}
+            print(f"  speedup of numba: splines {speedups['splines']:.1f}x, ik_batch {speedups['ik_batch']:.1f}x, per-sample ik {speedups['ik']:.0f}x, "
+                  f"max differences: splines {errors['splines']:.1e} mm, ik_batch {errors['ik_batch']:.1e} rad, ik {errors['ik']:.1e} rad")
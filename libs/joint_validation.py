@@ -0,0 +1,160 @@
+import typing as tp
+
+import numpy as np
+
+from libs.robot_model import ROBOT
+from const import *
+
+
+def elbow_cosines(R_6_0: np.ndarray, poses: np.ndarray) -> np.ndarray:
+    # the elbow cosines of the course robot before ik clips them, see RobotModel.elbow_cosines
+    return ROBOT.elbow_cosines(R_6_0, poses)
+
+
+def _derivative(steps: np.ndarray, time_steps: np.ndarray) -> np.ndarray:
+    # np.gradient of the values along axis 0 from their steps (steps[i] = values[i] - values[i - 1], steps[0] unused),
+    # second order in the inside and first order at the ends, without the values (no unwrapping of the angles needed)
+    derivative = np.zeros_like(steps)
+    if len(steps) < 2:
+        return derivative
+    h = np.diff(time_steps)
+    h_left, h_right = h[:-1], h[1:]
+    h_sum = h_left + h_right
+    inside = derivative[1:-1]
+    np.multiply(steps[1:-1], (h_right / (h_left * h_sum))[:, None], out=inside)
+    inside += steps[2:] * (h_left / (h_right * h_sum))[:, None]
+    derivative[0] = steps[1] / h[0]
+    derivative[-1] = steps[-1] / h[-1]
+    return derivative
+
+
+def validate_joint_trajectory(
+    time_steps: np.ndarray,
+    thetas: np.ndarray,
+    poses: tp.Optional[np.ndarray] = None,
+    orientation: tp.Optional[np.ndarray] = None,
+    joint_limits: tp.Optional[np.ndarray] = None,
+    max_joint_velocity: tp.Union[float, np.ndarray] = np.radians(MAX_JOINT_VELOCITY),
+    max_joint_acceleration: tp.Union[float, np.ndarray] = np.radians(MAX_JOINT_ACCELERATION),
+    max_step: tp.Union[float, np.ndarray] = np.radians(MAX_JOINT_STEP),
+    wrist_margin: float = 0.05,
+) -> tp.Dict[str, np.ndarray]:
+    '''
+    Check a whole joint trajectory at once, e.g. every job before it is sent to the robot. All the checks are vectorized.
+    time_steps: (N,) in seconds
+    thetas: (N, 6) joint angles in radians, as returned by ik (wrapped to [-pi, pi])
+    poses, orientation: (N, 3) target positions and their (3, 3) or (N, 3, 3) orientation, to find the unreachable targets
+    joint_limits: (6, 2) lower and upper limit of each joint in radians, default JOINT_LIMITS in const.py
+    max_joint_velocity, max_joint_acceleration, max_step: in rad/s, rad/s^2 and rad, for all joints or (6,) per joint
+    wrist_margin: a sign change of theta5 only counts as a wrist flip if |theta5| is above this on both sides,
+        slowly passing through the wrist singularity is not a flip
+    returns: dict with
+        velocities, accelerations: (N, 6) finite differences of the unwrapped joint angles
+        not_finite, limits, velocity, acceleration: (N, 6) masks of the samples that are nan / violate the limit
+        wraps: (N, 6) mask of the samples where the angle is wrapped by 2 pi, the raw values jump there
+        jumps: (N, 6) mask of the samples that move more than max_step from the previous one (after unwrapping)
+        elbow_flips, wrist_flips: (N,) mask of the samples where the ik branch changes from the previous one
+        unreachable: (N,) mask of the poses out of reach (all False without poses)
+    '''
+    time_steps = np.asarray(time_steps, dtype=float)
+    thetas = np.asarray(thetas, dtype=float)
+    assert thetas.ndim == 2 and thetas.shape[1] == 6, "Expected (N, 6) joint angles"
+    assert len(time_steps) == len(thetas), "Expected one time step per sample"
+    if joint_limits is None:
+        joint_limits = np.radians(JOINT_LIMITS)
+    joint_limits = np.asarray(joint_limits, dtype=float)
+    n = len(thetas)
+
+    report = {"not_finite": ~np.isfinite(thetas)}
+    report["limits"] = (thetas < joint_limits[:, 0]) | (thetas > joint_limits[:, 1])
+
+    steps = np.zeros_like(thetas)
+    np.subtract(thetas[1:], thetas[:-1], out=steps[1:])
+    report["wraps"] = np.abs(steps) > np.pi
+    steps[report["wraps"]] -= np.copysign(2 * np.pi, steps[report["wraps"]])  # the actual motion of the joints
+    report["jumps"] = np.abs(steps) > max_step
+
+    velocities = _derivative(steps, time_steps)
+    velocity_steps = np.zeros_like(velocities)
+    np.subtract(velocities[1:], velocities[:-1], out=velocity_steps[1:])
+    accelerations = _derivative(velocity_steps, time_steps)
+    report["velocities"], report["accelerations"] = velocities, accelerations
+    report["velocity"] = np.abs(velocities) > max_joint_velocity
+    report["acceleration"] = np.abs(accelerations) > max_joint_acceleration
+
+    elbow = ROBOT.elbow_flipped(thetas)  # the elbow branch, see seed_is_flipped
+    wrist = np.where(thetas[:, 4] > wrist_margin, 1, np.where(thetas[:, 4] < -wrist_margin, -1, 0))
+    report["elbow_flips"] = np.zeros(n, dtype=bool)
+    report["elbow_flips"][1:] = elbow[1:] != elbow[:-1]
+    report["wrist_flips"] = np.zeros(n, dtype=bool)
+    report["wrist_flips"][1:] = wrist[1:] * wrist[:-1] < 0
+
+    report["unreachable"] = np.zeros(n, dtype=bool)
+    if poses is not None:
+        assert orientation is not None, "The orientation is needed to check the poses"
+        report["unreachable"] = np.abs(elbow_cosines(orientation, np.asarray(poses, dtype=float))) > 1 + 1e-9
+    return report
+
+
+# the checks of validate_joint_trajectory that make a trajectory unsafe to send
+ISSUES = ["not_finite", "unreachable", "limits", "velocity", "acceleration", "jumps", "elbow_flips", "wrist_flips"]
+
+
+def is_valid(report: tp.Dict[str, np.ndarray]) -> bool:
+    return not any(report[name].any() for name in ISSUES)
+
+
+def summarize(report: tp.Dict[str, np.ndarray], time_steps: np.ndarray) -> tp.List[str]:
+    '''
+    One line per failed check of validate_joint_trajectory: the number of samples, the joints and the first time.
+    '''
+    lines = []
+    for name in ISSUES + ["wraps"]:
+        mask = report[name]
+        samples = mask.any(axis=1) if mask.ndim == 2 else mask
+        if not samples.any():
+            continue
+        first = int(np.argmax(samples))
+        line = f"{name}: {int(samples.sum())} samples, first at t = {time_steps[first]:.2f} s"
+        if mask.ndim == 2:
+            line += f", joints {[int(joint) + 1 for joint in np.flatnonzero(mask.any(axis=0))]}"
+        if name == "velocity":
+            line += f", peak {np.degrees(np.abs(report['velocities']).max()):.1f} deg/s"
+        if name == "acceleration":
+            line += f", peak {np.degrees(np.abs(report['accelerations']).max()):.1f} deg/s^2"
+        lines.append(line)
+    return lines
+
+
+if __name__ == "__main__":
+    # Benchmark: validate the CUHK job and a long one (the checks of each fault are in tests/test_joint_validation.py)
+    import time
+
+    from classes.letters import get_C, get_U, get_H, get_K
+    from classes.base_letters import String
+    from classes.font import Font
+    from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, build_joint_trajectory, with_start_move
+
+    def solve(string):
+        return build_joint_trajectory(string, ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6), workers=0, return_poses=True)
+
+    font = Font()
+    text = "".join(char for char in "The quick brown fox jumps over the lazy dog" if char != " ")
+    letters = [font.get_letter(text[idx % len(text)]) for idx in range(400)]
+    jobs = [
+        ("CUHK", String([get_C(), get_U(), get_H(), get_K()])),
+        ("400 letters", String(letters, offsets=[np.array([idx % 4 * 100, 0, 0]) for idx in range(len(letters))])),
+    ]
+    for name, string in jobs:
+        time_steps, thetas, poses = solve(string)
+        start = time.perf_counter()
+        report = validate_joint_trajectory(time_steps, thetas, poses, ORIENTATION)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(thetas)} samples validated in {elapsed * 1e3:.1f} ms, valid: {is_valid(report)}")
+        for line in summarize(report, time_steps):
+            print("  " + line)
+
+    # the start move of main.py
+    time_steps, thetas, poses = solve(jobs[0][1])
+    with_start = [np.concatenate(values) for values in zip(*with_start_move([(time_steps, thetas)]))]
+    print(f"CUHK with the start move of main.py, valid: {is_valid(validate_joint_trajectory(*with_start))}")
@@ -0,0 +1,450 @@
+import typing as tp
+
+import numpy as np
+
+from libs.jit import angle_dist_kernel, chain_wrist_kernel, ik_kernel, use_jit
+
+
+def angle_dist(angles_a, angles_b):
+    assert len(angles_a) == len(angles_b), "Expected same length"
+    if use_jit():
+        return angle_dist_kernel(np.asarray(angles_a, dtype=float), np.asarray(angles_b, dtype=float))
+    dist = 0
+    for i in range(len(angles_a)):
+        dist += np.dot(
+            np.array([np.cos(angles_a[i]), np.sin(angles_a[i])]),
+            np.array([np.cos(angles_b[i]), np.sin(angles_b[i])])
+        )
+    return - dist
+
+
+def base_robot_ik_sec1(xp, yp, zp, l1, l2, l3, curr_theta3=None):
+    theta1 = np.arctan2(yp, xp)
+
+    A = xp * np.cos(theta1) + yp * np.sin(theta1)
+    B = zp - l1
+
+    theta3 = np.arccos(
+        np.clip((A**2 + B**2 - l2**2 - l3**2) / (2 * l2 * l3), -1, 1)
+    )
+    if curr_theta3 is not None:
+        diff = np.abs(np.sin(theta3) - np.sin(curr_theta3)) + np.abs(np.cos(theta3) - np.cos(curr_theta3))
+        diff_neg = np.abs(np.sin(-theta3) - np.sin(curr_theta3)) + np.abs(np.cos(-theta3) - np.cos(curr_theta3))
+        if diff_neg < diff:
+            theta3 = -theta3
+    theta2 = np.arctan2(
+        B * (l2 + l3 * np.cos(theta3)) - A * l3 * np.sin(theta3),
+        A * (l2 + l3 * np.cos(theta3)) + B * l3 * np.sin(theta3)
+    )
+
+    return theta1, theta2, theta3
+
+
+# the 8 wrist candidates as base_thetas[:, 3:] * WRIST_SIGNS + WRIST_SHIFTS, see select_wrist
+WRIST_SIGNS = np.array([[1, -1 if idx & 2 else 1, 1] for idx in range(8)], dtype=float)
+WRIST_SHIFTS = np.array([[np.pi if idx & 4 else 0, 0, np.pi if idx & 1 else 0] for idx in range(8)])
+
+
+def select_wrist(base_thetas, chosen):
+    '''
+    Joint angles with the chosen wrist candidates.
+    base_thetas: (N, 6) joint angles from ik_batch_candidates
+    chosen: (N,) index of the wrist candidate of each pose, bit 2 adds pi to theta4, bit 1 negates theta5 and bit 0 adds pi to theta6
+    '''
+    thetas = np.array(base_thetas)
+    thetas[:, 3] = np.where(chosen & 4, base_thetas[:, 3] + np.pi, base_thetas[:, 3])
+    thetas[:, 4] = np.where(chosen & 2, -base_thetas[:, 4], base_thetas[:, 4])
+    thetas[:, 5] = np.where(chosen & 1, base_thetas[:, 5] + np.pi, base_thetas[:, 5])
+    return thetas
+
+
+def wrist_dist(cos_sin_a, cos_sin_b):
+    '''
+    angle_dist between wrist angles given as [cos, sin] (..., 6) arrays, written out element by element
+    so that the result does not depend on the shape of the arrays.
+    '''
+    dist = 0
+    for i in range(3):
+        dist = dist + (cos_sin_a[..., i] * cos_sin_b[..., i] + cos_sin_a[..., i + 3] * cos_sin_b[..., i + 3])
+    return -dist
+
+
+def wrist_first_choice(cos_sin, valid, seed_thetas=None) -> int:
+    '''
+    Index of the wrist candidate of the first pose: the closest one to the seed, or the first valid one without a seed.
+    cos_sin: (8, 6) and valid: (8,) of the first pose, from ik_batch_candidates
+    '''
+    if seed_thetas is None:
+        return int(np.argmax(valid))
+    prev = np.concatenate([np.cos(seed_thetas[3:]), np.sin(seed_thetas[3:])])
+    return int(np.argmin(np.where(valid, wrist_dist(cos_sin, prev), np.inf)))
+
+
+def wrist_transitions(cos_sin, valid, block_size=8192):
+    '''
+    Table of the wrist branch selection: entry [i, k] is the index of the candidate of pose i that is closest
+    to candidate k of pose i - 1 (same metric as angle_dist). Row 0 is unused.
+    cos_sin: (N, 8, 6), valid: (N, 8) from ik_batch_candidates
+    returns: (N, 8) int8
+    '''
+    N = len(cos_sin)
+    transitions = np.full((N, 8), -1, dtype=np.int8)
+    for start in range(1, N, block_size):  # in blocks, to bound the (n, 8, 8) distance array
+        end = min(start + block_size, N)
+        dist = wrist_dist(cos_sin[start:end, :, None], cos_sin[start - 1:end - 1, None])  # (n, 8 current, 8 previous)
+        dist = np.where(valid[start:end, :, None], dist, np.inf)
+        transitions[start:end] = np.argmin(dist, axis=1)
+    return transitions
+
+
+def chain_wrist(transitions, first):
+    '''
+    Follow the wrist transitions from candidate first of pose 0, returns the (N,) chosen candidate of every pose.
+    '''
+    if use_jit():
+        return chain_wrist_kernel(transitions, first)
+    chosen = [first]
+    for row in transitions[1:].tolist():
+        chosen.append(row[chosen[-1]])
+    return np.array(chosen)
+
+
+def wrap_thetas(thetas):
+    # scale the angles to be in the range [-pi, pi]
+    return np.where(
+        np.abs(thetas) > np.pi - 0.01,
+        np.where(thetas > 0, thetas - 2 * np.pi, thetas + 2 * np.pi),
+        thetas,
+    )
+
+
+class RobotModel:
+    __slots__ = (
+        "base_height", "upper_arm", "upper_arm_offset", "forearm", "forearm_offset", "tool_length", "elbow_home",
+        "l1", "l2", "l3", "phi_1", "phi_2", "elbow_zero", "theta_offsets", "tool", "tool_homogeneous", "frame_template",
+        "cos_alphas", "sin_alphas", "ik_constants",
+    )
+
+    def __init__(
+        self,
+        base_height: float = 159,
+        upper_arm: float = 264,
+        upper_arm_offset: float = 30,
+        forearm: float = 258,
+        forearm_offset: float = 30,
+        tool_length: float = 123,
+        elbow_home: float = np.pi / 4,
+        upper_arm_dh_length: tp.Optional[float] = 265.69,
+    ):
+        '''
+        The geometry of a 6 DOF arm with a spherical wrist and its FK / IK, scalar and batched. Everything that does not
+        depend on the joint angles (the link lengths and angles of the ik, the trig of the DH alphas, the constant entries
+        of the DH frames, the tool vector) is computed once here. The defaults are the course robot, in mm and rad.
+        base_height: d1, the height of the shoulder
+        upper_arm, upper_arm_offset: the elbow is upper_arm along the upper arm and upper_arm_offset across it
+        forearm, forearm_offset: the wrist center is forearm along the forearm (d4) and forearm_offset across it (a3)
+        tool_length: from the wrist center to the pen tip, along the last joint axis
+        elbow_home: the DH angle of joint 3 at theta3 = 0 (without the angle of the upper arm offset)
+        upper_arm_dh_length: a2 of the DH table of FK, None for the length from upper_arm and upper_arm_offset
+        '''
+        self.base_height = base_height
+        self.upper_arm = upper_arm
+        self.upper_arm_offset = upper_arm_offset
+        self.forearm = forearm
+        self.forearm_offset = forearm_offset
+        self.tool_length = tool_length
+        self.elbow_home = elbow_home
+
+        # the arm of the ik: links l2, l3 from the shoulder to the elbow and the elbow to the wrist center,
+        # phi_1, phi_2 the angles of the offsets, and alpha_3 = elbow_zero - theta3
+        self.l1 = base_height
+        self.l2 = np.sqrt(upper_arm_offset**2 + upper_arm**2)
+        self.l3 = np.sqrt(forearm_offset**2 + forearm**2)
+        self.phi_1 = np.arctan2(upper_arm_offset, upper_arm)
+        self.phi_2 = np.arctan2(forearm_offset, forearm)
+        self.elbow_zero = self.phi_1 + self.phi_2 - elbow_home
+        # DH theta = theta + theta_offsets
+        self.theta_offsets = np.array([0, -np.pi / 2 + self.phi_1, -elbow_home - self.phi_1, 0, 0, 0])
+        self.tool = np.array([0, 0, tool_length], dtype=float)
+        self.tool_homogeneous = np.array([0, 0, tool_length, 1], dtype=float)
+
+        # the DH frames with the theta dependent entries left to fill in, see _frames
+        alphas = np.array([0, -np.pi / 2, 0, -np.pi / 2, np.pi / 2, -np.pi / 2])
+        a = np.array([0, 0, self.l2 if upper_arm_dh_length is None else upper_arm_dh_length, forearm_offset, 0, 0])
+        d = np.array([base_height, 0, 0, forearm, 0, 0], dtype=float)
+        self.cos_alphas, self.sin_alphas = np.cos(alphas), np.sin(alphas)
+        self.frame_template = np.zeros((6, 4, 4))
+        self.frame_template[:, 0, 3] = a
+        self.frame_template[:, 1, 2] = -self.sin_alphas
+        self.frame_template[:, 1, 3] = -d * self.sin_alphas
+        self.frame_template[:, 2, 2] = self.cos_alphas
+        self.frame_template[:, 2, 3] = d * self.cos_alphas
+        self.frame_template[:, 3, 3] = 1
+        # the arguments of ik_kernel after the pose
+        self.ik_constants = (
+            float(self.l1), float(self.l2), float(self.l3), float(self.phi_1), float(self.elbow_zero),
+            self.theta_offsets[:3].copy(), self.cos_alphas[:3].copy(), self.sin_alphas[:3].copy(), float(tool_length),
+        )
+
+    def _frames(self, dh_thetas: np.ndarray) -> np.ndarray:
+        # the (J, ..., 4, 4) frames of the first J joints (see get_T_one_frame) at (..., J) DH thetas, joint first so that
+        # the frames of one joint are contiguous
+        dh_thetas = np.moveaxis(dh_thetas, -1, 0)
+        num_joints = len(dh_thetas)
+        shape = (num_joints,) + (1,) * (dh_thetas.ndim - 1) + (4, 4)
+        frames = np.empty(dh_thetas.shape + (4, 4))
+        frames[...] = self.frame_template[:num_joints].reshape(shape)
+        ct, st = np.cos(dh_thetas), np.sin(dh_thetas)
+        ca, sa = (values[:num_joints].reshape(shape[:-2]) for values in (self.cos_alphas, self.sin_alphas))
+        frames[..., 0, 0] = ct
+        frames[..., 0, 1] = -st
+        frames[..., 1, 0] = st * ca
+        frames[..., 1, 1] = ct * ca
+        frames[..., 2, 0] = st * sa
+        frames[..., 2, 1] = ct * sa
+        return frames
+
+    def _end_transform(self, thetas: np.ndarray) -> np.ndarray:
+        # (..., 4, 4) transform of the flange in the base frame for (..., 6) joint angles
+        frames = self._frames(thetas + self.theta_offsets)
+        T = frames[0]
+        for i in range(1, 6):
+            T = T @ frames[i]
+        return T
+
+    def fk(self, thetas: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+        # position (3,) of the pen tip and orientation (3, 3) at (6,) joint angles
+        assert len(thetas) == 6, "Expected 6 joint angles"
+        T = self._end_transform(np.asarray(thetas, dtype=float))
+        return (T @ self.tool_homogeneous)[:3], T[:3, :3]
+
+    def fk_batch(self, thetas: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+        # positions (N, 3) and orientations (N, 3, 3) at (N, 6) joint angles
+        assert thetas.ndim == 2 and thetas.shape[1] == 6, "Expected (N, 6) joint angles"
+        T = self._end_transform(thetas)
+        return T[:, :3, :3] @ self.tool + T[:, :3, 3], T[:, :3, :3]
+
+    def jacobian_batch(self, thetas: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        Analytic geometric jacobian of the pen tip, from the DH frames: every joint i turns about the z axis of frame i,
+        so its column is [z_i x (p - o_i), z_i] with the frame origin o_i and the tip p in the base frame.
+        thetas: (N, 6) joint angles
+        returns: positions (N, 3), orientations (N, 3, 3) as fk_batch, and jacobians (N, 6, 6) (linear velocity in mm/s over
+            angular velocity in rad/s, per rad/s of each joint)
+        '''
+        assert thetas.ndim == 2 and thetas.shape[1] == 6, "Expected (N, 6) joint angles"
+        transforms = self._frames(thetas + self.theta_offsets)  # transforms[i] becomes frame i + 1 in the base frame
+        for i in range(1, 6):
+            np.matmul(transforms[i - 1], transforms[i], out=transforms[i])
+        axes, origins = transforms[:, :, :3, 2], transforms[:, :, :3, 3]  # (6, N, 3)
+        pose_gripper = origins[-1] + self.tool_length * axes[-1]
+        jacobian = np.concatenate([np.cross(axes, pose_gripper - origins), axes], axis=-1)  # (6, N, 6)
+        return pose_gripper, transforms[-1, :, :3, :3], np.moveaxis(jacobian, 0, 2)
+
+    def arm_rotations(self, arm_thetas: np.ndarray) -> np.ndarray:
+        # (..., 3, 3) orientation of frame 3 in the base frame for (..., 3) angles of the first three joints
+        frames = self._frames(arm_thetas + self.theta_offsets[:3])[..., :3, :3]
+        return frames[0] @ frames[1] @ frames[2]
+
+    def wrist_centers(self, R_6_0: np.ndarray, poses: np.ndarray) -> np.ndarray:
+        # the ee poses of the first section of the ik, R_6_0: (3, 3) or (N, 3, 3), poses: (3,) or (N, 3)
+        return poses - np.matmul(R_6_0, self.tool)
+
+    def elbow_cosines(self, R_6_0: np.ndarray, poses: np.ndarray) -> np.ndarray:
+        '''
+        The cosine of the elbow angle that ik needs for each pose, before ik clips it to [-1, 1] (see base_robot_ik_sec1):
+        outside of [-1, 1] the pose is out of reach and ik silently returns the closest stretched / folded arm instead.
+        R_6_0: (3, 3) orientation of the end effector, or (N, 3, 3) one per pose
+        poses: (N, 3) positions of the end effector
+        returns: (N,)
+        '''
+        wrist = self.wrist_centers(R_6_0, poses)
+        A2 = wrist[:, 0] ** 2 + wrist[:, 1] ** 2
+        B = wrist[:, 2] - self.l1
+        return (A2 + B**2 - self.l2**2 - self.l3**2) / (2 * self.l2 * self.l3)
+
+    def elbow_flipped(self, thetas: np.ndarray) -> np.ndarray:
+        # the elbow branch of (..., 6) joint angles, whether sin(alpha_3) < 0, see base_robot_ik_sec1
+        return np.sin(self.elbow_zero - thetas[..., 2]) < 0
+
+    def seed_is_flipped(self, seed_thetas) -> bool:
+        '''
+        Whether the elbow branch of the seed joint angles is flipped, see base_robot_ik_sec1.
+        '''
+        if seed_thetas is None:
+            return False
+        return bool(self.elbow_flipped(np.asarray(seed_thetas)))
+
+    def ik_sec1(self, xp, yp, zp, curr_theta3=None):
+        curr_alpha3 = self.elbow_zero - curr_theta3 if curr_theta3 is not None else None
+        theta1, alpha_2, alpha_3 = base_robot_ik_sec1(xp, yp, zp, self.l1, self.l2, self.l3, curr_theta3=curr_alpha3)
+        theta2 = np.pi / 2 - self.phi_1 - alpha_2
+        theta3 = self.elbow_zero - alpha_3
+        return theta1, theta2, theta3
+
+    def ik(self, R_6_0, t, curr_thetas=None):
+        assert R_6_0.shape == (3, 3), "Expected 3x3 rotation matrix"
+        assert t.shape == (3,), "Expected 3x1 translation vector"
+        if curr_thetas is not None:
+            assert len(curr_thetas) == 6, "Expected 6 joint angles"
+        if use_jit():
+            has_curr = curr_thetas is not None
+            curr_thetas = np.asarray(curr_thetas, dtype=float) if has_curr else np.zeros(6)
+            return ik_kernel(np.asarray(R_6_0, dtype=float), np.asarray(t, dtype=float), curr_thetas, has_curr, *self.ik_constants)
+
+        xp, yp, zp = self.wrist_centers(R_6_0, t)
+        theta1, theta2, theta3 = self.ik_sec1(xp, yp, zp, curr_theta3=curr_thetas[2] if curr_thetas is not None else None)
+        R_6_3 = self.arm_rotations(np.array([theta1, theta2, theta3])).T @ R_6_0
+
+        theta4 = - np.arctan2(R_6_3[2, 2], R_6_3[0, 2])
+        theta5 = np.arccos(np.clip(R_6_3[1, 2], -1, 1))
+        theta6 = - np.arctan2(R_6_3[1, 1], R_6_3[1, 0])
+        theta4 = [theta4, theta4 + np.pi]
+        theta5 = [theta5, -theta5]
+        theta6 = [theta6, theta6 + np.pi]
+
+        correct_angles = []
+        for t4 in theta4:
+            for t5 in theta5:
+                for t6 in theta6:
+                    if np.abs(np.sin(t5) * np.cos(t6) - R_6_3[1, 0]) > 1e-10:
+                        continue
+                    if np.abs(np.sin(t5) * np.sin(t6) + R_6_3[1, 1]) > 1e-10:
+                        continue
+                    if np.abs(np.cos(t4) * np.sin(t5) + R_6_3[0, 2]) > 1e-10:
+                        continue
+                    if np.abs(np.sin(t4) * np.sin(t5) - R_6_3[2, 2]) > 1e-10:
+                        continue
+                    correct_angles.append([t4, t5, t6])
+
+        if curr_thetas is not None:
+            # choose the angles that are closest to the current angles
+            min_dist = float("inf")
+            for angles in correct_angles:
+                dist = angle_dist(angles, curr_thetas[3:])
+                if dist < min_dist:
+                    min_dist = dist
+                    theta4, theta5, theta6 = angles
+        else:
+            # choose the first angles
+            theta4, theta5, theta6 = correct_angles[0]
+
+        # scale the angles to be in the range [-pi, pi]
+        return wrap_thetas(np.array([theta1, theta2, theta3, theta4, theta5, theta6]))
+
+    def ik_batch_candidates(self, R_6_0, poses, seed_flipped=False):
+        '''
+        The seed independent part of ik_batch: the arm solution and all 8 wrist candidates of every pose.
+        seed_flipped: whether the elbow branch of the seed is flipped, see seed_is_flipped
+        returns:
+            base_thetas: (N, 6) joint angles with the first wrist candidate, see select_wrist
+            cos_sin: (N, 8, 6) cos and sin of the wrist angles of each candidate
+            valid: (N, 8) whether each candidate solves the orientation
+        '''
+        assert R_6_0.shape == (3, 3), "Expected 3x3 rotation matrix"
+        assert poses.ndim == 2 and poses.shape[1] == 3, "Expected (N, 3) translation vectors"
+        l1, l2, l3 = self.l1, self.l2, self.l3
+
+        xp, yp, zp = self.wrist_centers(R_6_0, poses).T
+        theta1 = np.arctan2(yp, xp)
+        A = xp * np.cos(theta1) + yp * np.sin(theta1)
+        B = zp - l1
+        alpha_3 = np.arccos(
+            np.clip((A**2 + B**2 - l2**2 - l3**2) / (2 * l2 * l3), -1, 1)
+        )
+        # base_robot_ik_sec1 flips alpha_3 iff sin(alpha_3) > 0 and the previous alpha_3 has a negative sine,
+        # so once flipped by the seed, the elbow branch stays flipped until sin(alpha_3) reaches 0
+        flipped = np.logical_and.accumulate(np.sin(alpha_3) > 0) & seed_flipped
+        alpha_3 = np.where(flipped, -alpha_3, alpha_3)
+        alpha_2 = np.arctan2(
+            B * (l2 + l3 * np.cos(alpha_3)) - A * l3 * np.sin(alpha_3),
+            A * (l2 + l3 * np.cos(alpha_3)) + B * l3 * np.sin(alpha_3)
+        )
+        theta2 = np.pi / 2 - self.phi_1 - alpha_2
+        theta3 = self.elbow_zero - alpha_3
+
+        R_6_3 = np.swapaxes(self.arm_rotations(np.stack([theta1, theta2, theta3], axis=-1)), 1, 2) @ R_6_0  # (N, 3, 3)
+
+        theta4 = - np.arctan2(R_6_3[:, 2, 2], R_6_3[:, 0, 2])
+        theta5 = np.arccos(np.clip(R_6_3[:, 1, 2], -1, 1))
+        theta6 = - np.arctan2(R_6_3[:, 1, 1], R_6_3[:, 1, 0])
+        base_thetas = np.stack([theta1, theta2, theta3, theta4, theta5, theta6], axis=-1)
+
+        # all 8 wrist candidates, in the same order as the nested loops in ik
+        candidates = base_thetas[:, None, 3:] * WRIST_SIGNS + WRIST_SHIFTS  # (N, 8, 3)
+        cos_sin = np.concatenate([np.cos(candidates), np.sin(candidates)], axis=-1)  # (N, 8, 6)
+        cos4, cos6, sin4, sin5, sin6 = (cos_sin[:, :, i] for i in [0, 2, 3, 4, 5])
+        valid = (
+            (np.abs(sin5 * cos6 - R_6_3[:, 1, 0, None]) <= 1e-10)
+            & (np.abs(sin5 * sin6 + R_6_3[:, 1, 1, None]) <= 1e-10)
+            & (np.abs(cos4 * sin5 + R_6_3[:, 0, 2, None]) <= 1e-10)
+            & (np.abs(sin4 * sin5 - R_6_3[:, 2, 2, None]) <= 1e-10)
+        )
+        if not valid.any(axis=1).all():
+            raise ValueError(f"No wrist solution found for pose {np.argmin(valid.any(axis=1))}")
+        return base_thetas, cos_sin, valid
+
+    def ik_batch(self, R_6_0, poses, seed_thetas=None):
+        '''
+        Solve ik for a whole trajectory at once.
+        R_6_0: (3, 3) orientation of the end effector, shared by all poses
+        poses: (N, 3) positions of the end effector
+        seed_thetas: (6,) joint angles before the first pose, used like curr_thetas in ik
+        The arm and wrist solutions are computed as array operations, and the wrist branch selection is reduced to a table
+        of transitions that is chained sequentially, so the result is the same as calling ik on each pose with curr_thetas
+        set to the previous result.
+        returns: (N, 6) joint angles
+        '''
+        if seed_thetas is not None:
+            assert len(seed_thetas) == 6, "Expected 6 joint angles"
+        base_thetas, cos_sin, valid = self.ik_batch_candidates(R_6_0, poses, self.seed_is_flipped(seed_thetas))
+        if len(poses) == 0:
+            return base_thetas
+        first = wrist_first_choice(cos_sin[0], valid[0], seed_thetas)
+        chosen = chain_wrist(wrist_transitions(cos_sin, valid), first)
+        return wrap_thetas(select_wrist(base_thetas, chosen))
+
+
+# the robot of the course, used by the functions in forward_kinematics and inverse_kinematics
+ROBOT = RobotModel()
+
+
+if __name__ == "__main__":
+    # Benchmark: the model against the generic DH functions (get_T), and a variant of the arm
+    import time
+
+    from libs.forward_kinematics import get_T
+
+    def reference_fk(thetas):
+        # FK from a DH table built per call
+        dh_table = np.array([
+            [0, 0, 159, thetas[0]],
+            [-np.pi / 2, 0, 0, thetas[1] - np.pi / 2 + np.arctan2(30, 264)],
+            [0, 265.69, 0, thetas[2] - np.pi / 4 - np.arctan2(30, 264)],
+            [-np.pi / 2, 30, 258, thetas[3]],
+            [np.pi / 2, 0, 0, thetas[4]],
+            [-np.pi / 2, 0, 0, thetas[5]],
+        ])
+        T = get_T(6, 0, dh_table)
+        return (T @ np.array([0, 0, 123, 1]))[:3], T[:3, :3]
+
+    rng = np.random.default_rng(0)
+    thetas = rng.uniform(-1, 1, (20000, 6))
+    orientation = np.array([[0, 0, -1], [1, 0, 0], [0, -1, 0]], dtype=float)
+
+    for name, fk in [("get_T", reference_fk), ("RobotModel.fk", ROBOT.fk)]:
+        start = time.perf_counter()
+        results = [fk(theta) for theta in thetas[:5000]]
+        print(f"{name}: {5000 / (time.perf_counter() - start):.0f} calls/s")
+    positions, orientations = ROBOT.fk_batch(thetas)
+
+    start = time.perf_counter()
+    solutions = [ROBOT.ik(orientation, position) for position in positions[:5000]]
+    print(f"RobotModel.ik: {5000 / (time.perf_counter() - start):.0f} calls/s")
+
+    # a longer variant of the arm, described only by its dimensions
+    variant = RobotModel(upper_arm=300, forearm=280, tool_length=100, upper_arm_dh_length=None)
+    poses = np.array([[300, 100, 150], [350, -50, 200], [250, 0, 100]], dtype=float)
+    thetas_ik = variant.ik_batch(orientation, poses, seed_thetas=np.zeros(6))
+    positions, orientations = variant.fk_batch(thetas_ik)
+    print("variant ik -> fk error:", np.abs(positions - poses).max(), np.abs(orientations - orientation).max())
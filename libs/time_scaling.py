@@ -0,0 +1,126 @@
+import typing as tp
+
+import numpy as np
+
+from libs.trajectory_generation import get_generator
+
+
+def limit_ratios(
+    poses: np.ndarray,
+    time_list: np.ndarray,
+    generator: str,
+    max_velocity: float,
+    max_acceleration: float,
+    check_frequency: float = 500,
+    to_joints: tp.Optional[tp.Callable[[np.ndarray], np.ndarray]] = None,
+    max_joint_velocity: tp.Optional[tp.Union[float, np.ndarray]] = None,
+    max_joint_acceleration: tp.Optional[tp.Union[float, np.ndarray]] = None,
+) -> np.ndarray:
+    '''
+    How far each segment of the trajectory is from the limits, as the factor its duration has to be scaled by:
+    the peak of max(|v| / max_velocity, sqrt(|a| / max_acceleration)) over the samples of the segment, same for the joints.
+    Above 1 the segment is too fast, below 1 it could be faster.
+    to_joints: maps (N, 3) poses to (N, J) joint angles, where J is a multiple of 6 (e.g. the same stroke at several places),
+        the joint velocities and accelerations are then checked by finite differences
+    returns: (N - 1,) ratio of each segment
+    '''
+    time_steps, sampled_poses, velocities, accelerations = get_generator(generator)(poses, time_list, frequency=check_frequency)
+    ratios = np.maximum(
+        np.linalg.norm(velocities, axis=1) / max_velocity,
+        np.sqrt(np.linalg.norm(accelerations, axis=1) / max_acceleration),
+    )
+    if to_joints is not None and (max_joint_velocity is not None or max_joint_acceleration is not None):
+        thetas = np.unwrap(to_joints(sampled_poses), axis=0)  # the joint angles are wrapped to [-pi, pi]
+        num_copies = thetas.shape[1] // 6
+        joint_velocities = np.gradient(thetas, time_steps, axis=0)
+        if max_joint_velocity is not None:
+            limit = np.tile(np.broadcast_to(max_joint_velocity, 6), num_copies)
+            ratios = np.maximum(ratios, np.max(np.abs(joint_velocities) / limit, axis=1))
+        if max_joint_acceleration is not None:
+            limit = np.tile(np.broadcast_to(max_joint_acceleration, 6), num_copies)
+            joint_accelerations = np.gradient(joint_velocities, time_steps, axis=0)
+            ratios = np.maximum(ratios, np.sqrt(np.max(np.abs(joint_accelerations) / limit, axis=1)))
+
+    segment = np.clip(np.searchsorted(time_list, time_steps, side="right") - 1, 0, len(time_list) - 2)
+    segment_ratios = np.zeros(len(time_list) - 1)
+    np.maximum.at(segment_ratios, segment, ratios)
+    return segment_ratios
+
+
+def time_scale(
+    poses: np.ndarray,
+    generator: str,
+    max_velocity: float,
+    max_acceleration: float,
+    min_segment_time: float,
+    start_time: float = 0,
+    tolerance: float = 0.02,
+    max_iterations: int = 50,
+    **kwargs,
+) -> tp.List[float]:
+    '''
+    Find the shortest time list for the key poses such that the trajectory from the generator stays within the limits.
+    Every segment starts from the time of a rest to rest cubic over its length (peak velocity 1.5 d / h, peak acceleration
+    6 d / h^2), and is then scaled by its ratio (see limit_ratios) until all segments are just within the limits or at
+    min_segment_time. Since the segments influence each other, the last step scales all of them by the same factor if needed,
+    which makes the trajectory feasible.
+    kwargs: passed to limit_ratios, e.g. the joint limits
+    returns: time list of the key poses, starting at start_time
+    '''
+    poses = np.asarray(poses, dtype=float)
+    distances = np.linalg.norm(np.diff(poses, axis=0), axis=1)
+    durations = np.maximum.reduce([
+        1.5 * distances / max_velocity,
+        np.sqrt(6 * distances / max_acceleration),
+        np.full(len(distances), min_segment_time),
+    ])
+
+    def to_time_list(durations):
+        return start_time + np.concatenate([[0], np.cumsum(durations)])
+
+    for _ in range(max_iterations):
+        ratios = limit_ratios(poses, to_time_list(durations), generator, max_velocity, max_acceleration, **kwargs)
+        at_minimum = durations <= min_segment_time * (1 + 1e-9)
+        if np.all((ratios <= 1) & ((ratios >= 1 - tolerance) | at_minimum)):
+            break
+        durations = np.maximum(durations * np.clip(ratios, 0.5, 2), min_segment_time)
+
+    for _ in range(max_iterations):
+        peak = limit_ratios(poses, to_time_list(durations), generator, max_velocity, max_acceleration, **kwargs).max()
+        if peak <= 1:
+            break
+        if not np.isfinite(peak):
+            raise ValueError("The limits can not be met, e.g. the trajectory passes a singularity")
+        durations = durations * peak * (1 + 1e-3)
+    else:
+        raise ValueError("Could not find a time list within the limits")
+    return to_time_list(durations).tolist()
+
+
+if __name__ == "__main__":
+    # Report: cycle time of the CUHK job with the hand-tuned durations and with the automatic time scaling
+    from classes.letters import get_C, get_U, get_H, get_K
+    from classes.base_letters import String
+    from libs.inverse_kinematics import ik_batch
+    from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET
+    from const import *
+
+    def to_joints(poses):
+        return ik_batch(ORIENTATION, poses @ ROTATION_MATRIX.T + WORKSPACE_OFFSET)
+
+    for name, joint_limits in [
+        ("cartesian limits", {}),
+        ("cartesian + joint limits", {"to_joints": to_joints, "max_joint_velocity": 0.5, "max_joint_acceleration": 1.0}),
+    ]:
+        cuhk = String([get_C(), get_U(), get_H(), get_K()])
+        before = cuhk.duration
+        cuhk.retime(**joint_limits)
+        time_steps, poses, velocities, accelerations = cuhk.get_trajectory()
+        print(f"{name}: {before:.1f} s -> {cuhk.duration:.1f} s ({1 - cuhk.duration / before:.0%} shorter), "
+              f"peak speed {np.linalg.norm(velocities, axis=1).max():.1f} mm/s (limit {MAX_VELOCITY}), "
+              f"peak acceleration {np.linalg.norm(accelerations, axis=1).max():.1f} mm/s^2 (limit {MAX_ACCELERATION})")
+        if joint_limits:
+            thetas = np.unwrap(to_joints(poses), axis=0)
+            joint_velocities = np.gradient(thetas, time_steps, axis=0)
+            print(f"  peak joint velocity {np.abs(joint_velocities).max():.2f} rad/s, "
+                  f"peak joint acceleration {np.abs(np.gradient(joint_velocities, time_steps, axis=0)).max():.2f} rad/s^2")
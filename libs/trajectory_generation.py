@@ -0,0 +1,46 @@
+import typing as tp
+from functools import partial
+
+import numpy as np
+
+from libs.trajectory_generation_cubic import generate_trajectory_3d as generate_trajectory_3d_cubic
+from libs.trajectory_generation_parabolic import generate_trajectory_3d as generate_trajectory_3d_parabolic
+
+# A trajectory generator is called as generator(pos_list, time_list, frequency=frequency)
+# and returns (time_steps (T,), poses (T, 3), velocities (T, 3), accelerations (T, 3))
+TrajectoryGenerator = tp.Callable[..., tp.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]
+
+GENERATORS: tp.Dict[str, TrajectoryGenerator] = {}
+GENERATOR_VERSIONS: tp.Dict[str, int] = {}  # bumped on every register_generator, so that cached trajectories of a replaced generator are not reused
+
+
+def register_generator(name: str, generator: TrajectoryGenerator):
+    """
+    Register a trajectory generator so that it can be selected by name in Stroke, Letter and String.
+    """
+    GENERATORS[name] = generator
+    GENERATOR_VERSIONS[name] = GENERATOR_VERSIONS.get(name, 0) + 1
+
+
+def get_generator(name: str) -> TrajectoryGenerator:
+    if name not in GENERATORS:
+        raise ValueError(f"Unknown trajectory generator: {name}, available: {list(GENERATORS)}")
+    return GENERATORS[name]
+
+
+def generator_signature(name: str) -> str:
+    """
+    Description of the generator registered under name, used in the glyph cache keys: the function, the arguments
+    bound with functools.partial (e.g. t_b of the parabolic generator) and the registration version.
+    """
+    generator = get_generator(name)
+    args, keywords = (), {}
+    while isinstance(generator, partial):
+        args, keywords = generator.args + args, {**generator.keywords, **keywords}
+        generator = generator.func
+    function = f"{getattr(generator, '__module__', '')}.{getattr(generator, '__qualname__', type(generator).__qualname__)}"
+    return f"{name};{function};{args!r};{sorted(keywords.items())!r};v{GENERATOR_VERSIONS[name]}"
+
+
+register_generator("cubic", generate_trajectory_3d_cubic)
+register_generator("parabolic", partial(generate_trajectory_3d_parabolic, t_b=0.2))
@@ -1,68 +1,67 @@
 import numpy as np
 
+from libs.jit import cubic_eval_kernel, use_jit
+
 def generate_trajectory_3d(pos_list, time_list,	frequency):
-    
-    pos_array = np.array(pos_list)  # shape: (N, 3), N = number of waypoints
-    time_array = np.array(time_list)  # shape: (N,)
+
+    pos_array = np.array(pos_list, dtype=float)  # shape: (N, 3), N = number of waypoints (or (N, D), e.g. joint angles)
+    time_array = np.array(time_list, dtype=float)  # shape: (N,)
 
     if len(pos_array) != len(time_array):
         raise ValueError("pos_list and time_list must have the same length")
     if len(pos_array) < 2:
         raise ValueError("At least two positions are required")
-    if not all(time_array[i] < time_array[i + 1] for i in range(len(time_array) - 1)):
+    if not np.all(np.diff(time_array) > 0):
         raise ValueError("time_list must be strictly increasing")
 
     total_duration = time_array[-1] - time_array[0]
-    num_steps = int(total_duration * frequency) + 1
+    num_steps = max(int(total_duration * frequency) + 1, 2)  # at least both ends, also below one sample per duration
     time_steps = np.linspace(time_array[0], time_array[-1], num_steps)
 
-    poses = np.zeros((num_steps, 3))
-    velocities = np.zeros((num_steps, 3))
-    accelerations = np.zeros((num_steps, 3))
-
-    # dim as each dimension (x, y, z)
-    for dim in range(3):
-        positions = pos_array[:, dim]  # Shape: (N,)
-
-        # compute cubic spline coefficients for each segment
-        N = len(positions) - 1  # number of segments
-        h = np.diff(time_array)  # time intervals between intermediate points
-
-        v = np.zeros(N + 1)  # velocities at waypoints
-        v[0] = 0.0  # Zero initial velocity
-        v[N] = 0.0  # Zero final velocity
-        # compute average velocities at waypoints
-        for i in range(1, N):
-            vel_prev = (positions[i] - positions[i - 1]) / (time_array[i] - time_array[i - 1])
-            vel_next = (positions[i + 1] - positions[i]) / (time_array[i + 1] - time_array[i])
-            v[i] = (vel_prev + vel_next) / 2
-
-        # compute coefficients for each segment
-        a = positions[:-1]  # Position offset at start of segment
-        b = v[:-1]  # Velocity at start of segment
-        c = np.zeros(N)
-        d = np.zeros(N)
-
-        for i in range(N):
-            # compute c and d coefficients to ensure position and velocity continuity
-            c[i] = (3 * (positions[i + 1] - positions[i]) / h[i] - 2 * v[i] - v[i + 1]) / h[i]
-            d[i] = (2 * (positions[i] - positions[i + 1]) / h[i] + v[i] + v[i + 1]) / (h[i] ** 2)
-
-        # for i in range(N):
-        #     print(f"Segment {i} (t in [{time_array[i]}, {time_array[i+1]}]):")
-        #     print(f"  Pose: p(t) = {a[i]} + {b[i]}(t - {time_array[i]}) + {c[i]}(t - {time_array[i]})^2 + {d[i]}(t - {time_array[i]})^3")
-        #     print(f"  Velocity: v(t) = {b[i]} + 2 * {c[i]}(t - {time_array[i]}) + 3 * {d[i]}(t - {time_array[i]})^2")
-        #     print(f"  Acceleration: a(t) = 2 * {c[i]} + 6 * {d[i]}(t - {time_array[i]})")
-
-        # interpolate each time step
-        for t_idx, t in enumerate(time_steps):
-            # get corresponding segment 
-            for i in range(N):
-                if time_array[i] <= t <= time_array[i + 1] or (i == N - 1 and np.isclose(t, time_array[-1])):
-                    s = t - time_array[i]
-                    poses[t_idx, dim] = a[i] + b[i] * s + c[i] * s**2 + d[i] * s**3
-                    velocities[t_idx, dim] = b[i] + 2 * c[i] * s + 3 * d[i] * s**2
-                    accelerations[t_idx, dim] = 2 * c[i] + 6 * d[i] * s
-                    break
-                
-    return time_steps, poses, velocities, accelerations 
+    # compute cubic spline coefficients for each segment, all dimensions (x, y, z) at once
+    N = len(pos_array) - 1  # number of segments
+    h = np.diff(time_array)[:, None]  # time intervals between intermediate points, shape: (N, 1)
+
+    v = np.zeros((N + 1, pos_array.shape[1]))  # velocities at waypoints, zero initial and final velocity
+    # compute average velocities at waypoints
+    segment_vel = (pos_array[1:] - pos_array[:-1]) / h
+    v[1:N] = (segment_vel[:-1] + segment_vel[1:]) / 2
+
+    # compute coefficients for each segment, shape: (N, 3)
+    a = pos_array[:-1]  # Position offset at start of segment
+    b = v[:-1]  # Velocity at start of segment
+    # c and d ensure position and velocity continuity
+    c = (3 * (pos_array[1:] - pos_array[:-1]) / h - 2 * v[:-1] - v[1:]) / h
+    d = (2 * (pos_array[:-1] - pos_array[1:]) / h + v[:-1] + v[1:]) / (h ** 2)
+
+    if use_jit():
+        return (time_steps, *cubic_eval_kernel(time_array, a, b, c, d, time_steps))
+
+    # get corresponding segment of each time step: the first i with time_array[i] <= t <= time_array[i + 1],
+    # steps before the start or after the end (only possible through rounding) use the first or last segment
+    seg = np.clip(np.searchsorted(time_array, time_steps, side="left") - 1, 0, N - 1)
+    s = (time_steps - time_array[seg])[:, None]
+    a, b, c, d = a[seg], b[seg], c[seg], d[seg]
+
+    poses = a + b * s + c * s**2 + d * s**3
+    velocities = b + 2 * c * s + 3 * d * s**2
+    accelerations = 2 * c + 6 * d * s
+
+    return time_steps, poses, velocities, accelerations
+
+
+if __name__ == "__main__":
+    # Benchmark: scaling with the number of waypoints and the frequency
+    import time
+
+    rng = np.random.default_rng(0)
+    print(f"{'waypoints':>10}{'frequency':>10}{'samples':>10}{'time (ms)':>12}")
+    for num_waypoints in [5, 20, 80]:
+        for frequency in [50, 200, 1000]:
+            pos_list = rng.uniform(0, 100, (num_waypoints, 3))
+            time_list = np.cumsum(rng.uniform(0.5, 2, num_waypoints)) - 0.5
+
+            start = time.perf_counter()
+            result = generate_trajectory_3d(pos_list, time_list, frequency)
+            elapsed = time.perf_counter() - start
+            print(f"{num_waypoints:>10}{frequency:>10}{len(result[0]):>10}{elapsed * 1e3:>12.3f}")
@@ -1,100 +1,84 @@
 import numpy as np
-from scipy import linalg
-import matplotlib.pyplot as plt
-import typing as tp
+
+from libs.jit import parabolic_eval_kernel, use_jit
 
 def generate_trajectory_3d(pos_list, time_list,	frequency, t_b):
-    
-    pos_array = np.array(pos_list)  # Shape: (N, 3), N = number of waypoints
-    time_array = np.array(time_list)  # Shape: (N,)
+
+    pos_array = np.array(pos_list, dtype=float)  # Shape: (N, 3), N = number of waypoints (or (N, D), e.g. joint angles)
+    time_array = np.array(time_list, dtype=float)  # Shape: (N,)
 
     if len(pos_array) != len(time_array):
         raise ValueError("pos_list and time_list must have the same length")
     if len(pos_array) < 2:
         raise ValueError("At least two positions are required")
-    if not all(time_array[i] < time_array[i + 1] for i in range(len(time_array) - 1)):
+    if not np.all(np.diff(time_array) > 0):
         raise ValueError("time_list must be strictly increasing")
+    segment_duration = np.diff(time_array)  # Shape: (N-1,)
+    if not 0 < t_b <= segment_duration.min() / 2:
+        raise ValueError(f"t_b must be in (0, {segment_duration.min() / 2}], half of the shortest segment duration")
 
     # total duration and time steps
     total_duration = time_array[-1] - time_array[0]
-    num_steps = int(total_duration * frequency) + 1
+    num_steps = max(int(total_duration * frequency) + 1, 2)  # at least both ends, also below one sample per duration
     time_steps = np.linspace(time_array[0], time_array[-1], num_steps)
 
-    # initialize output arrays
-    poses = np.zeros((num_steps, 3))
-    velocities = np.zeros((num_steps, 3))
-    accelerations = np.zeros((num_steps, 3))
-
-    # Number of segments
-    N = len(pos_array) - 1
-
-    # dim as each dimension (x, y, z)
-    for dim in range(3):
-        positions = pos_array[:, dim]  # shape: (N+1,)
-        segment_acc = np.zeros(N)  # accelerations for each segment
-        segment_vel = np.zeros(N)  # linear velocities for each segment
-
-        # get acceleration and linear velocity for each segment
-        for i in range(N):
-            t_final = time_array[i + 1] - time_array[i]
-            pos_offset = positions[i]
-            pos_final = positions[i + 1]
-            # step acceleration formula
-            segment_acc[i] = (pos_offset - pos_final) / (t_b**2 - t_final * t_b)
-            # linear velocity at the end of first blend
-            segment_vel[i] = segment_acc[i] * t_b
-
-        # trajectory for each time step
-        for t_idx, t in enumerate(time_steps):
-            for i in range(N):
-                t_start = time_array[i]
-                t_final = time_array[i + 1]
-                t_rel = t - t_start
-                if t_start <= t <= t_final:
-                    pos_offset = positions[i]
-                    pos_final = positions[i + 1]
-                    acc = segment_acc[i]
-                    v_linear = segment_vel[i]
-
-                    # First blend
-                    if 0 <= t_rel < t_b:
-                        poses[t_idx, dim] = (acc / 2) * t_rel**2 + pos_offset
-                        velocities[t_idx, dim] = acc * t_rel
-                        accelerations[t_idx, dim] = acc
-                    # Linear vel
-                    elif t_b <= t_rel < t_final - t_start - t_b:
-                        pos_blend = (acc / 2) * t_b**2 + pos_offset
-                        poses[t_idx, dim] = acc * t_b * (t_rel - t_b) + pos_blend
-                        velocities[t_idx, dim] = v_linear
-                        accelerations[t_idx, dim] = 0
-                    # Second blend
-                    elif t_final - t_start - t_b <= t_rel <= t_final- t_start:
-                        t_from_end = t_rel + t_start - t_final
-                        poses[t_idx, dim] = -(acc / 2) * t_from_end**2 + pos_final
-                        velocities[t_idx, dim] = -acc * t_from_end
-                        accelerations[t_idx, dim] = -acc
-                    break                
-                
-    return time_steps, poses, velocities, accelerations 
-
-# def generate_trajectory_3d(
-#     pos_list: tp.List[np.ndarray],
-# 	time_list: tp.List[float],
-# 	frequency: int = 50,
-# ) -> tp.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-# 	"""
-# 	Generate a 3D trajectory based on given positions and time points.
-# 	Default start and end velocities are 0, and the trajectory is cubic.
-
-# 	Args:
-# 		pos_list (List[np.ndarray]): List of 3D positions (x, y, z).
-# 		time_list (List[float]): List of time points for each position.
-# 		frequency (int): Frequency of the trajectory in Hz.
-
-# 	Returns:
-# 		time_steps: (np.ndarray): Array of time steps, list of floats, len T
-# 		poses: np.ndarray (T, 3)
-# 		velocities: np.ndarray (T, 3)
-# 		accelerations: np.ndarray (T, 3)
-# 	"""
-# 	pass
+    # acceleration and linear velocity for each segment and dimension (x, y, z), shape: (N-1, 3)
+    pos_offset = pos_array[:-1]
+    pos_final = pos_array[1:]
+    # step acceleration formula
+    segment_acc = (pos_offset - pos_final) / (t_b**2 - segment_duration[:, None] * t_b)
+    # linear velocity at the end of first blend
+    segment_vel = segment_acc * t_b
+
+    if use_jit():
+        return (time_steps, *parabolic_eval_kernel(time_array, pos_array, segment_acc, segment_vel, t_b, time_steps))
+
+    # get corresponding segment of each time step, the first i with time_array[i] <= t <= time_array[i + 1]
+    seg = np.clip(np.searchsorted(time_array, time_steps, side="left") - 1, 0, len(segment_duration) - 1)
+    t_rel = time_steps - time_array[seg]
+    t_final = segment_duration[seg]
+    pos_offset, pos_final = pos_offset[seg], pos_final[seg]
+    acc, v_linear = segment_acc[seg], segment_vel[seg]
+
+    # classify each time step as first blend, linear vel or second blend
+    first_blend = t_rel < t_b
+    linear = ~first_blend & (t_rel < t_final - t_b)
+    second_blend = ~first_blend & ~linear
+
+    poses = np.zeros((num_steps, pos_array.shape[1]))
+    velocities = np.zeros((num_steps, pos_array.shape[1]))
+    accelerations = np.zeros((num_steps, pos_array.shape[1]))
+
+    # First blend
+    t_blend = t_rel[first_blend, None]
+    poses[first_blend] = (acc[first_blend] / 2) * t_blend**2 + pos_offset[first_blend]
+    velocities[first_blend] = acc[first_blend] * t_blend
+    accelerations[first_blend] = acc[first_blend]
+    # Linear vel
+    pos_blend = (acc[linear] / 2) * t_b**2 + pos_offset[linear]
+    poses[linear] = acc[linear] * t_b * (t_rel[linear, None] - t_b) + pos_blend
+    velocities[linear] = v_linear[linear]
+    # Second blend
+    t_from_end = (t_rel - t_final)[second_blend, None]
+    poses[second_blend] = -(acc[second_blend] / 2) * t_from_end**2 + pos_final[second_blend]
+    velocities[second_blend] = -acc[second_blend] * t_from_end
+    accelerations[second_blend] = -acc[second_blend]
+
+    return time_steps, poses, velocities, accelerations
+
+
+if __name__ == "__main__":
+    # Benchmark: scaling with the number of waypoints and the frequency
+    import time
+
+    rng = np.random.default_rng(0)
+    print(f"{'waypoints':>10}{'frequency':>10}{'samples':>10}{'time (ms)':>12}")
+    for num_waypoints in [5, 20, 80]:
+        for frequency in [50, 200, 1000]:
+            pos_list = rng.uniform(0, 100, (num_waypoints, 3))
+            time_list = np.cumsum(rng.uniform(0.5, 2, num_waypoints)) - 0.5
+
+            start = time.perf_counter()
+            result = generate_trajectory_3d(pos_list, time_list, frequency, t_b=0.2)
+            elapsed = time.perf_counter() - start
+            print(f"{num_waypoints:>10}{frequency:>10}{len(result[0]):>10}{elapsed * 1e3:>12.3f}")
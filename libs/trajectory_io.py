@@ -0,0 +1,195 @@
+import os
+import shutil
+import tempfile
+import typing as tp
+
+import numpy as np
+
+# A joint trajectory is stored as time_steps (N,) and joint angles (N, 6).
+# The text format only keeps the angles, the binary formats keep both.
+Writer = tp.Callable[[str, np.ndarray, np.ndarray], None]
+Reader = tp.Callable[[str], tp.Tuple[tp.Optional[np.ndarray], np.ndarray]]
+
+FORMATS: tp.Dict[str, tp.Tuple[Writer, Reader]] = {}
+EXTENSIONS: tp.Dict[str, str] = {}  # file extension -> format name
+
+
+def register_format(name: str, writer: Writer, reader: Reader, extensions: tp.List[str]):
+    """
+    Register a joint trajectory file format, selected by name or by the file extension.
+    """
+    FORMATS[name] = (writer, reader)
+    for extension in extensions:
+        EXTENSIONS[extension] = name
+
+
+def get_format(path: str, fmt: tp.Optional[str] = None) -> tp.Tuple[Writer, Reader]:
+    if fmt is None:
+        extension = os.path.splitext(path)[1]
+        if extension not in EXTENSIONS:
+            raise ValueError(f"Unknown trajectory file extension: {extension}, available: {list(EXTENSIONS)}")
+        fmt = EXTENSIONS[extension]
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown trajectory format: {fmt}, available: {list(FORMATS)}")
+    return FORMATS[fmt]
+
+
+def write_joint_trajectory(path: str, time_steps: np.ndarray, thetas: np.ndarray, fmt: tp.Optional[str] = None):
+    """
+    Write a joint trajectory, the format is taken from the file extension if not given.
+    """
+    thetas = np.asarray(thetas)
+    time_steps = np.asarray(time_steps)
+    assert thetas.ndim == 2 and thetas.shape[1] == 6, "Expected (N, 6) joint angles"
+    assert time_steps.shape == (len(thetas),), "Expected one time step per joint vector"
+    get_format(path, fmt)[0](path, time_steps, thetas)
+
+
+def read_joint_trajectory(path: str, fmt: tp.Optional[str] = None) -> tp.Tuple[tp.Optional[np.ndarray], np.ndarray]:
+    """
+    Read a joint trajectory, returns time_steps (N,) (None for the text format) and joint angles (N, 6).
+    The npy and raw formats are memory mapped, so nothing is loaded until the arrays are accessed.
+    """
+    return get_format(path, fmt)[1](path)
+
+
+def write_text(path: str, time_steps: np.ndarray, thetas: np.ndarray):
+    # "angle;" followed by the values of each joint, comma separated and terminated by ";"
+    columns = [",".join(map(str, column)) for column in thetas.T.tolist()]
+    with open(path, "w") as f:
+        f.write("angle;" + "".join(column + ";" for column in columns))
+
+
+def read_text(path: str) -> tp.Tuple[None, np.ndarray]:
+    with open(path) as f:
+        content = f.read()
+    assert content.startswith("angle;"), "Expected the angle text format"
+    columns = content[len("angle;"):].rstrip(";").split(";")
+    thetas = np.stack([np.array(column.split(","), dtype=float) if column else np.zeros(0) for column in columns], axis=1)
+    return None, thetas
+
+
+def write_npy(path: str, time_steps: np.ndarray, thetas: np.ndarray):
+    # one (N, 7) array with the time step in the first column
+    np.save(path, np.column_stack([time_steps, thetas]))
+
+
+def read_npy(path: str) -> tp.Tuple[np.ndarray, np.ndarray]:
+    data = np.load(path, mmap_mode="r")
+    return data[:, 0], data[:, 1:]
+
+
+def write_npz(path: str, time_steps: np.ndarray, thetas: np.ndarray):
+    np.savez_compressed(path, time_steps=time_steps, thetas=thetas)
+
+
+def read_npz(path: str) -> tp.Tuple[np.ndarray, np.ndarray]:
+    with np.load(path) as data:
+        return data["time_steps"], data["thetas"]
+
+
+def write_raw(path: str, time_steps: np.ndarray, thetas: np.ndarray):
+    # headerless little-endian float32 rows of (time step, 6 joint angles), N is given by the file size
+    np.column_stack([time_steps, thetas]).astype("<f4").tofile(path)
+
+
+def read_raw(path: str) -> tp.Tuple[np.ndarray, np.ndarray]:
+    data = np.memmap(path, dtype="<f4", mode="r").reshape(-1, 7)
+    return data[:, 0], data[:, 1:]
+
+
+register_format("text", write_text, read_text, [".txt"])
+register_format("npy", write_npy, read_npy, [".npy"])
+register_format("npz", write_npz, read_npz, [".npz"])
+register_format("raw", write_raw, read_raw, [".f32", ".bin"])
+
+
+class JointTrajectoryWriter:
+    def __init__(self, path: str, fmt: tp.Optional[str] = None):
+        '''
+        Write a joint trajectory chunk by chunk while it is streamed, with bounded memory, in the same file format as
+        write_joint_trajectory. The raw format is appended row by row. The text format stores one column per joint, so the
+        columns are spilled to temporary files and joined into the file on close. Use as a context manager.
+        The file is written under a temporary name and only replaces path when the writer exits without an exception,
+        so that an interrupted stream (e.g. ctrl+C) never leaves a truncated trajectory behind.
+        '''
+        if fmt is None:
+            get_format(path)
+            fmt = EXTENSIONS[os.path.splitext(path)[1]]
+        if fmt not in ["text", "raw"]:
+            raise ValueError(f"The {fmt} format cannot be written chunk by chunk, use .txt or .f32")
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.fmt = fmt
+        self.num_steps = 0
+        if fmt == "text":
+            self.columns = [tempfile.TemporaryFile("w+") for _ in range(6)]
+        else:
+            self.file = open(self.tmp_path, "wb")
+
+    def write(self, time_steps: np.ndarray, thetas: np.ndarray):
+        thetas = np.asarray(thetas)
+        assert thetas.ndim == 2 and thetas.shape[1] == 6, "Expected (n, 6) joint angles"
+        assert np.shape(time_steps) == (len(thetas),), "Expected one time step per joint vector"
+        if len(thetas) == 0:
+            return
+        if self.fmt == "text":
+            for column_file, column in zip(self.columns, thetas.T.tolist()):
+                column_file.write(("," if self.num_steps else "") + ",".join(map(str, column)))
+        else:
+            np.column_stack([time_steps, thetas]).astype("<f4").tofile(self.file)
+        self.num_steps += len(thetas)
+
+    def passthrough(self, chunks_iter):
+        # write the (time_steps, thetas) chunks while yielding them on
+        for time_steps, thetas in chunks_iter:
+            self.write(time_steps, thetas)
+            yield time_steps, thetas
+
+    def close(self, complete: bool = True):
+        '''
+        Finish the file at path, or discard it if not complete.
+        '''
+        if self.fmt == "text":
+            if complete:
+                with open(self.tmp_path, "w") as f:
+                    f.write("angle;")
+                    for column_file in self.columns:
+                        column_file.seek(0)
+                        shutil.copyfileobj(column_file, f)
+                        f.write(";")
+            for column_file in self.columns:
+                column_file.close()
+        else:
+            self.file.close()
+        if complete:
+            os.replace(self.tmp_path, self.path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self) -> "JointTrajectoryWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
+
+
+if __name__ == "__main__":
+    # Benchmark: write and read a one hour trajectory at 50 Hz in every format
+    import tempfile
+    import time
+
+    num_steps = 3600 * 50
+    time_steps = np.arange(num_steps) / 50
+    thetas = np.rad2deg(np.sin(time_steps[:, None] * 0.1 + np.arange(6)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt, extension in [("text", ".txt"), ("npy", ".npy"), ("npz", ".npz"), ("raw", ".f32")]:
+            path = os.path.join(tmp_dir, "joint_space" + extension)
+            start = time.perf_counter()
+            write_joint_trajectory(path, time_steps, thetas)
+            write_time = time.perf_counter() - start
+            start = time.perf_counter()
+            time_steps_read, thetas_read = read_joint_trajectory(path)
+            thetas_read = np.array(thetas_read)
+            read_time = time.perf_counter() - start
+            print(f"{fmt:>5}: {os.path.getsize(path) / 1e6:8.2f} MB, write {write_time * 1e3:8.1f} ms, read {read_time * 1e3:8.1f} ms")
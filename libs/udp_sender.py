@@ -0,0 +1,153 @@
+import socket
+import time
+import typing as tp
+
+import numpy as np
+
+
+class UDPSender:
+    def __init__(
+        self,
+        server_ip: str,
+        server_port: int,
+        late_threshold: float = 0.005,
+        spin_time: float = 0.001,
+        verbose: bool = False,
+    ):
+        '''
+        Send joint commands to the robot over one persistent UDP socket.
+        If you are using the simulator, you need to set the robot to Server Mode in the setting page.
+        The commands are paced against a monotonic clock by the time steps of the trajectory, so the send and encoding
+        overhead does not accumulate into drift like a fixed sleep between commands.
+        late_threshold: a command sent later than this (in seconds) after its deadline is counted as late
+        spin_time: the last part of the wait (in seconds) is spent busy waiting, which is more precise than sleeping
+        '''
+        self.address = (server_ip, server_port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.late_threshold = late_threshold
+        self.spin_time = spin_time
+        self.verbose = verbose
+        self.reset_stats()
+
+    @staticmethod
+    def encode(angle_list: tp.List[float]) -> bytes:
+        # same message format as before: comma separated angles in degrees
+        return ",".join(map(str, angle_list)).encode()
+
+    def send(self, angle_list: tp.List[float]) -> bool:
+        '''
+        Send one command immediately, returns whether it was sent.
+        '''
+        return self._send(self.encode(angle_list))
+
+    def _send(self, message: bytes) -> bool:
+        try:
+            self.socket.sendto(message, self.address)
+        except OSError as e:
+            print(f"An error occurred: {e}")
+            self.num_errors += 1
+            return False
+        if self.verbose:
+            print(f"Command sent to {self.address[0]}:{self.address[1]}, command: {message.decode()}")
+        return True
+
+    def stream(self, chunks_iter: tp.Iterable[tp.Tuple[np.ndarray, np.ndarray]]) -> tp.Dict[str, float]:
+        '''
+        Send a trajectory in real time.
+        chunks_iter: iterable of (time_steps (n,), angles (n, 6)) chunks, with the time steps in seconds;
+            the first time step is sent immediately and every other one at its offset from the first.
+        Returns the timing statistics, see get_stats.
+        '''
+        start = None
+        for time_steps, angles in chunks_iter:
+            if start is None and len(time_steps) > 0:
+                start = time.monotonic() - time_steps[0]
+            messages = [self.encode(angle_list) for angle_list in np.asarray(angles).tolist()]
+            for deadline, message in zip((start + np.asarray(time_steps)).tolist(), messages):
+                self._wait_until(deadline)
+                lateness = time.monotonic() - deadline
+                if self._send(message):
+                    self._record(lateness)
+        return self.get_stats()
+
+    def _wait_until(self, deadline: float):
+        remaining = deadline - time.monotonic()
+        if remaining > self.spin_time:
+            time.sleep(remaining - self.spin_time)
+        while time.monotonic() < deadline:
+            pass
+
+    def reset_stats(self):
+        self.num_sent = 0
+        self.num_late = 0
+        self.num_errors = 0
+        self._lateness_sum = 0.0
+        self._lateness_sq_sum = 0.0
+        self._lateness_max = 0.0
+
+    def _record(self, lateness: float):
+        # running sums only, so that the memory stays bounded for long streams
+        self.num_sent += 1
+        self.num_late += lateness > self.late_threshold
+        self._lateness_sum += lateness
+        self._lateness_sq_sum += lateness ** 2
+        self._lateness_max = max(self._lateness_max, lateness)
+
+    def get_stats(self) -> tp.Dict[str, float]:
+        '''
+        Timing statistics of the sent commands, lateness is the time between the deadline and the actual send (in seconds).
+        jitter is the standard deviation of the lateness.
+        '''
+        n = max(self.num_sent, 1)
+        mean = self._lateness_sum / n
+        return {
+            "sent": self.num_sent,
+            "late": self.num_late,
+            "errors": self.num_errors,
+            "mean_lateness": mean,
+            "max_lateness": self._lateness_max,
+            "jitter": float(np.sqrt(max(self._lateness_sq_sum / n - mean ** 2, 0.0))),
+        }
+
+    def close(self):
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    # Stream a 2 second trajectory at 50 Hz to a local UDP listener standing in for the robot
+    import threading
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("localhost", 0))
+    listener.settimeout(1)
+    received = []
+
+    def listen():
+        try:
+            while True:
+                message = listener.recv(1024)
+                received.append((time.monotonic(), message))
+        except socket.timeout:
+            pass
+
+    thread = threading.Thread(target=listen)
+    thread.start()
+
+    time_steps = np.linspace(0, 2, 101)
+    angles = np.rad2deg(np.sin(time_steps[:, None] + np.arange(6)))
+    chunks = [(time_steps[:50], angles[:50]), (time_steps[50:], angles[50:])]
+    with UDPSender(*listener.getsockname()) as sender:
+        stats = sender.stream(chunks)
+    thread.join()
+    listener.close()
+
+    print("Sender stats:", stats)
+    arrival = np.array([t for t, _ in received])
+    print(f"Received {len(received)} commands, intervals: mean {np.diff(arrival).mean() * 1e3:.3f} ms, std {np.diff(arrival).std() * 1e3:.3f} ms")
+    assert received[0][1] == UDPSender.encode(angles[0].tolist())
@@ -0,0 +1,222 @@
+import json
+import os
+import typing as tp
+
+import numpy as np
+
+from libs.forward_kinematics import jacobian_batch
+from libs.inverse_kinematics import ik_batch_candidates, select_wrist, wrap_thetas
+from libs.joint_validation import elbow_cosines
+from const import *
+
+
+def manipulability(thetas: np.ndarray) -> np.ndarray:
+    '''
+    Yoshikawa manipulability |det J| of the (6, 6) jacobian (see jacobian_batch) at each of the (N, 6) joint angles,
+    zero at the singularities.
+    '''
+    return np.abs(np.linalg.det(jacobian_batch(thetas)[2]))
+
+
+class WorkspaceMap:
+    def __init__(self, x: np.ndarray, y: np.ndarray, reachable: np.ndarray, manipulability: np.ndarray, params: tp.Dict[str, tp.Any]):
+        '''
+        Where the pen can write on the table: a grid over the writing plane (workspace x, y in mm) with, for each point,
+        whether both the pen down pose and the lifted pose are reachable at the fixed orientation within the joint limits,
+        and the manipulability there (the smaller of the two, normalized to a max of 1). Use build / load_or_build to make one.
+        x: (X,), y: (Y,) grid coordinates
+        reachable, manipulability: (Y, X)
+        params: the arguments of build, to check a cached map against
+        '''
+        self.x = x
+        self.y = y
+        self.reachable = reachable
+        self.manipulability = manipulability
+        self.params = params
+
+    @classmethod
+    def build(
+        cls,
+        orientation: np.ndarray,
+        height: float,
+        lift_height: float = MAX_LIFT_HEIGHT,
+        extent: float = 700,
+        step: float = 5,
+        elbow_margin: float = 0.02,
+        joint_margin: float = 0.05,
+    ) -> "WorkspaceMap":
+        '''
+        height: z of the writing plane in the workspace (the pen down poses), lift_height: how far the pen is lifted above it
+        extent, step: the grid covers [-extent, extent] in x and y with this spacing, in mm
+        elbow_margin: the elbow is kept this far from fully stretched / folded (cosine within 1 - elbow_margin)
+        joint_margin: the joints are kept this far (in rad) within JOINT_LIMITS, so that the strokes between the grid points
+            do not cross them either. The wrist branch of a trajectory depends on where it comes from (see ik_batch),
+            so every valid wrist branch has to be within the limits
+        '''
+        params = cls._params(orientation, height, lift_height, extent, step, elbow_margin, joint_margin)
+        x = np.arange(-extent, extent + step / 2, step)
+        y = np.arange(-extent, extent + step / 2, step)
+        grid_x, grid_y = np.meshgrid(x, y)
+        reachable = np.ones(grid_x.shape, dtype=bool)
+        scores = np.full(grid_x.shape, np.inf)
+        joint_limits = np.radians(JOINT_LIMITS) + [joint_margin, -joint_margin]
+        for z in [height, height + lift_height]:
+            poses = np.stack([grid_x.ravel(), grid_y.ravel(), np.full(grid_x.size, z)], axis=-1)
+            ok = np.abs(elbow_cosines(orientation, poses)) <= 1 - elbow_margin
+            base_thetas, _, valid = ik_batch_candidates(orientation, poses[ok])
+            within_limits = np.ones(len(base_thetas), dtype=bool)
+            for idx in range(8):
+                thetas = wrap_thetas(select_wrist(base_thetas, np.full(len(base_thetas), idx)))
+                within_limits &= ~valid[:, idx] | np.all((thetas >= joint_limits[:, 0]) & (thetas <= joint_limits[:, 1]), axis=1)
+            thetas = wrap_thetas(select_wrist(base_thetas, np.argmax(valid, axis=1)))
+            score = np.zeros(grid_x.size)
+            score[np.flatnonzero(ok)[within_limits]] = manipulability(thetas[within_limits])
+            reachable &= (score > 0).reshape(grid_x.shape)
+            scores = np.minimum(scores, score.reshape(grid_x.shape))
+        scores[~reachable] = 0
+        scores /= max(scores.max(), 1e-12)
+        return cls(x, y, reachable, scores, params)
+
+    @staticmethod
+    def _params(orientation, height, lift_height, extent, step, elbow_margin, joint_margin) -> tp.Dict[str, tp.Any]:
+        # everything the map depends on, including the joint limits in const.py
+        return {
+            "orientation": np.asarray(orientation, dtype=float).tolist(), "height": float(height), "lift_height": float(lift_height),
+            "extent": float(extent), "step": float(step), "elbow_margin": float(elbow_margin), "joint_margin": float(joint_margin),
+            "joint_limits": np.radians(JOINT_LIMITS).tolist(),
+        }
+
+    def save(self, path: str):
+        # compact: the reachability as bits, the manipulability as float16, compressed
+        np.savez_compressed(
+            path, x=self.x, y=self.y, reachable=np.packbits(self.reachable), shape=self.reachable.shape,
+            manipulability=self.manipulability.astype(np.float16), params=json.dumps(self.params),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "WorkspaceMap":
+        with np.load(path) as data:
+            shape = tuple(data["shape"])
+            reachable = np.unpackbits(data["reachable"], count=int(np.prod(shape))).reshape(shape).astype(bool)
+            return cls(data["x"], data["y"], reachable, data["manipulability"].astype(float), json.loads(str(data["params"])))
+
+    @classmethod
+    def load_or_build(cls, path: str, orientation: np.ndarray, height: float, **kwargs) -> "WorkspaceMap":
+        '''
+        Load the map cached in path if it was built with the same arguments (see build), otherwise build it and save it there.
+        '''
+        defaults = dict(zip(["lift_height", "extent", "step", "elbow_margin", "joint_margin"], cls.build.__defaults__))
+        params = cls._params(orientation, height, **{**defaults, **kwargs})
+        if os.path.exists(path):
+            workspace_map = cls.load(path)
+            if workspace_map.params == params:
+                return workspace_map
+        workspace_map = cls.build(orientation, height, **kwargs)
+        workspace_map.save(path)
+        return workspace_map
+
+    def place(
+        self,
+        lower: np.ndarray,
+        upper: np.ndarray,
+        rotation_matrix: np.ndarray,
+        scales: tp.Sequence[float] = (1, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3),
+        num_levels: int = 16,
+    ) -> tp.Optional[tp.Tuple[np.ndarray, float]]:
+        '''
+        Find where to write a text with the bounding box lower..upper (x, y in the frame of the string, see string_bounds)
+        when it is rotated by rotation_matrix into the workspace: the largest of the scales at which the rotated box fits in the
+        reachable area, placed where the lowest manipulability within the box is the highest (binary search over levels of
+        the manipulability, each level tests all the placements at once with a summed area table), and among those the most
+        central placement.
+        returns: (offset, scale) such that poses @ (scale * rotation_matrix).T + offset is the placed text
+            (the offset has the z of the writing plane), None if it does not fit at any scale
+        '''
+        step = self.params["step"]
+        corners = np.array([[x, y, 0] for x in (lower[0], upper[0]) for y in (lower[1], upper[1])], dtype=float)
+        levels = np.quantile(self.manipulability[self.reachable], np.linspace(0, 1, num_levels, endpoint=False))
+        for scale in scales:
+            rotated = corners @ (scale * np.asarray(rotation_matrix, dtype=float)).T
+            box_lower, box_upper = rotated[:, :2].min(axis=0), rotated[:, :2].max(axis=0)
+            size = np.ceil((box_upper - box_lower) / step).astype(int) + 2  # grid points covering the box wherever it is
+            best = None
+            low, high = 0, len(levels) - 1
+            while low <= high:  # the highest level at which the box fits
+                mid = (low + high) // 2
+                fits = self._fits(self.reachable & (self.manipulability >= levels[mid]), size)
+                if fits.any():
+                    best, low = fits, mid + 1
+                else:
+                    high = mid - 1
+            if best is None:
+                continue
+            rows, cols = np.nonzero(best)
+            center = np.array([cols.mean(), rows.mean()])
+            idx = np.argmin((cols - center[0]) ** 2 + (rows - center[1]) ** 2)
+            window_lower = np.array([self.x[cols[idx]], self.y[rows[idx]]])
+            offset_xy = window_lower + step / 2 - box_lower
+            return np.array([offset_xy[0], offset_xy[1], self.params["height"]]), scale
+        return None
+
+    @staticmethod
+    def _fits(good: np.ndarray, size: np.ndarray) -> np.ndarray:
+        # (Y - h + 1, X - w + 1) whether the window of size (w, h) grid points starting there is all good
+        width, height = size
+        if height > good.shape[0] or width > good.shape[1]:
+            return np.zeros((0, 0), dtype=bool)
+        table = np.zeros((good.shape[0] + 1, good.shape[1] + 1), dtype=np.int32)
+        table[1:, 1:] = np.cumsum(np.cumsum(~good, axis=0), axis=1)
+        bad = table[height:, width:] - table[:-height, width:] - table[height:, :-width] + table[:-height, :-width]
+        return bad == 0
+
+
+def string_bounds(string) -> tp.Tuple[np.ndarray, np.ndarray]:
+    '''
+    The bounding box (lower, upper) of the x, y of a String in its own frame, over the key poses of all its moves.
+    '''
+    poses = np.concatenate([
+        move.key_poses[:, :2] + np.asarray(offset)[:2] for letter, offset in zip(string.letters, string.offsets) for move in letter.moves
+    ])
+    return poses.min(axis=0), poses.max(axis=0)
+
+
+if __name__ == "__main__":
+    # Benchmark: build / load the map, and place a few texts, which are then checked with the joint validation
+    import tempfile
+    import time
+
+    from classes.base_letters import String
+    from classes.font import Font
+    from classes.letters import get_C, get_U, get_H, get_K
+    from libs.joint_validation import is_valid, validate_joint_trajectory
+    from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, build_joint_trajectory
+
+    path = os.path.join(tempfile.mkdtemp(), "workspace_map.npz")
+    for label in ["build", "load"]:
+        start = time.perf_counter()
+        workspace_map = WorkspaceMap.load_or_build(path, ORIENTATION, float(WORKSPACE_OFFSET[2]))
+        print(f"{label}: {(time.perf_counter() - start) * 1e3:.0f} ms, {workspace_map.reachable.mean():.0%} of "
+              f"{workspace_map.reachable.size} grid points reachable, file {os.path.getsize(path) / 1024:.0f} kB")
+
+    font = Font()
+    texts = [
+        ("CUHK", String([get_C(), get_U(), get_H(), get_K()])),
+        ("2 lines", font.build_string("HELLO\nWORLD")),
+        ("4 lines", font.build_string("THE QUICK\nBROWN FOX\nJUMPS OVER\nTHE LAZY DOG")),
+        ("1 long line", font.build_string("MAEG 3060 ROBOTICS")),
+    ]
+    for name, string in texts:
+        lower, upper = string_bounds(string)
+        start = time.perf_counter()
+        placement = workspace_map.place(lower, upper, ROTATION_MATRIX)
+        query_time = time.perf_counter() - start
+        if placement is None:
+            print(f"{name}: does not fit ({query_time * 1e3:.1f} ms)")
+            continue
+        offset, scale = placement
+        rotation_matrix = scale * ROTATION_MATRIX
+        time_steps, thetas, poses = build_joint_trajectory(
+            string, ORIENTATION, rotation_matrix, offset, np.zeros(6), workers=0, return_poses=True
+        )
+        valid = is_valid(validate_joint_trajectory(time_steps, thetas, poses, ORIENTATION))
+        print(f"{name}: {upper - lower} mm placed at {offset} with scale {scale} in {query_time * 1e3:.1f} ms, valid: {valid}")
@@ -0,0 +1,346 @@
+import itertools
+import os
+import typing as tp
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import numpy as np
+
+from classes.base_letters import Letter, Lift, String, iter_move_samples
+from libs.inverse_kinematics import (
+    chain_wrist,
+    ik_batch,
+    ik_batch_candidates,
+    ik_stream,
+    seed_is_flipped,
+    select_wrist,
+    wrap_thetas,
+    wrist_first_choice,
+    wrist_transitions,
+)
+from libs.adaptive_sampling import adaptive_samples
+from libs.differential_ik import ik_track
+from libs.time_scaling import time_scale
+from libs.trajectory_generation import get_generator
+from const import *
+
+# the placement of the letters in the robot's workspace and the fixed orientation of the end effector, as in main.py
+ROTATION_MATRIX = np.array([[0, 1, 0], [-1, 0, 0], [0, 0, 1]])
+WORKSPACE_OFFSET = np.array([500, 200, 100])
+ORIENTATION = np.array(
+    [[0, 0, 1],
+    [1, 0, 0],
+    [0, -1, 0]]
+)
+
+
+def to_workspace(samples_iter, rotation_matrix, offset):
+    '''
+    adjust the streamed trajectory chunks to fit the robot's workspace, yields the (n,) time steps and (n, 3) poses of each chunk
+    '''
+    for time_steps, poses, velocities, accelerations in samples_iter:
+        yield time_steps, np.dot(poses, rotation_matrix.T) + offset
+
+
+def solve_ik(chunks_iter, orientation, seed_thetas):
+    '''
+    solve ik for the streamed chunks, yields the (n,) time steps and (n, 6) joint angles of each chunk
+    '''
+    chunks_iter, poses_iter = itertools.tee(chunks_iter)
+    thetas_iter = ik_stream(orientation, (poses for _, poses in poses_iter), seed_thetas=seed_thetas)
+    for (time_steps, _), thetas in zip(chunks_iter, thetas_iter):
+        yield time_steps, thetas
+
+
+def track_ik(samples_iter, orientation, rotation_matrix, offset, seed_thetas):
+    '''
+    solve_ik on the chunks of to_workspace with the differential tracking (see libs/differential_ik.py), which also needs the
+    velocities of the samples, yields the (n,) time steps and (n, 6) joint angles of each chunk
+    '''
+    for time_steps, poses, velocities, accelerations in samples_iter:
+        if len(time_steps) == 0:
+            continue
+        thetas = ik_track(
+            orientation, time_steps, np.dot(poses, rotation_matrix.T) + offset, np.dot(velocities, rotation_matrix.T), seed_thetas
+        )
+        seed_thetas = thetas[-1]
+        yield time_steps, thetas
+
+
+def plan_joint_lift(
+    lift: Lift,
+    time_offset: float,
+    pose_offset: np.ndarray,
+    skip_first: bool,
+    orientation: np.ndarray,
+    rotation_matrix: np.ndarray,
+    offset: np.ndarray,
+    seed_thetas: tp.Optional[np.ndarray],
+    max_joint_velocity: tp.Optional[tp.Union[float, np.ndarray]] = None,
+    max_joint_acceleration: tp.Optional[tp.Union[float, np.ndarray]] = None,
+) -> tp.Tuple[np.ndarray, np.ndarray, float]:
+    '''
+    Plan a lift directly in joint space: ik is only solved at its key poses (up, across, down), and the joint angles in between
+    follow a spline through them with the generator of the lift, instead of solving ik at every sample of the Cartesian lift.
+    The lift keeps its time list, or gets the shortest one within the joint limits if any is given (see time_scale),
+    since nothing is drawn and the Cartesian limits do not apply.
+    returns the (n,) time steps and (n, 6) joint angles of the lift, and its duration
+    '''
+    waypoints = ik_batch(orientation, np.dot(lift.key_poses + pose_offset, rotation_matrix.T) + offset, seed_thetas=seed_thetas)
+    # unwrap from the seed, so that the spline does not turn a joint the long way around
+    if seed_thetas is not None:
+        waypoints = np.unwrap(np.vstack([seed_thetas, waypoints]), axis=0)[1:]
+    else:
+        waypoints = np.unwrap(waypoints, axis=0)
+    time_list = lift.time_list
+    if max_joint_velocity is not None or max_joint_acceleration is not None:
+        time_list = time_scale(
+            waypoints, lift.generator, np.inf, np.inf, MIN_SEGMENT_TIME, start_time=lift.time_list[0],
+            to_joints=lambda thetas: thetas, max_joint_velocity=max_joint_velocity, max_joint_acceleration=max_joint_acceleration,
+        )
+    time_steps, thetas, _, _ = get_generator(lift.generator)(waypoints, time_list, frequency=lift.frequency)
+    first = 1 if skip_first else 0
+    return time_steps[first:] + time_offset, wrap_thetas(thetas[first:]), time_list[-1] - time_list[0]
+
+
+def solve_string(
+    string: String,
+    orientation: np.ndarray,
+    rotation_matrix: np.ndarray,
+    offset: np.ndarray,
+    seed_thetas: tp.Optional[np.ndarray] = None,
+    joint_space_lifts: bool = False,
+    tolerance: tp.Optional[float] = None,
+    differential_ik: bool = False,
+    **joint_limits,
+):
+    '''
+    solve the joint trajectory of the string move by move, yields the (n,) time steps and (n, 6) joint angles of each chunk
+    joint_space_lifts: plan the lifts within and between the letters in joint space (see plan_joint_lift), the letters are
+        then sampled stroke by stroke instead of through the glyph cache
+    tolerance: only keep the samples needed within this Cartesian tolerance (see adaptive_samples), the chunks are then
+        on a non-uniform time grid, which libs/adaptive_sampling.resample turns back into a uniform one
+    differential_ik: advance the joint angles with the jacobian between periodic full ik solutions (see ik_track, not faster than ik_batch)
+    joint_limits: max_joint_velocity and / or max_joint_acceleration for the joint space lifts
+    '''
+    def solve(samples_iter, seed_thetas):
+        if tolerance is not None:
+            samples_iter = adaptive_samples(samples_iter, tolerance)
+        if differential_ik:
+            return track_ik(samples_iter, orientation, rotation_matrix, offset, seed_thetas)
+        return solve_ik(to_workspace(samples_iter, rotation_matrix, offset), orientation, seed_thetas)
+
+    if not joint_space_lifts:
+        yield from solve(string.iter_samples(), seed_thetas)
+        return
+
+    time_shift = 0  # the lifts retimed within the joint limits move everything after them
+    for move, time_offset, pose_offset, skip_first in string.iter_moves():
+        parts = [(move, time_offset, skip_first)]
+        if isinstance(move, Letter):
+            parts = []
+            for i, part in enumerate(move.moves):
+                parts.append((part, time_offset, skip_first or i != 0))
+                time_offset += part.duration
+        for part, part_time, part_skip in parts:
+            if isinstance(part, Lift):
+                time_steps, thetas, duration = plan_joint_lift(
+                    part, part_time + time_shift, pose_offset, part_skip, orientation, rotation_matrix, offset, seed_thetas, **joint_limits
+                )
+                time_shift += duration - part.duration
+                seed_thetas = thetas[-1]
+                yield time_steps, thetas
+                continue
+            for time_steps, thetas in solve(part.iter_samples(part_time + time_shift, pose_offset, part_skip), seed_thetas):
+                seed_thetas = thetas[-1]
+                yield time_steps, thetas
+
+
+def with_start_move(chunks_iter, num_steps=100, dt=0.02):
+    '''
+    prepend a linear trajectory from 0 pose to the first pose of the streamed joint angles, one step every dt seconds
+    '''
+    for i, (time_steps, thetas) in enumerate(chunks_iter):
+        if i == 0:
+            # use linear interpolation to generate the trajectory of num_steps steps
+            yield time_steps[0] - dt * np.arange(num_steps, 0, -1), np.linspace(np.zeros(6), thetas[0], num_steps)  # (num_steps, 6)
+        yield time_steps, thetas
+
+
+def to_degrees(chunks_iter):
+    '''
+    convert the streamed joint angles to degrees
+    '''
+    for time_steps, thetas in chunks_iter:
+        yield time_steps, np.rad2deg(thetas)
+
+
+# A letter and the lift after it, with everything needed to solve them in a worker process:
+# (moves of String.iter_moves, cache, rotation_matrix, offset, orientation, keep_poses, seed_flipped)
+LetterTask = tp.Tuple[tp.List[tuple], tp.Any, np.ndarray, np.ndarray, np.ndarray, bool, bool]
+# The ik of one chunk up to the wrist branch selection, which needs the seed:
+# (time_steps (n,), seed_flipped, base_thetas (n, 6), chains (8, n) int8, cos_sin (8, 6) and valid (8,) of the first pose,
+# poses (n, 3) in the robot's workspace if the task keeps them, else None)
+SolvedChunk = tp.Tuple[np.ndarray, bool, np.ndarray, np.ndarray, np.ndarray, np.ndarray, tp.Optional[np.ndarray]]
+
+
+def _solve_chunk(time_steps, poses, orientation, seed_flipped, keep_poses=False) -> SolvedChunk:
+    # the chunk only depends on its seed through the elbow branch (seed_flipped) and the wrist candidate of the first pose,
+    # so the wrist branch is chained from every valid first candidate and the right chain is picked when the seed is known
+    base_thetas, cos_sin, valid = ik_batch_candidates(orientation, poses, seed_flipped)
+    transitions = wrist_transitions(cos_sin, valid)
+    chains = np.full((8, len(poses)), -1, dtype=np.int8)
+    for first in np.flatnonzero(valid[0]):
+        chains[first] = chain_wrist(transitions, first)
+    return time_steps, seed_flipped, base_thetas, chains, cos_sin[0], valid[0], poses if keep_poses else None
+
+
+def _letter_chunks(task: LetterTask):
+    '''
+    Sample the moves of a task in the robot's workspace, yields the non empty chunks of String.iter_samples as (time_steps, poses).
+    '''
+    moves, cache, rotation_matrix, offset = task[:4]
+    for move, time_offset, pose_offset, skip_first in moves:
+        samples_iter = iter_move_samples(move, time_offset, pose_offset, skip_first, cache)
+        for time_steps, poses in to_workspace(samples_iter, rotation_matrix, offset):
+            if len(poses) != 0:
+                yield time_steps, poses
+
+
+def _solve_letter(task: LetterTask) -> tp.List[SolvedChunk]:
+    '''
+    Sample the moves of a task and solve their ik as far as possible without the seed, one result per chunk of _letter_chunks.
+    '''
+    orientation, keep_poses, seed_flipped = task[4:]
+    return [_solve_chunk(time_steps, poses, orientation, seed_flipped, keep_poses) for time_steps, poses in _letter_chunks(task)]
+
+
+def _letter_tasks(string: String, rotation_matrix, offset, orientation, keep_poses, seed_flipped) -> tp.List[LetterTask]:
+    tasks = []
+    for move in string.iter_moves():
+        if isinstance(move[0], Letter):
+            tasks.append(([], string.cache, rotation_matrix, offset, orientation, keep_poses, seed_flipped))
+        tasks[-1][0].append(move)
+    return tasks
+
+
+def build_joint_trajectory(
+    string: String,
+    orientation: np.ndarray,
+    rotation_matrix: np.ndarray,
+    offset: np.ndarray,
+    seed_thetas: tp.Optional[np.ndarray] = None,
+    workers: tp.Optional[int] = 0,
+    executor: tp.Optional[Executor] = None,
+    return_poses: bool = False,
+) -> tp.Tuple[np.ndarray, ...]:
+    '''
+    Generate the trajectory of the string, transform it to the robot's workspace and solve ik for it.
+    workers: number of worker processes (None for one per core), 0 solves everything serially in this process
+    executor: a process pool to reuse between calls instead of starting one, workers is then ignored
+    The letters (each with the lift after it) are sampled and solved in parallel, and stitched in order in this process,
+    where the seed of every chunk is the last solution of the previous one. The result is bit-identical to the serial build,
+    which chains ik_stream over String.iter_samples.
+    return_poses: also return the (N, 3) poses in the robot's workspace that were solved, e.g. to validate the result,
+        instead of sampling the string again
+    returns: time_steps (N,) and joint angles (N, 6) in radians, and the poses with return_poses
+    '''
+    time_steps = np.empty(string.num_steps)
+    thetas = np.empty((string.num_steps, 6))
+    poses = np.empty((string.num_steps, 3)) if return_poses else None
+    result = (time_steps, thetas, poses) if return_poses else (time_steps, thetas)
+    end = 0
+    if executor is None and workers == 0:
+        def keep_poses(chunks_iter):
+            pose_end = 0
+            for chunk_time_steps, chunk_poses in chunks_iter:
+                poses[pose_end:pose_end + len(chunk_poses)] = chunk_poses
+                pose_end += len(chunk_poses)
+                yield chunk_time_steps, chunk_poses
+
+        chunks_iter = to_workspace(string.iter_samples(), rotation_matrix, offset)
+        if return_poses:
+            chunks_iter = keep_poses(chunks_iter)
+        for chunk_time_steps, chunk_thetas in solve_ik(chunks_iter, orientation, seed_thetas):
+            time_steps[end:end + len(chunk_time_steps)] = chunk_time_steps
+            thetas[end:end + len(chunk_thetas)] = chunk_thetas
+            end += len(chunk_time_steps)
+        assert end == string.num_steps, f"Expected {string.num_steps} samples, got {end}"
+        return result
+
+    # the elbow branch of the seed rarely changes along the string, so the workers assume that of the first seed,
+    # and the few chunks that get another seed are solved again here
+    tasks = _letter_tasks(string, rotation_matrix, offset, orientation, return_poses, seed_is_flipped(seed_thetas))
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(workers)
+    try:
+        num_workers = getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+        chunksize = max(1, len(tasks) // (4 * num_workers))
+        for task, solved in zip(tasks, executor.map(_solve_letter, tasks, chunksize=chunksize)):
+            for i, chunk in enumerate(solved):
+                chunk_time_steps, chunk_flipped, base_thetas, chains, cos_sin, valid, chunk_poses = chunk
+                if chunk_flipped != seed_is_flipped(seed_thetas):
+                    # sampling is cheap next to the ik, so only chunk i is solved again, with the other elbow branch
+                    _, chunk_poses = next(itertools.islice(_letter_chunks(task), i, None))
+                    chunk_time_steps, chunk_flipped, base_thetas, chains, cos_sin, valid, chunk_poses = _solve_chunk(
+                        chunk_time_steps, chunk_poses, task[4], not chunk_flipped, return_poses
+                    )
+                chosen = chains[wrist_first_choice(cos_sin, valid, seed_thetas)]
+                chunk_thetas = wrap_thetas(select_wrist(base_thetas, chosen))
+                seed_thetas = chunk_thetas[-1]
+
+                time_steps[end:end + len(chunk_time_steps)] = chunk_time_steps
+                thetas[end:end + len(chunk_thetas)] = chunk_thetas
+                if return_poses:
+                    poses[end:end + len(chunk_poses)] = chunk_poses
+                end += len(chunk_time_steps)
+    finally:
+        if own_executor:
+            executor.shutdown()
+    assert end == string.num_steps, f"Expected {string.num_steps} samples, got {end}"
+    return result
+
+
+if __name__ == "__main__":
+    import time
+
+    from classes.font import Font
+    from classes.letters import get_C, get_U, get_H, get_K
+    from libs.forward_kinematics import FK_batch
+
+    # Comparison: CUHK with Cartesian lifts vs joint space lifts
+    for name, kwargs in [
+        ("cartesian lifts", {}),
+        ("joint space lifts", {"joint_space_lifts": True}),
+        ("joint space lifts, retimed", {"joint_space_lifts": True, "max_joint_velocity": 0.5, "max_joint_acceleration": 1.0}),
+    ]:
+        cuhk = String([get_C(), get_U(), get_H(), get_K()])
+        start = time.perf_counter()
+        chunks = list(solve_string(cuhk, ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6), **kwargs))
+        solve_time = time.perf_counter() - start
+        time_steps = np.concatenate([chunk_time_steps for chunk_time_steps, _ in chunks])
+        thetas = np.concatenate([chunk_thetas for _, chunk_thetas in chunks])
+        # the pen height over the paper, from the forward kinematics of the joint angles
+        pen_height = FK_batch(thetas)[0][:, 2] - WORKSPACE_OFFSET[2]
+        print(f"{name}: {len(thetas)} samples in {solve_time * 1e3:.1f} ms, duration {time_steps[-1]:.1f} s, "
+              f"lowest pen height {pen_height.min():.2f} mm, max joint step {np.abs(np.diff(np.unwrap(thetas, axis=0), axis=0)).max():.4f} rad")
+
+    # Benchmark: serial vs parallel build of a 1,000 character string, the results must be bit-identical
+
+    font = Font()
+    text = "".join(char for char in "The quick brown fox jumps over the lazy dog" if char != " ")
+    letters = [font.get_letter(text[idx % len(text)]) for idx in range(1000)]
+    # in rows of 4 letters at the same place as CUHK, which is within reach
+    string = String(letters, offsets=[np.array([idx % 4 * 100, 0, 0]) for idx in range(len(letters))])
+
+    start = time.perf_counter()
+    reference = build_joint_trajectory(string, ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6), workers=0)
+    serial_time = time.perf_counter() - start
+    print(f"serial: {len(reference[0])} samples in {serial_time:.2f} s")
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        with ProcessPoolExecutor(workers) as executor:
+            start = time.perf_counter()
+            result = build_joint_trajectory(string, ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6), executor=executor)
+            parallel_time = time.perf_counter() - start
+        assert all(np.array_equal(x, y) for x, y in zip(reference, result)), "Parallel build differs from the serial build"
+        print(f"{workers} workers: {parallel_time:.2f} s, speedup {serial_time / parallel_time:.2f}")
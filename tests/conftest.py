@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from classes.base_letters import String
+from classes.letters import get_C, get_U, get_H, get_K
+from libs import jit
+from pipeline import ROTATION_MATRIX, WORKSPACE_OFFSET
+
+
+@pytest.fixture(scope="session")
+def cuhk_trajectory():
+    # time_steps (N,), poses and velocities (N, 3) of the CUHK job in the robot's workspace, as in main.py
+    time_steps, poses, velocities, _ = String([get_C(), get_U(), get_H(), get_K()]).get_trajectory()
+    return time_steps, poses @ ROTATION_MATRIX.T + WORKSPACE_OFFSET, velocities @ ROTATION_MATRIX.T
+
+
+@pytest.fixture(params=jit.BACKENDS)
+def backend(request):
+    # run the test with the numpy code and, if numba is installed, with the compiled kernels
+    previous = jit.get_backend()
+    jit.set_backend(request.param)
+    yield request.param
+    jit.set_backend(previous)
@@ -0,0 +1,39 @@
+import asyncio
+
+import numpy as np
+
+from libs.async_udp_sender import AsyncUDPEndpoint, _produce
+
+
+class SlowEndpoint(AsyncUDPEndpoint):
+    # stalls before sending anything, e.g. a robot that is still busy
+    async def run(self):
+        await asyncio.sleep(0.3)
+        await super().run()
+
+
+def test_slow_endpoint_does_not_delay_the_others():
+    async def stream():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, local_addr=("127.0.0.1", 0))
+        address = transport.get_extra_info("sockname")
+        endpoints = [AsyncUDPEndpoint(*address, queue_size=4), SlowEndpoint(*address, queue_size=4), AsyncUDPEndpoint(*address, queue_size=4)]
+        try:
+            for endpoint in endpoints:
+                await endpoint.open()
+            time_steps = np.linspace(0, 0.5, 26)
+            chunks = [(time_steps, np.zeros((len(time_steps), 6)))]
+            await asyncio.gather(_produce(chunks, endpoints), *[endpoint.run() for endpoint in endpoints])
+        finally:
+            for endpoint in endpoints:
+                endpoint.close()
+            transport.close()
+        return [endpoint.get_stats() for endpoint in endpoints]
+
+    fast, slow, other_fast = asyncio.run(stream())
+    for stats in (fast, other_fast):
+        assert stats["sent"] == 26 and stats["dropped"] == 0
+        assert stats["max_lateness"] < 0.1
+    # the stalled endpoint keeps at most queue_size commands and drops the ones it is too late for
+    assert slow["max_queue_depth"] <= 4
+    assert slow["dropped"] > 0 and slow["sent"] + slow["dropped"] == 26
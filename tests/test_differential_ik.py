@@ -0,0 +1,21 @@
+import numpy as np
+
+from classes.base_letters import String
+from classes.letters import get_C, get_U
+from libs.differential_ik import ik_track
+from libs.inverse_kinematics import ik_batch
+from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET
+
+
+def workspace_trajectory():
+    time_steps, poses, velocities, _ = String([get_C(), get_U()]).get_trajectory()
+    return time_steps, poses @ ROTATION_MATRIX.T + WORKSPACE_OFFSET, velocities @ ROTATION_MATRIX.T
+
+
+def test_segments_solved_again_are_chained_like_ik_batch():
+    # with a negative tolerance every segment falls back to ik, each one seeded by the end of the one before
+    time_steps, poses, velocities = workspace_trajectory()
+    stats = {}
+    thetas = ik_track(ORIENTATION, time_steps, poses, velocities, np.zeros(6), refresh_every=25, tolerance=-1, stats=stats)
+    assert stats["fallback_samples"] == len(poses)
+    assert np.allclose(thetas, ik_batch(ORIENTATION, poses, seed_thetas=np.zeros(6)), atol=1e-9)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from libs.forward_kinematics import FK_batch, FK_single, get_T
+
+
+def reference_fk(thetas):
+    # FK from the DH table of the course robot built per call, as before RobotModel
+    dh_table = np.array([
+        [0, 0, 159, thetas[0]],
+        [-np.pi / 2, 0, 0, thetas[1] - np.pi / 2 + np.arctan2(30, 264)],
+        [0, 265.69, 0, thetas[2] - np.pi / 4 - np.arctan2(30, 264)],
+        [-np.pi / 2, 30, 258, thetas[3]],
+        [np.pi / 2, 0, 0, thetas[4]],
+        [-np.pi / 2, 0, 0, thetas[5]],
+    ])
+    T = get_T(6, 0, dh_table)
+    return (T @ np.array([0, 0, 123, 1]))[:3], T[:3, :3]
+
+
+def test_fk_batch_matches_fk_single_and_the_dh_table():
+    thetas = np.random.default_rng(0).uniform(-np.pi, np.pi, (500, 6))
+    positions, orientations = FK_batch(thetas)
+    assert positions.shape == (500, 3) and orientations.shape == (500, 3, 3)
+    for theta, position, orientation in zip(thetas, positions, orientations):
+        single_position, single_orientation = FK_single(theta)
+        assert np.allclose(position, single_position, rtol=0, atol=1e-9)
+        assert np.allclose(orientation, single_orientation, rtol=0, atol=1e-12)
+        reference_position, reference_orientation = reference_fk(theta)
+        assert np.allclose(position, reference_position, rtol=0, atol=1e-9)
+        assert np.allclose(orientation, reference_orientation, rtol=0, atol=1e-12)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from classes.base_letters import Letter
+from classes.font import Font
+from classes.glyph_cache import GLYPH_CACHE, GlyphCache
+
+
+def test_each_glyph_of_a_long_text_is_built_once(monkeypatch):
+    font = Font()
+    text = "".join(np.random.default_rng(0).choice([char for char in font.characters if char != " "], 1000))
+    builds = []
+    build_trajectory = Letter.build_trajectory
+    monkeypatch.setattr(Letter, "build_trajectory", lambda letter: builds.append(letter.letter) or build_trajectory(letter))
+
+    GLYPH_CACHE.clear()
+    string = font.build_string(text)
+    string.get_trajectory()
+    for _ in string.iter_samples():
+        pass
+    assert sorted(builds) == sorted({letter.letter for letter in string.letters})
+
+
+def test_clear_resets_the_statistics():
+    cache = GlyphCache()
+    trajectory = (np.zeros(1), np.zeros((1, 3)), np.zeros((1, 3)), np.zeros((1, 3)))
+    cache.get("a", lambda: trajectory)
+    cache.get("a", lambda: trajectory)
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.clear()
+    assert "a" not in cache
+    assert (cache.hits, cache.disk_hits, cache.misses) == (0, 0, 0)
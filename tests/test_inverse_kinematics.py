@@ -0,0 +1,21 @@
+import numpy as np
+
+from libs.forward_kinematics import FK_batch
+from libs.inverse_kinematics import ik, ik_batch
+from pipeline import ORIENTATION
+
+
+def test_ik_batch_matches_per_sample_ik(cuhk_trajectory, backend):
+    _, poses, _ = cuhk_trajectory
+    thetas = [np.zeros(6)]
+    for pose in poses:
+        thetas.append(ik(ORIENTATION, pose, curr_thetas=thetas[-1]))
+    assert np.allclose(ik_batch(ORIENTATION, poses, seed_thetas=np.zeros(6)), thetas[1:], rtol=0, atol=1e-9)
+
+
+def test_ik_batch_reaches_the_poses(cuhk_trajectory):
+    _, poses, _ = cuhk_trajectory
+    positions, orientations = FK_batch(ik_batch(ORIENTATION, poses, seed_thetas=np.zeros(6)))
+    assert np.abs(positions - poses).max() < 0.02  # mm, the pose ik reaches is off by ~1e-2 mm on the course robot
+    # the pen axis follows ORIENTATION, the roll about it is not controlled
+    assert np.abs(orientations[:, :, 2] - ORIENTATION[:, 2]).max() < 1e-6
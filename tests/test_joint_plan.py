@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from classes.base_letters import String, Stroke
+from classes.font import Font
+from joint_plan import JointPlan
+from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET
+
+
+def make_plan(letters, offsets):
+    return JointPlan(String(letters, offsets=offsets), ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6))
+
+
+def move_waypoint(plan, font):
+    stroke = plan.string.letters[5].moves[0]
+    poses = stroke.key_poses.copy()
+    poses[-1, :2] += [3, -2]
+    plan.replace_stroke(5, 0, Stroke(poses, stroke.time_list))
+
+
+@pytest.mark.parametrize("edit", [
+    move_waypoint,
+    lambda plan, font: plan.set_offset(6, plan.string.offsets[6] + [0, 5, 0]),
+    lambda plan, font: plan.replace_letter(7, font.get_letter("W")),
+])
+def test_incremental_update_matches_a_full_plan(edit):
+    font = Font()
+    # in rows of 4 letters at the same place as CUHK, which is within reach
+    letters = [font.get_letter(char) for char in "THEQUICKBROWN"]
+    plan = make_plan(letters, [np.array([idx % 4 * 100, 0, 0]) for idx in range(len(letters))])
+    edit(plan, font)
+
+    reference = make_plan(plan.string.letters, plan.string.offsets)
+    assert np.allclose(plan.time_steps, reference.time_steps)
+    assert np.array_equal(plan.poses, reference.poses)
+    assert np.array_equal(plan.thetas, reference.thetas)
+    assert plan.num_sampled <= 3 and 0 < plan.num_solved < len(plan.thetas)
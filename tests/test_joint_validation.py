@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from classes.base_letters import String
+from classes.letters import get_C, get_U, get_H, get_K
+from libs.joint_validation import ISSUES, is_valid, summarize, validate_joint_trajectory
+from libs.robot_model import ROBOT
+from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, build_joint_trajectory
+
+
+@pytest.fixture(scope="module")
+def cuhk_joints():
+    string = String([get_C(), get_U(), get_H(), get_K()])
+    return build_joint_trajectory(string, ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6), return_poses=True)
+
+
+def flagged(report, name):
+    mask = report[name]
+    return list(np.flatnonzero(mask.any(axis=1) if mask.ndim == 2 else mask))
+
+
+def test_cuhk_is_valid(cuhk_joints):
+    time_steps, thetas, poses = cuhk_joints
+    report = validate_joint_trajectory(time_steps, thetas, poses, ORIENTATION)
+    assert is_valid(report) and summarize(report, time_steps) == []
+
+
+def not_finite(time_steps, thetas, poses):
+    thetas[100, 0] = np.nan
+
+
+def unreachable(time_steps, thetas, poses):
+    poses[1000] += [400, 0, 0]
+
+
+def elbow_flips(time_steps, thetas, poses):
+    thetas[2000:2100, 2] = 2 * ROBOT.elbow_zero - thetas[2000:2100, 2]
+
+
+def wrist_flips(time_steps, thetas, poses):
+    thetas[2000:2100, 4] *= -1
+
+
+def jumps(time_steps, thetas, poses):
+    thetas[500:, 0] += 0.5
+
+
+def velocity(time_steps, thetas, poses):
+    time_steps *= 0.05
+
+
+@pytest.mark.parametrize("fault, name, samples", [
+    (not_finite, "not_finite", [100]),
+    (unreachable, "unreachable", [1000]),
+    (elbow_flips, "elbow_flips", [2000, 2100]),
+    (wrist_flips, "wrist_flips", [2000, 2100]),
+    (jumps, "jumps", [500]),
+    (velocity, "velocity", None),
+    (velocity, "acceleration", None),
+])
+def test_each_fault_is_reported(cuhk_joints, fault, name, samples):
+    time_steps, thetas, poses = [x.copy() for x in cuhk_joints]
+    fault(time_steps, thetas, poses)
+    report = validate_joint_trajectory(time_steps, thetas, poses, ORIENTATION)
+    assert not is_valid(report)
+    if samples is not None:
+        assert flagged(report, name) == samples
+    else:
+        assert len(flagged(report, name)) > 0
+    assert any(line.startswith(name + ":") for line in summarize(report, time_steps))
+
+
+def test_joint_limits(cuhk_joints):
+    time_steps, thetas, poses = [x.copy() for x in cuhk_joints]
+    thetas[3000, 0] = np.radians(175)
+    report = validate_joint_trajectory(time_steps, thetas, joint_limits=np.radians([(-170, 170)] * 6))
+    assert flagged(report, "limits") == [3000]
+    assert np.flatnonzero(report["limits"][3000]).tolist() == [0]
+
+
+def test_a_wrap_by_two_pi_is_not_a_jump(cuhk_joints):
+    time_steps, thetas, poses = [x.copy() for x in cuhk_joints]
+    thetas[500:, 0] += 2 * np.pi
+    report = validate_joint_trajectory(time_steps, thetas)
+    assert flagged(report, "wraps") == [500]
+    assert all(not report[name].any() for name in ISSUES if name != "limits")
+    assert np.allclose(report["velocities"], validate_joint_trajectory(*cuhk_joints[:2])["velocities"])
@@ -0,0 +1,51 @@
+import numpy as np
+
+from classes.base_letters import Letter, Stroke
+from classes.font import Font
+
+
+def test_low_frequency_samples_both_ends_of_a_stroke():
+    stroke = Stroke([np.zeros(3), np.array([10.0, 0, 0])], [0, 0.5], frequency=1)
+    time_steps, poses, _, _ = stroke.get_trajectory()
+    assert stroke.num_steps == len(time_steps) == 2
+    assert np.allclose(poses[-1], [10, 0, 0])
+
+
+def test_font_string_at_low_frequency():
+    string = Font().build_string("i:i", frequency=1)
+    time_steps, poses, _, _ = string.get_trajectory()
+    assert len(time_steps) == string.num_steps
+    assert np.all(np.diff(time_steps) >= 0)
+
+
+def test_retiming_a_string_does_not_change_other_strings_of_the_font():
+    font = Font()
+    durations = [letter.duration for letter in font.build_string("AB").letters]
+    retimed = font.build_string("AB")
+    retimed.set_generator("parabolic")
+    retimed.retime()
+    assert [letter.duration for letter in retimed.letters] != durations
+    fresh = font.build_string("AB")
+    assert [letter.duration for letter in fresh.letters] == durations
+    assert all(move.generator == "cubic" for letter in fresh.letters for move in letter.moves)
+    assert font.get_letter("A").duration == durations[0]
+
+
+def test_replacing_a_generator_does_not_reuse_cached_trajectories():
+    from functools import partial
+
+    from libs.trajectory_generation import GENERATORS, register_generator
+    from libs.trajectory_generation_parabolic import generate_trajectory_3d
+
+    def letter():
+        key_poses = [np.zeros(3), np.array([10.0, 0, 0]), np.array([10.0, 10, 0])]
+        return Letter("L", [Stroke(key_poses, [0, 1, 2])], generator="parabolic")
+
+    previous = GENERATORS["parabolic"]
+    try:
+        _, poses, _, _ = letter().get_trajectory()
+        register_generator("parabolic", partial(generate_trajectory_3d, t_b=0.5))
+        _, replaced_poses, _, _ = letter().get_trajectory()
+    finally:
+        register_generator("parabolic", previous)
+    assert not np.allclose(poses, replaced_poses)
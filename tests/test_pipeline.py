@@ -0,0 +1,44 @@
+from concurrent.futures import Executor
+
+import numpy as np
+
+from classes.base_letters import String
+from classes.letters import get_C, get_U
+from libs.inverse_kinematics import ik_batch
+from pipeline import ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, _solve_letter, build_joint_trajectory, solve_ik, to_workspace
+
+
+def test_solve_ik_keeps_chunks_aligned_with_an_empty_chunk():
+    poses = WORKSPACE_OFFSET + np.array([[0, 0, 0], [5, 0, 0], [10, 0, 0]], dtype=float)
+    chunks = [(np.array([0.0]), poses[:1]), (np.empty(0), np.empty((0, 3))), (np.array([1.0, 2.0]), poses[1:])]
+    solved = list(solve_ik(iter(chunks), ORIENTATION, np.zeros(6)))
+
+    assert [len(time_steps) for time_steps, _ in solved] == [1, 0, 2]
+    assert all(thetas.shape == (len(time_steps), 6) for time_steps, thetas in solved)
+    expected = ik_batch(ORIENTATION, poses, seed_thetas=np.zeros(6))
+    assert np.array_equal(np.concatenate([thetas for _, thetas in solved]), expected)
+
+
+class WrongElbowExecutor(Executor):
+    # solves the letters in this process with the other elbow branch, so that every chunk has to be solved again
+    def map(self, fn, tasks, chunksize=1):
+        assert fn is _solve_letter
+        return [fn(task[:-1] + (not task[-1],)) for task in tasks]
+
+
+def test_build_joint_trajectory_solves_chunks_again_with_the_seed_elbow_branch():
+    string = String([get_C(), get_U()])
+    expected = build_joint_trajectory(string, ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6))
+    redone = build_joint_trajectory(string, ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6), executor=WrongElbowExecutor())
+    assert np.array_equal(redone[0], expected[0])
+    assert np.array_equal(redone[1], expected[1])
+
+
+def test_build_joint_trajectory_returns_the_solved_poses():
+    string = String([get_C(), get_U()])
+    expected = np.concatenate([poses for _, poses in to_workspace(string.iter_samples(), ROTATION_MATRIX, WORKSPACE_OFFSET)])
+    for kwargs in [{}, {"executor": WrongElbowExecutor()}]:
+        time_steps, thetas, poses = build_joint_trajectory(
+            string, ORIENTATION, ROTATION_MATRIX, WORKSPACE_OFFSET, np.zeros(6), return_poses=True, **kwargs
+        )
+        assert np.array_equal(poses, expected)
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from libs.trajectory_generation_cubic import generate_trajectory_3d as generate_cubic
+from libs.trajectory_generation_parabolic import generate_trajectory_3d as generate_parabolic
+
+
+def cubic_reference(pos_list, time_list, frequency):
+    # the original per-sample loop implementation of the cubic generator
+    pos_array = np.array(pos_list)
+    time_array = np.array(time_list)
+
+    total_duration = time_array[-1] - time_array[0]
+    num_steps = int(total_duration * frequency) + 1
+    time_steps = np.linspace(time_array[0], time_array[-1], num_steps)
+
+    poses = np.zeros((num_steps, 3))
+    velocities = np.zeros((num_steps, 3))
+    accelerations = np.zeros((num_steps, 3))
+
+    for dim in range(3):
+        positions = pos_array[:, dim]
+        N = len(positions) - 1
+        h = np.diff(time_array)
+
+        v = np.zeros(N + 1)
+        for i in range(1, N):
+            vel_prev = (positions[i] - positions[i - 1]) / (time_array[i] - time_array[i - 1])
+            vel_next = (positions[i + 1] - positions[i]) / (time_array[i + 1] - time_array[i])
+            v[i] = (vel_prev + vel_next) / 2
+
+        a = positions[:-1]
+        b = v[:-1]
+        c = np.zeros(N)
+        d = np.zeros(N)
+        for i in range(N):
+            c[i] = (3 * (positions[i + 1] - positions[i]) / h[i] - 2 * v[i] - v[i + 1]) / h[i]
+            d[i] = (2 * (positions[i] - positions[i + 1]) / h[i] + v[i] + v[i + 1]) / (h[i] ** 2)
+
+        for t_idx, t in enumerate(time_steps):
+            for i in range(N):
+                if time_array[i] <= t <= time_array[i + 1] or (i == N - 1 and np.isclose(t, time_array[-1])):
+                    s = t - time_array[i]
+                    poses[t_idx, dim] = a[i] + b[i] * s + c[i] * s**2 + d[i] * s**3
+                    velocities[t_idx, dim] = b[i] + 2 * c[i] * s + 3 * d[i] * s**2
+                    accelerations[t_idx, dim] = 2 * c[i] + 6 * d[i] * s
+                    break
+
+    return time_steps, poses, velocities, accelerations
+
+
+
+def parabolic_reference(pos_list, time_list, frequency, t_b):
+    # the original per-sample loop implementation of the parabolic blend generator
+    pos_array = np.array(pos_list)
+    time_array = np.array(time_list)
+
+    total_duration = time_array[-1] - time_array[0]
+    num_steps = int(total_duration * frequency) + 1
+    time_steps = np.linspace(time_array[0], time_array[-1], num_steps)
+
+    poses = np.zeros((num_steps, 3))
+    velocities = np.zeros((num_steps, 3))
+    accelerations = np.zeros((num_steps, 3))
+
+    N = len(pos_array) - 1
+
+    for dim in range(3):
+        positions = pos_array[:, dim]
+        segment_acc = np.zeros(N)
+        segment_vel = np.zeros(N)
+
+        for i in range(N):
+            t_final = time_array[i + 1] - time_array[i]
+            pos_offset = positions[i]
+            pos_final = positions[i + 1]
+            segment_acc[i] = (pos_offset - pos_final) / (t_b**2 - t_final * t_b)
+            segment_vel[i] = segment_acc[i] * t_b
+
+        for t_idx, t in enumerate(time_steps):
+            for i in range(N):
+                t_start = time_array[i]
+                t_final = time_array[i + 1]
+                t_rel = t - t_start
+                if t_start <= t <= t_final:
+                    pos_offset = positions[i]
+                    pos_final = positions[i + 1]
+                    acc = segment_acc[i]
+                    v_linear = segment_vel[i]
+
+                    if 0 <= t_rel < t_b:
+                        poses[t_idx, dim] = (acc / 2) * t_rel**2 + pos_offset
+                        velocities[t_idx, dim] = acc * t_rel
+                        accelerations[t_idx, dim] = acc
+                    elif t_b <= t_rel < t_final - t_start - t_b:
+                        pos_blend = (acc / 2) * t_b**2 + pos_offset
+                        poses[t_idx, dim] = acc * t_b * (t_rel - t_b) + pos_blend
+                        velocities[t_idx, dim] = v_linear
+                        accelerations[t_idx, dim] = 0
+                    elif t_final - t_start - t_b <= t_rel <= t_final- t_start:
+                        t_from_end = t_rel + t_start - t_final
+                        poses[t_idx, dim] = -(acc / 2) * t_from_end**2 + pos_final
+                        velocities[t_idx, dim] = -acc * t_from_end
+                        accelerations[t_idx, dim] = -acc
+                    break
+
+    return time_steps, poses, velocities, accelerations
+
+
+def random_waypoints(num_waypoints, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 100, (num_waypoints, 3)), np.cumsum(rng.uniform(0.5, 2, num_waypoints)) - 0.5
+
+
+@pytest.mark.parametrize("num_waypoints, frequency", [(2, 50), (5, 50), (20, 200), (5, 1000)])
+def test_cubic_matches_the_loop_implementation(num_waypoints, frequency, backend):
+    pos_list, time_list = random_waypoints(num_waypoints)
+    result = generate_cubic(pos_list, time_list, frequency)
+    # array s**3 may differ from the scalar pow in the last bit
+    for x, y in zip(cubic_reference(pos_list, time_list, frequency), result):
+        assert np.allclose(x, y, rtol=1e-12, atol=1e-12)
+    assert np.allclose(result[1][[0, -1]], pos_list[[0, -1]])
+
+
+@pytest.mark.parametrize("num_waypoints, frequency", [(2, 50), (5, 50), (20, 200), (5, 1000)])
+def test_parabolic_matches_the_loop_implementation(num_waypoints, frequency, backend):
+    pos_list, time_list = random_waypoints(num_waypoints)
+    result = generate_parabolic(pos_list, time_list, frequency, t_b=0.2)
+    for x, y in zip(parabolic_reference(pos_list, time_list, frequency, t_b=0.2), result):
+        assert np.allclose(x, y, rtol=1e-12, atol=1e-12)
+    assert np.allclose(result[1][[0, -1]], pos_list[[0, -1]])
+
+
+def test_parabolic_rejects_blends_longer_than_half_a_segment():
+    with pytest.raises(ValueError):
+        generate_parabolic([np.zeros(3), np.ones(3)], [0, 0.3], 50, t_b=0.2)
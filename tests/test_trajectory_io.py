@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+from libs.trajectory_io import JointTrajectoryWriter, read_joint_trajectory, write_joint_trajectory
+
+
+def joint_trajectory(num_steps=500):
+    time_steps = np.arange(num_steps) / 50
+    return time_steps, np.rad2deg(np.sin(time_steps[:, None] * 0.1 + np.arange(6)))
+
+
+def test_text_format_is_the_one_main_py_wrote(tmp_path):
+    time_steps, thetas = joint_trajectory(20)
+    path = str(tmp_path / "joint_space.txt")
+    write_joint_trajectory(path, time_steps, thetas)
+    expected = "angle;"  # the string building of main.py before the trajectory_io formats
+    for j in range(6):
+        for v in thetas[:, j]:
+            expected += f"{float(v)},"
+        expected = expected[:-1] + ";"
+    with open(path) as f:
+        assert f.read() == expected
+
+
+@pytest.mark.parametrize("extension, atol", [(".txt", 0), (".npy", 0), (".npz", 0), (".f32", 1e-4), (".bin", 1e-4)])
+def test_formats_round_trip(tmp_path, extension, atol):
+    time_steps, thetas = joint_trajectory()
+    path = str(tmp_path / ("joint_space" + extension))
+    write_joint_trajectory(path, time_steps, thetas)
+    time_steps_read, thetas_read = read_joint_trajectory(path)
+    assert np.allclose(thetas_read, thetas, rtol=0, atol=atol)
+    if extension == ".txt":
+        assert time_steps_read is None  # the text format only keeps the angles
+    else:
+        assert np.allclose(time_steps_read, time_steps, rtol=0, atol=atol)
+
+
+def test_unknown_extension_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_joint_trajectory(str(tmp_path / "joint_space.csv"), *joint_trajectory())
+
+
+@pytest.mark.parametrize("extension", [".txt", ".f32"])
+def test_chunked_writer_matches_one_write(tmp_path, extension):
+    time_steps, thetas = joint_trajectory()
+    path = str(tmp_path / ("joint_space" + extension))
+    write_joint_trajectory(path, time_steps, thetas)
+    with open(path, "rb") as f:
+        expected = f.read()
+    with JointTrajectoryWriter(path) as writer:
+        for start in range(0, len(thetas), 64):
+            writer.write(time_steps[start:start + 64], thetas[start:start + 64])
+    with open(path, "rb") as f:
+        assert f.read() == expected
+
+
+@pytest.mark.parametrize("extension", [".txt", ".f32"])
+def test_interrupted_writer_keeps_the_previous_file(tmp_path, extension):
+    path = str(tmp_path / ("joint_space" + extension))
+    time_steps = np.arange(10) / 50
+    thetas = np.tile(np.arange(6.0), (10, 1))
+    with JointTrajectoryWriter(path) as writer:
+        writer.write(time_steps, thetas)
+
+    with pytest.raises(KeyboardInterrupt):
+        with JointTrajectoryWriter(path) as writer:
+            writer.write(time_steps[:3], thetas[:3] + 1)
+            raise KeyboardInterrupt
+    assert np.array_equal(np.array(read_joint_trajectory(path)[1]), thetas)
+    assert os.listdir(tmp_path) == [os.path.basename(path)]